@@ -4,3 +4,4 @@
 
 __author__ = "Helge Helø Klemetsdal & Adam Julius Olof Kviman"
 __email__ = "hege.helo.klemetsdal@nmbu.no & juliukvi@nmbu.no"
+__version__ = "0.1.0"
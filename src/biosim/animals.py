@@ -5,6 +5,8 @@ __email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
 import math as m
 import random
 import numpy as np
+from . import counters
+from .parameters import AnimalParameters
 
 
 class BaseAnimal:
@@ -65,39 +67,82 @@ class BaseAnimal:
         ValueError
             If the assigned parameter values are not in the right ranges.
         """
-
-        for key in new_params:
-            if key not in cls.parameters.keys():
-                raise KeyError(f"Parameter {key} is not valid")
-            if isinstance(new_params[key], int) or isinstance(
-                new_params[key], float
-            ):
-                continue
-            else:
-                raise ValueError(
-                    f"Value needs to be int or float, "
-                    f"got:{type(new_params[key]).__name__}"
-                )
-        for key in new_params:
-            if new_params[key] < 0:
-                raise ValueError("All values must be positive")
-            if key == "DeltaPhiMax" and new_params[key] <= 0:
-                raise ValueError("DeltaPhiMax must be strictly positive")
-            if key == "eta" and new_params[key] > 1:
-                raise ValueError("Eta must be less or equal to one")
-        cls.parameters.update(new_params)
-        cls._set_params_as_attributes()
+        parameter_set = AnimalParameters(cls.parameters).updated(new_params)
+        cls.bind_parameters(parameter_set)
 
     @classmethod
     def _set_params_as_attributes(cls):
         """Sets the animal parameters to attributes on class level.
         """
-        for key in cls.parameters:
-            if key == "lambda":
-                new_key = "_lambda"
-                setattr(cls, new_key, cls.parameters[key])
-            else:
-                setattr(cls, key, cls.parameters[key])
+        cls.bind_parameters(AnimalParameters(cls.parameters))
+
+    @classmethod
+    def bind_parameters(cls, parameter_set):
+        """Sets the values of a parameter set as attributes on class level.
+
+        Parameters
+        ----------
+        parameter_set : AnimalParameters
+            Validated parameters for the species.
+        """
+        cls.parameters = dict(parameter_set)
+        for key, value in parameter_set.attributes().items():
+            setattr(cls, key, value)
+
+    @classmethod
+    def with_parameters(cls, parameter_set):
+        """Returns a subclass of the species bound to a parameter set.
+
+        Animals made from the subclass use the parameters of the set, while
+        the parameters of the species class itself are left untouched. This
+        lets several simulations with different parameters run in the same
+        process.
+
+        Parameters
+        ----------
+        parameter_set : AnimalParameters
+            Validated parameters for the species.
+
+        Returns
+        -------
+        type
+            Subclass of the species.
+        """
+        subclass = type(cls.__name__, (cls,), {"__module__": cls.__module__})
+        subclass.bind_parameters(parameter_set)
+        return subclass
+
+    @classmethod
+    def from_state(cls, age, weight, fitness=None):
+        """Creates an animal with a given age and weight.
+
+        Unlike the constructor no weight is drawn and the values are not
+        checked, which makes it suited for placing many animals at once.
+
+        Parameters
+        ----------
+        age: int
+            Age of the animal.
+        weight: float
+            Weight of the animal.
+        fitness: float
+            Fitness of the animal. Computed from age and weight if None.
+
+        Returns
+        -------
+        BaseAnimal
+            An instance of the class.
+        """
+        if cls.parameters is None:
+            cls.set_default_parameters_for_species()
+        animal = cls.__new__(cls)
+        animal.a = age
+        animal.weight = weight
+        if fitness is None:
+            animal.fitness_update()
+        else:
+            animal.fitness = fitness
+        return animal
 
     def __init__(self, age=0, weight=None):
         if self.parameters is None:
@@ -150,26 +195,35 @@ class BaseAnimal:
         if self.weight <= 0:
             self.fitness = 0
         else:
+            if counters.active:
+                counters.add("exp_calls", 2)
             q_age = 1 / (1 + m.exp(self.phi_age * (self.a - self.a_half)))
             q_weight = 1 / (
                 1 + m.exp(-self.phi_weight * (self.weight - self.w_half))
             )
             self.fitness = q_age * q_weight
 
-    def migrate(self):
+    def migrate(self, number=None):
         r"""Estimates the probability for an animal to migrate
 
         The probability of an animal migrating is given by :math:`\mu\Phi`
 
+        Parameters
+        ----------
+        number : float
+            Uniform random number in [0, 1]. Drawn with random.uniform if
+            not given.
+
         Returns
         -------
         bool
             Returns True if the animal migrates, false if not
         """
-        number = random.uniform(0, 1)
+        if number is None:
+            number = random.uniform(0, 1)
         return number <= (self.mu * self.fitness)
 
-    def will_birth(self, num_animal):
+    def will_birth(self, num_animal, number=None, rng=None):
         r"""Determines if an animal will give birth or not.
 
         The probability for an animal to give birth is given by formula:
@@ -189,6 +243,17 @@ class BaseAnimal:
         When a mother gives birth it looses :math:`\xi` times the actual
         birthweight of the baby.
 
+        Parameters
+        ----------
+        num_animal : int
+            Number of animals of the same species in the cell.
+        number : float
+            Uniform random number in [0, 1]. Drawn with random.uniform if
+            not given.
+        rng : RandomBuffer
+            Buffer the weight of the newborn is drawn from. If None, numpy's
+            global generator is used.
+
         Returns
         -------
         Nonetype
@@ -197,16 +262,17 @@ class BaseAnimal:
             If the animal gives birth
         """
         prob = min(1, self.gamma * self.fitness * (num_animal - 1))
-        number = random.uniform(0, 1)
-        if self.weight < (self.zeta * (self.w_birth + self.sigma_birth)):
+        if number is None:
+            number = random.uniform(0, 1)
+        if self.weight < self.birth_weight_limit:
             return
         if number <= prob:
-            newborn = self.birth()
-            if self.weight < (self.xi * newborn.weight):
+            weight = self.birth_weight(rng)
+            if self.weight < (self.xi * weight):
                 return
-            self.weight -= self.xi * newborn.weight
+            self.weight -= self.xi * weight
             self.fitness_update()
-            return newborn
+            return self.birth(weight=weight)
         else:
             return
 
@@ -223,7 +289,7 @@ class BaseAnimal:
         """
         self.weight -= self.eta * self.weight
 
-    def death(self):
+    def death(self, number=None):
         r"""Estimates if an animal dies or not.
 
         Death is guaranteed if :math:`\Phi = 0`, and else it occurs with
@@ -232,6 +298,12 @@ class BaseAnimal:
         .. math::
             p_{death} = \omega(1-\Phi)
 
+        Parameters
+        ----------
+        number : float
+            Uniform random number in [0, 1]. Drawn with random.uniform if
+            not given.
+
         Returns
         -------
         bool
@@ -240,21 +312,56 @@ class BaseAnimal:
         if self.fitness == 0:
             return True
         p_death = self.omega * (1 - self.fitness)
-        number = random.uniform(0, 1)
+        if number is None:
+            number = random.uniform(0, 1)
         if number < p_death:
             return True
         else:
             return False
 
-    def birth(self):
+    def birth_weight(self, rng=None):
+        """Draws the weight of a newborn of the species.
+
+        Parameters
+        ----------
+        rng : RandomBuffer
+            Buffer the weight is drawn from. If None, numpy's global
+            generator is used.
+
+        Returns
+        -------
+        float
+            A positive weight.
+        """
+        weight = -1
+        while weight <= 0:
+            if rng is None:
+                weight = np.random.normal(self.w_birth, self.sigma_birth)
+            else:
+                weight = rng.normal(self.w_birth, self.sigma_birth)
+        return weight
+
+    def birth(self, rng=None, weight=None):
         """Returns a new class object of the same species that gave birth
 
+        Parameters
+        ----------
+        rng : RandomBuffer
+            Buffer the weight of the newborn is drawn from. If None, numpy's
+            global generator is used.
+        weight : float
+            Weight of the newborn. Drawn with birth_weight if not given.
+
         Returns
         -------
         BaseAnimal
             An instance of the same classtype that gave birth
         """
-        return self.__class__()
+        if counters.active:
+            counters.add("births")
+        if weight is None:
+            weight = self.birth_weight(rng)
+        return self.__class__(weight=weight)
 
 
 class Carn(BaseAnimal):
@@ -312,7 +419,7 @@ class Carn(BaseAnimal):
     def __init__(self, age=0, weight=None):
         super().__init__(age=age, weight=weight)
 
-    def feeding(self, sorted_herb_list):
+    def feeding(self, sorted_herb_list, random_numbers=None):
         r"""Feeds a carnivore and updates the weight and fitness accordingly.
 
         The carnivores prey and feed on herbivores only. The carnivore eats
@@ -350,6 +457,9 @@ class Carn(BaseAnimal):
         ----------
         sorted_herb_list: list
             List of herbivores sorted in order of increasing fitness.
+        random_numbers: iterator
+            Iterator giving uniform random numbers in [0, 1], one for each
+            kill attempt. Numbers are drawn with random.uniform if not given.
         Returns
         -------
         eaten_herbs: list
@@ -367,7 +477,10 @@ class Carn(BaseAnimal):
                 chance_to_kill = fitness_diff / self.DeltaPhiMax
             else:
                 chance_to_kill = 1
-            number = random.uniform(0, 1)
+            if random_numbers is None:
+                number = random.uniform(0, 1)
+            else:
+                number = next(random_numbers)
             if number <= chance_to_kill:
                 if amount_to_eat < herb.weight:
                     self.weight += self.beta * amount_to_eat
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import glob
+import os
+import queue
+import signal
+import threading
+import time
+from .checkpoint import write_checkpoint
+
+
+def checkpoint_files(directory):
+    """Lists the autosaved checkpoints in a directory, newest first.
+
+    Parameters
+    ----------
+    directory : str
+        Directory the checkpoints are saved in.
+
+    Returns
+    -------
+    list
+        Paths of the checkpoints.
+    """
+    return sorted(
+        glob.glob(os.path.join(directory, "checkpoint_*.npz")), reverse=True
+    )
+
+
+class Autosaver:
+    """Saves rotating checkpoints of a simulation while it runs.
+
+    An autosaver is passed to BioSim.simulate. A checkpoint is due every
+    every_years simulated years and every every_minutes minutes of wall
+    clock time. The state of the simulation is copied on the main thread
+    when a checkpoint is due, and written by a background thread, so the
+    simulation continues while the file is written. It only waits if the
+    previous checkpoint is still being written when the next one is due.
+    Only the newest keep checkpoints are kept.
+
+    If handle_signals is True and the simulation runs in the main thread,
+    SIGINT and SIGTERM stop the simulation after the year that is running,
+    a final checkpoint is written, and KeyboardInterrupt or SystemExit is
+    raised. BioSim.resume continues from the newest valid checkpoint.
+
+    Parameters
+    ----------
+    directory : str
+        Directory the checkpoints are saved in. Made if it does not exist.
+    every_years : int
+        Number of simulated years between checkpoints, or None.
+    every_minutes : float
+        Minutes of wall clock time between checkpoints, or None.
+    keep : int
+        Number of checkpoints kept.
+    handle_signals : bool
+        If True, SIGINT and SIGTERM write a final checkpoint.
+
+    Raises
+    ------
+    ValueError
+        If neither every_years nor every_minutes is given, or keep is not
+        positive.
+    """
+
+    def __init__(
+        self,
+        directory,
+        every_years=None,
+        every_minutes=None,
+        keep=3,
+        handle_signals=True,
+    ):
+        if every_years is None and every_minutes is None:
+            raise ValueError("every_years or every_minutes must be given")
+        if keep < 1:
+            raise ValueError("keep must be positive")
+        self.directory = directory
+        self._every_years = every_years
+        self._every_seconds = (
+            None if every_minutes is None else 60 * every_minutes
+        )
+        self._keep = keep
+        self._handle_signals = handle_signals
+        self._queue = None
+        self._thread = None
+        self._error = None
+        self._last_save = None
+        self._signal = None
+        self._old_handlers = {}
+
+    def start(self):
+        """Starts the writer thread and installs the signal handlers.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+        self._last_save = time.monotonic()
+        self._signal = None
+        if (
+            self._handle_signals
+            and threading.current_thread() is threading.main_thread()
+        ):
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                self._old_handlers[signum] = signal.signal(
+                    signum, self._on_signal
+                )
+
+    def _on_signal(self, signum, frame):
+        self._signal = signum
+
+    def year_done(self, sim):
+        """Saves a checkpoint if one is due, and stops on a signal.
+
+        Parameters
+        ----------
+        sim : BioSim
+            The simulation after a simulated year.
+
+        Raises
+        ------
+        KeyboardInterrupt
+            If SIGINT was received.
+        SystemExit
+            If SIGTERM was received.
+        """
+        if self._error is not None:
+            raise RuntimeError("Autosave failed") from self._error
+        if self._signal is not None:
+            signum = self._signal
+            self.stop()
+            write_checkpoint(self._path(sim.year), sim._checkpoint_arrays())
+            self._rotate()
+            if signum == signal.SIGINT:
+                raise KeyboardInterrupt
+            raise SystemExit(128 + signum)
+        now = time.monotonic()
+        due = (
+            self._every_years is not None
+            and sim.year % self._every_years == 0
+        ) or (
+            self._every_seconds is not None
+            and now - self._last_save >= self._every_seconds
+        )
+        if due:
+            self._queue.put((self._path(sim.year), sim._checkpoint_arrays()))
+            self._last_save = now
+
+    def _path(self, year):
+        return os.path.join(self.directory, f"checkpoint_{year:08d}.npz")
+
+    def _write(self):
+        """Writes the checkpoints from the queue until None arrives.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            path, arrays = item
+            try:
+                write_checkpoint(path, arrays)
+                self._rotate()
+            except Exception as error:
+                self._error = error
+
+    def _rotate(self):
+        """Removes all but the newest checkpoints.
+        """
+        for path in checkpoint_files(self.directory)[self._keep:]:
+            os.remove(path)
+
+    def stop(self):
+        """Waits for the checkpoint being written and restores the signal
+        handlers.
+
+        Raises
+        ------
+        RuntimeError
+            If writing a checkpoint failed.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        for signum, handler in self._old_handlers.items():
+            signal.signal(signum, handler)
+        self._old_handlers = {}
+        if self._error is not None:
+            raise RuntimeError("Autosave failed") from self._error
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import glob
+import hashlib
+import json
+import os
+import textwrap
+import zipfile
+from collections import namedtuple
+import numpy as np
+from . import __version__
+from .checkpoint import read_checkpoint, write_arrays, write_checkpoint
+from .island import Island
+from .recorder import Recorder
+
+RunResult = namedtuple("RunResult", ["recorder", "herbivores", "carnivores"])
+RunResult.__doc__ = """Result of a complete simulation run.
+
+recorder holds the statistics of every year, and herbivores and carnivores
+are arrays with the number of animals of the species in each cell at the
+end of the run.
+"""
+
+
+def operation_key(previous_key, operation):
+    """Returns the key of the state after an operation.
+
+    The key is a SHA-256 hash of the key of the state before the operation
+    and a canonical JSON form of the operation, so equal sequences of
+    operations give equal keys.
+
+    Parameters
+    ----------
+    previous_key : str
+        Key of the state before the operation, or None for the first
+        operation.
+    operation : list
+        Name and arguments of the operation. Must be JSON serializable.
+
+    Returns
+    -------
+    str
+        Hexadecimal key.
+    """
+    digest = hashlib.sha256((previous_key or "").encode())
+    digest.update(
+        json.dumps(operation, sort_keys=True, separators=(",", ":")).encode()
+    )
+    return digest.hexdigest()
+
+
+class _FileCache:
+    """Directory of .npz files named by key, with LRU eviction.
+
+    When the files take more than max_bytes, the least recently used files
+    are removed. A file is used when it is written or read.
+    """
+
+    def __init__(self, directory, max_bytes=2 ** 30):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def __contains__(self, key):
+        return os.path.isfile(self._path(key))
+
+    def _evict(self):
+        """Removes the least recently used files until the cache fits in
+        max_bytes.
+        """
+        files = []
+        for path in glob.glob(os.path.join(self.directory, "*.npz")):
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class StateCache(_FileCache):
+    """On-disk cache of simulation states, keyed by operation keys.
+
+    The states are stored as checkpoint files in a directory. When the
+    files take more than max_bytes, the least recently used files are
+    removed. A file is used when it is written or read.
+
+    Parameters
+    ----------
+    directory : str
+        Directory the states are stored in. Made if it does not exist.
+    max_bytes : int
+        Maximum total size of the stored files.
+
+    Raises
+    ------
+    ValueError
+        If max_bytes is not positive.
+    """
+
+    def get(self, key):
+        """Returns the checkpoint arrays of a state.
+
+        Parameters
+        ----------
+        key : str
+            Key of the state.
+
+        Returns
+        -------
+        dict
+            Checkpoint arrays, or None if the state is not in the cache or
+            cannot be read.
+        """
+        path = self._path(key)
+        try:
+            arrays = read_checkpoint(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            os.remove(path)
+            return None
+        os.utime(path)
+        return arrays
+
+    def put(self, key, arrays):
+        """Stores the checkpoint arrays of a state.
+
+        Parameters
+        ----------
+        key : str
+            Key of the state.
+        arrays : dict
+            Checkpoint arrays.
+        """
+        write_checkpoint(self._path(key), arrays)
+        self._evict()
+
+
+class ResultCache(_FileCache):
+    """On-disk cache of the results of complete headless runs.
+
+    A run is identified by a SHA-256 hash of a canonical form of the map,
+    the initial population, the seed, the random number mode, the complete
+    parameters, the number of years and the version of biosim. Seeded runs
+    are deterministic, so a run that is in the cache is not simulated
+    again. The results are stored as .npz files, and when the files take
+    more than max_bytes, the least recently used ones are removed.
+
+    Parameters
+    ----------
+    directory : str
+        Directory the results are stored in. Made if it does not exist.
+    max_bytes : int
+        Maximum total size of the stored files.
+
+    Attributes
+    ----------
+    hits : int
+        Number of runs taken from the cache.
+    misses : int
+        Number of runs simulated.
+
+    Raises
+    ------
+    ValueError
+        If max_bytes is not positive.
+    """
+
+    def __init__(self, directory, max_bytes=2 ** 30):
+        super().__init__(directory, max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def run(
+        self,
+        island_map,
+        ini_pop,
+        seed,
+        num_years,
+        parameters=None,
+        rng_mode="block",
+    ):
+        """Returns the result of a headless run, simulating it if needed.
+
+        The key is computed from the arguments, so the simulation is only
+        made when the run is not in the cache.
+
+        Parameters
+        ----------
+        island_map : str
+            Multi-line string specifying island geography.
+        ini_pop : list
+            List of dictionaries specifying initial population.
+        seed : int
+            Integer used as random number seed.
+        num_years : int
+            Number of years to simulate.
+        parameters : dict
+            New parameter values by "Herbivore", "Carnivore", "J" or "S",
+            set before the run. The current class level parameters are used
+            for the rest.
+        rng_mode : str
+            "block" or "counter".
+
+        Returns
+        -------
+        RunResult
+            The recorded statistics and the final census.
+
+        Raises
+        ------
+        ValueError
+            If seed is None, or a parameter set does not exist.
+        """
+        from .simulation import BioSim
+
+        if seed is None:
+            raise ValueError("A seed is needed to use a cache")
+        island_map = textwrap.dedent(island_map)
+        run_parameters = Island.class_parameters()
+        for name, values in (parameters or {}).items():
+            if name not in run_parameters:
+                raise ValueError(f"Unknown parameter set {name}")
+            run_parameters = run_parameters.updated(name, values)
+        key = operation_key(
+            None,
+            [
+                "run",
+                __version__,
+                island_map,
+                ini_pop,
+                seed,
+                rng_mode,
+                run_parameters.as_dict(),
+                num_years,
+            ],
+        )
+        path = self._path(key)
+        result = self._read_result(path)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        sim = BioSim(
+            island_map,
+            ini_pop,
+            seed,
+            rng_mode=rng_mode,
+            parameters=run_parameters,
+            headless=True,
+        )
+        recorder = sim.simulate(num_years, vis_years=0)
+        herbivores, carnivores = sim._island.census()
+        arrays = {
+            "recorder_" + field: values
+            for field, values in recorder.as_dict().items()
+        }
+        write_arrays(
+            path, dict(arrays, herbivores=herbivores, carnivores=carnivores)
+        )
+        self._evict()
+        return RunResult(recorder, herbivores, carnivores)
+
+    @staticmethod
+    def _read_result(path):
+        """Reads a stored result.
+
+        A file that cannot be read, e.g. because it is truncated or misses
+        arrays, is removed.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file.
+
+        Returns
+        -------
+        RunResult
+            The stored result, or None if there is no valid result.
+        """
+        try:
+            with np.load(path) as stored:
+                arrays = dict(stored)
+            result = RunResult(
+                Recorder.from_dict(
+                    {
+                        field: arrays["recorder_" + field]
+                        for field in Recorder.FIELDS
+                    }
+                ),
+                arrays["herbivores"],
+                arrays["carnivores"],
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            os.remove(path)
+            return None
+        os.utime(path)
+        return result
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+_SPECIES = ("herb", "carn")
+_ANIMAL_FIELDS = ("age", "weight", "fitness")
+_CELL_KEYS = {"map", "fodder", "cell_digests"} | {
+    f"{prefix}_{field}"
+    for prefix in _SPECIES
+    for field in ("counts",) + _ANIMAL_FIELDS
+}
+
+
+def cell_digests(state):
+    """Computes a digest of the fodder and animals of every cell.
+
+    Parameters
+    ----------
+    state : dict
+        Checkpoint arrays of a full checkpoint.
+
+    Returns
+    -------
+    numpy.ndarray
+        64 bit digest of each cell in row major order.
+    """
+    fodder = state["fodder"].ravel()
+    segments = {}
+    for prefix in _SPECIES:
+        ends = np.cumsum(state[prefix + "_counts"].ravel())
+        starts = ends - state[prefix + "_counts"].ravel()
+        fields = [state[f"{prefix}_{field}"] for field in _ANIMAL_FIELDS]
+        segments[prefix] = (starts.tolist(), ends.tolist(), fields)
+    digests = np.empty(len(fodder), dtype=np.uint64)
+    for cell in range(len(fodder)):
+        digest = hashlib.blake2b(fodder[cell].tobytes(), digest_size=8)
+        for starts, ends, fields in segments.values():
+            start, end = starts[cell], ends[cell]
+            digest.update(np.int64(end - start).tobytes())
+            if end > start:
+                for values in fields:
+                    digest.update(values[start:end].tobytes())
+        digests[cell] = int.from_bytes(digest.digest(), "little")
+    return digests
+
+
+def _digests_id(digests):
+    """Returns a digest of all cell digests, identifying a base checkpoint.
+    """
+    return np.array(hashlib.blake2b(digests.tobytes()).hexdigest())
+
+
+def write_checkpoint(path, arrays):
+    """Writes checkpoint arrays to a file.
+
+    The cell digests used by delta checkpoints are added to full
+    checkpoints. The arrays are written with write_arrays, so a checkpoint
+    is never left half written.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+    arrays : dict
+        Checkpoint arrays.
+    """
+    if "delta" not in arrays and "cell_digests" not in arrays:
+        arrays = dict(arrays, cell_digests=cell_digests(arrays))
+    write_arrays(path, arrays)
+
+
+def write_arrays(path, arrays):
+    """Writes arrays to a NumPy .npz file without leaving it half written.
+
+    The arrays are written to a temporary file of its own in the same
+    directory, which replaces the file at path when it is complete. Two
+    processes writing the same path therefore never write the same file,
+    and the last complete file wins.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+    arrays : dict
+        Arrays by name.
+    """
+    descriptor, temporary_path = tempfile.mkstemp(
+        suffix=".tmp",
+        prefix=os.path.basename(path) + ".",
+        dir=os.path.dirname(path),
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as array_file:
+            np.savez(array_file, **arrays)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def make_delta(arrays, base_path):
+    """Makes delta checkpoint arrays relative to a full base checkpoint.
+
+    Only the cells whose digest differs from the digest in the base are
+    stored, together with the year, the parameters, the state of the
+    random numbers and the years recorded after the base. Only the cell
+    digests and the recorder years are read from the base file.
+
+    Every animal ages every year, so every cell with animals counts as
+    changed, and the digests of all cells are computed. A delta made a
+    year or more after the base is therefore seldom much smaller or
+    faster than a full checkpoint, unless the animals live in a small
+    part of the island.
+
+    Parameters
+    ----------
+    arrays : dict
+        Checkpoint arrays of the current state.
+    base_path : str
+        Path of the full base checkpoint. The delta refers to it by file
+        name, so it must be kept in the same directory as the delta.
+
+    Returns
+    -------
+    dict
+        Arrays of the delta checkpoint.
+
+    Raises
+    ------
+    ValueError
+        If the base is not a full checkpoint.
+    """
+    with np.load(base_path) as base:
+        if "delta" in base.files or "cell_digests" not in base.files:
+            raise ValueError(f"{base_path} is not a full checkpoint")
+        base_digests = base["cell_digests"]
+        base_records = (
+            len(base["recorder_year"]) if "recorder_year" in base.files else 0
+        )
+    digests = cell_digests(arrays)
+    cells = np.flatnonzero(digests != base_digests)
+    delta = {
+        key: value
+        for key, value in arrays.items()
+        if key not in _CELL_KEYS and not key.startswith("recorder_")
+    }
+    delta["delta"] = np.array(1)
+    delta["base"] = np.array(os.path.basename(base_path))
+    delta["base_id"] = _digests_id(base_digests)
+    delta["cells"] = cells
+    delta["fodder"] = arrays["fodder"].ravel()[cells]
+    for prefix in _SPECIES:
+        counts = arrays[prefix + "_counts"].ravel()
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        animals = np.concatenate(
+            [np.arange(starts[cell], ends[cell]) for cell in cells]
+            + [np.zeros(0, dtype=int)]
+        )
+        delta[prefix + "_counts"] = counts[cells]
+        for field in _ANIMAL_FIELDS:
+            values = arrays[f"{prefix}_{field}"]
+            delta[f"{prefix}_{field}"] = values[animals]
+    if "recorder_year" in arrays:
+        start = min(base_records, len(arrays["recorder_year"]))
+        delta["recorder_start"] = np.array(start)
+        for key, values in arrays.items():
+            if key.startswith("recorder_"):
+                delta[key] = values[start:]
+    return delta
+
+
+def apply_delta(base, delta):
+    """Applies delta checkpoint arrays to the arrays of their base.
+
+    Parameters
+    ----------
+    base : dict
+        Arrays of the full base checkpoint.
+    delta : dict
+        Arrays of the delta checkpoint.
+
+    Returns
+    -------
+    dict
+        Arrays of the full checkpoint the delta was made from.
+
+    Raises
+    ------
+    ValueError
+        If the base is not the checkpoint the delta was made from.
+    """
+    if str(_digests_id(base["cell_digests"])) != str(delta["base_id"]):
+        raise ValueError("The delta was not made from this base checkpoint")
+    arrays = {
+        key: value
+        for key, value in base.items()
+        if key in _CELL_KEYS and key != "cell_digests"
+    }
+    arrays.update(
+        (key, value)
+        for key, value in delta.items()
+        if key not in _CELL_KEYS
+        and key not in ("delta", "base", "base_id", "cells")
+        and not key.startswith("recorder_")
+    )
+    cells = delta["cells"]
+    fodder = base["fodder"].copy()
+    fodder.ravel()[cells] = delta["fodder"]
+    arrays["fodder"] = fodder
+    for prefix in _SPECIES:
+        base_counts = base[prefix + "_counts"].ravel()
+        changed = np.zeros(len(base_counts), dtype=bool)
+        changed[cells] = True
+        counts = base_counts.copy()
+        counts[cells] = delta[prefix + "_counts"]
+        arrays[prefix + "_counts"] = counts.reshape(
+            base[prefix + "_counts"].shape
+        )
+        base_cells = np.repeat(np.arange(len(base_counts)), base_counts)
+        kept = ~changed[base_cells]
+        cell_order = np.argsort(
+            np.concatenate(
+                (
+                    base_cells[kept],
+                    np.repeat(cells, delta[prefix + "_counts"]),
+                )
+            ),
+            kind="stable",
+        )
+        for field in _ANIMAL_FIELDS:
+            key = f"{prefix}_{field}"
+            arrays[key] = np.concatenate((base[key][kept], delta[key]))[
+                cell_order
+            ]
+    if "recorder_start" in delta:
+        start = int(delta["recorder_start"])
+        for key, values in delta.items():
+            if key.startswith("recorder_") and key != "recorder_start":
+                arrays[key] = np.concatenate((base[key][:start], values))
+    return arrays
+
+
+def read_checkpoint(path):
+    """Reads the arrays of a full or delta checkpoint.
+
+    A delta checkpoint is applied to its base, which is read from the
+    same directory.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+
+    Returns
+    -------
+    dict
+        Arrays of a full checkpoint.
+    """
+    with np.load(path) as checkpoint:
+        arrays = dict(checkpoint)
+    if "delta" in arrays:
+        base_path = os.path.join(
+            os.path.dirname(path), str(arrays["base"])
+        )
+        with np.load(base_path) as base:
+            arrays = apply_delta(dict(base), arrays)
+    return arrays
+
+
+def compact_checkpoint(path, compacted_path):
+    """Merges a delta checkpoint and its base into a full checkpoint.
+
+    The new full checkpoint can be the base of later deltas, and the old
+    base and deltas can be removed when they are no longer needed.
+
+    Parameters
+    ----------
+    path : str
+        Path of the delta checkpoint.
+    compacted_path : str
+        Path of the full checkpoint written.
+    """
+    write_checkpoint(compacted_path, read_checkpoint(path))
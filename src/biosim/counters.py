@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import threading
+import numpy as np
+
+OPERATIONS = (
+    "rng_draws",
+    "exp_calls",
+    "sorts",
+    "sorted_elements",
+    "list_removes",
+    "births",
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+
+#: Number of threads that are counting. The hot paths only look up the
+#: counts of their thread when it is not zero.
+active = 0
+
+
+def add(operation, n=1):
+    """Adds to the count of an operation in the current thread.
+
+    Nothing is counted if the thread is not counting.
+
+    Parameters
+    ----------
+    operation : str
+        One of OPERATIONS.
+    n : int
+        Number of operations done.
+    """
+    counts = getattr(_local, "counts", None)
+    if counts is not None:
+        counts[operation] += n
+
+
+class OperationCounts:
+    """Counts of the work done in each year of the annual cycle.
+
+    A counter is given to an Island, which then counts, for every year, the
+    random numbers handed out, the math.exp calls in fitness_update and
+    migration, the sorts and sorted elements when the animals feed, the
+    list.remove calls and the animals made by births. The counts are kept
+    per thread, so simulations in different threads do not mix.
+
+    Attributes
+    ----------
+    years : list
+        The years that have been counted.
+    """
+
+    def __init__(self):
+        self.years = []
+        self._counts = []
+        self._first_draw = 0
+
+    def start_year(self, year, rng):
+        """Starts counting a year in the current thread.
+
+        Parameters
+        ----------
+        year : int
+            The year being simulated, counted from 1.
+        rng : RandomBuffer or CounterRandom
+            Source of the random numbers of the island.
+        """
+        global active
+        if getattr(_local, "counts", None) is None:
+            with _lock:
+                active += 1
+        _local.counts = dict.fromkeys(OPERATIONS, 0)
+        self.years.append(year)
+        self._first_draw = rng.draws
+
+    def end_year(self, rng):
+        """Stops counting and stores the counts of the year.
+
+        Parameters
+        ----------
+        rng : RandomBuffer or CounterRandom
+            Source of the random numbers of the island.
+        """
+        global active
+        counts = _local.counts
+        _local.counts = None
+        with _lock:
+            active -= 1
+        counts["rng_draws"] = rng.draws - self._first_draw
+        self._counts.append([counts[operation] for operation in OPERATIONS])
+
+    def abort_year(self):
+        """Stops counting a year that did not finish, without storing it.
+        """
+        global active
+        if getattr(_local, "counts", None) is not None:
+            _local.counts = None
+            with _lock:
+                active -= 1
+            self.years.pop()
+
+    def __len__(self):
+        return len(self.years)
+
+    def __getitem__(self, operation):
+        """Returns an array with the count of an operation in every year.
+        """
+        return self.as_array()[:, OPERATIONS.index(operation)]
+
+    def as_array(self):
+        """Returns an array of shape (years, operations) with the counts.
+        """
+        return np.array(self._counts, dtype=np.int64).reshape(
+            -1, len(OPERATIONS)
+        )
+
+    def as_dict(self):
+        """Returns the counts as arrays.
+
+        Returns
+        -------
+        dict
+            "year" and an array with the count of every operation by year.
+        """
+        counts = self.as_array()
+        arrays = {"year": np.array(self.years, dtype=np.int64)}
+        for index, operation in enumerate(OPERATIONS):
+            arrays[operation] = counts[:, index]
+        return arrays
@@ -0,0 +1,747 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import json
+import lzma
+import os
+import queue
+import threading
+import zlib
+import numpy as np
+
+
+class CensusWriter:
+    """Writes the census of every year to disk from a background thread.
+
+    The writer is registered as a year observer on a BioSim or Island. The
+    census grids of each year are copied into a chunk in memory, and full
+    chunks are handed to a writer thread through a bounded queue, so the
+    simulation only waits on the disk if the writer falls more than
+    max_queue chunks behind.
+
+    In "npy" format every chunk is written as a .npy block of shape
+    (years, 2, rows, columns), where index 0 and 1 of the second axis are
+    herbivores and carnivores, and an index.json file listing the blocks and
+    their years is written when the writer is closed. In "csv" format rows
+    of Year, Row, Col, Herbivore, Carnivore are appended to census.csv.
+
+    Parameters
+    ----------
+    path : str
+        Directory the files are written to. Made if it does not exist.
+    fmt : str
+        "npy" or "csv".
+    chunk_years : int
+        Number of years collected before a chunk is written.
+    max_queue : int
+        Maximum number of chunks waiting to be written.
+
+    Raises
+    ------
+    ValueError
+        If the format is unknown or chunk_years or max_queue is not positive.
+    """
+
+    def __init__(self, path, fmt="npy", chunk_years=64, max_queue=4):
+        if fmt not in ("npy", "csv"):
+            raise ValueError(f"Unknown census format {fmt}")
+        if chunk_years < 1 or max_queue < 1:
+            raise ValueError("chunk_years and max_queue must be positive")
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._fmt = fmt
+        self._chunk_years = chunk_years
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._chunk = None
+        self._years = []
+        self._index = []
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self._thread.start()
+
+    def __call__(self, event):
+        """Adds the census of a year to the current chunk.
+
+        Parameters
+        ----------
+        event : PhaseEvent
+            Event with the year and the census grids.
+        """
+        if self._error is not None:
+            raise RuntimeError("Census writer failed") from self._error
+        if self._chunk is None:
+            self._chunk = np.empty(
+                (self._chunk_years, 2) + event.herbivores.shape, dtype=np.int32
+            )
+        position = len(self._years)
+        self._chunk[position, 0] = event.herbivores
+        self._chunk[position, 1] = event.carnivores
+        self._years.append(event.year)
+        if len(self._years) == self._chunk_years:
+            self._flush()
+
+    def _flush(self):
+        """Hands the current chunk to the writer thread.
+        """
+        if self._years:
+            self._queue.put((self._years, self._chunk[: len(self._years)]))
+            self._years = []
+            self._chunk = np.empty_like(self._chunk)
+
+    def _write_chunks(self):
+        """Writes chunks from the queue until the closing None arrives.
+        """
+        csv_file = None
+        done = False
+        try:
+            if self._fmt == "csv":
+                csv_file = open(
+                    os.path.join(self._path, "census.csv"),
+                    "w",
+                    buffering=1 << 20,
+                )
+                csv_file.write("Year,Row,Col,Herbivore,Carnivore\n")
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    done = True
+                    break
+                years, chunk = item
+                if self._fmt == "npy":
+                    self._write_npy(years, chunk)
+                else:
+                    self._write_csv(csv_file, years, chunk)
+            if self._fmt == "npy":
+                self._write_index()
+        except Exception as error:
+            self._error = error
+            # Keeps emptying the queue so the simulation is never blocked
+            while not done:
+                done = self._queue.get() is None
+        finally:
+            if csv_file is not None:
+                csv_file.close()
+
+    def _write_npy(self, years, chunk):
+        """Writes a chunk as a .npy block and adds it to the index.
+        """
+        name = f"block_{len(self._index):05d}.npy"
+        np.save(os.path.join(self._path, name), chunk)
+        self._index.append(
+            {"file": name, "first_year": years[0], "last_year": years[-1]}
+        )
+
+    def _write_index(self):
+        """Writes the index of the blocks.
+        """
+        with open(os.path.join(self._path, "index.json"), "w") as index_file:
+            json.dump(self._index, index_file)
+
+    @staticmethod
+    def _write_csv(csv_file, years, chunk):
+        """Appends a chunk to the CSV file.
+        """
+        num_years, _, rows, columns = chunk.shape
+        row_index, column_index = np.indices((rows, columns))
+        table = np.column_stack(
+            (
+                np.repeat(years, rows * columns),
+                np.tile(row_index.ravel(), num_years),
+                np.tile(column_index.ravel(), num_years),
+                chunk[:, 0].ravel(),
+                chunk[:, 1].ravel(),
+            )
+        )
+        np.savetxt(csv_file, table, fmt="%d", delimiter=",")
+
+    def close(self):
+        """Writes the remaining years and waits for the writer thread.
+
+        Raises
+        ------
+        RuntimeError
+            If writing failed.
+        """
+        if not self._closed:
+            self._closed = True
+            self._flush()
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("Census writer failed") from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_census(path):
+    """Loads census blocks written by a CensusWriter in "npy" format.
+
+    Parameters
+    ----------
+    path : str
+        Directory the census was written to.
+
+    Returns
+    -------
+    tuple
+        Array of the years, and array of shape (years, 2, rows, columns)
+        with the herbivores and carnivores in each cell.
+    """
+    with open(os.path.join(path, "index.json")) as index_file:
+        index = json.load(index_file)
+    blocks = [np.load(os.path.join(path, entry["file"])) for entry in index]
+    years = np.concatenate(
+        [
+            np.arange(entry["first_year"], entry["last_year"] + 1)
+            for entry in index
+        ]
+    )
+    return years, np.concatenate(blocks)
+
+
+class CensusHistory:
+    """On-disk census history written through a NumPy memory map.
+
+    The history is an int32 array of shape (years, rows, columns, species)
+    in the file history.dat, with the shape and first year in history.json.
+    The file grows in steps of capacity_years as years are appended, so the
+    history never has to fit in memory, and the queries only read the pages
+    of the file they touch.
+
+    The history is registered as a year observer on a BioSim or Island to
+    be written as the simulation runs, and read later with open.
+
+    Parameters
+    ----------
+    path : str
+        Directory the files are written to. Made if it does not exist.
+    capacity_years : int
+        Number of years the file grows by when it is full.
+
+    Attributes
+    ----------
+    SPECIES : tuple
+        Names of the species in the order of the last axis.
+    """
+
+    SPECIES = ("Herbivore", "Carnivore")
+
+    def __init__(self, path, capacity_years=256):
+        if capacity_years < 1:
+            raise ValueError("capacity_years must be positive")
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._capacity_years = capacity_years
+        self._data = None
+        self._shape = None
+        self._first_year = None
+        self._length = 0
+        self._writable = True
+
+    @classmethod
+    def open(cls, path):
+        """Opens a history for reading.
+
+        Parameters
+        ----------
+        path : str
+            Directory the history was written to.
+
+        Returns
+        -------
+        CensusHistory
+            Read-only history.
+        """
+        history = cls.__new__(cls)
+        history._path = path
+        history._writable = False
+        with open(os.path.join(path, "history.json")) as info_file:
+            info = json.load(info_file)
+        history._shape = (info["rows"], info["columns"])
+        history._first_year = info["first_year"]
+        history._length = info["years"]
+        history._data = None
+        if history._length > 0:
+            history._data = np.memmap(
+                history._file_name,
+                dtype=np.int32,
+                mode="r",
+                shape=(history._length,) + history._shape + (2,),
+            )
+        return history
+
+    @property
+    def _file_name(self):
+        return os.path.join(self._path, "history.dat")
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def years(self):
+        """Array of the years in the history.
+        """
+        if self._length == 0:
+            return np.arange(0)
+        return np.arange(self._first_year, self._first_year + self._length)
+
+    def __call__(self, event):
+        """Appends the census of a year to the history.
+
+        Parameters
+        ----------
+        event : PhaseEvent
+            Event with the year and the census grids.
+        """
+        self.append(event.year, event.herbivores, event.carnivores)
+
+    def append(self, year, herb_grid, carn_grid):
+        """Appends the census of a year to the history.
+
+        Parameters
+        ----------
+        year : int
+            The year, which must follow the last year in the history.
+        herb_grid, carn_grid : numpy.ndarray
+            Number of herbivores and carnivores in each cell.
+
+        Raises
+        ------
+        ValueError
+            If the history is read-only, or the year does not follow the
+            last year.
+        """
+        if not self._writable:
+            raise ValueError("History is opened read-only")
+        if self._data is None:
+            self._shape = herb_grid.shape
+            self._first_year = year
+            self._resize(self._capacity_years)
+        elif year != self._first_year + self._length:
+            raise ValueError(
+                f"Year {year} does not follow year "
+                f"{self._first_year + self._length - 1}"
+            )
+        if self._length == len(self._data):
+            self._resize(self._length + self._capacity_years)
+        self._data[self._length, :, :, 0] = herb_grid
+        self._data[self._length, :, :, 1] = carn_grid
+        self._length += 1
+
+    def _resize(self, num_years):
+        """Truncates or extends the file to room for a number of years and
+        maps it again.
+        """
+        if self._data is not None:
+            self._data.flush()
+            self._data = None
+        cell_bytes = self._shape[0] * self._shape[1] * 2 * 4
+        with open(self._file_name, "ab") as data_file:
+            data_file.truncate(num_years * cell_bytes)
+        self._data = np.memmap(
+            self._file_name,
+            dtype=np.int32,
+            mode="r+",
+            shape=(num_years,) + self._shape + (2,),
+        )
+
+    def flush(self):
+        """Writes the appended years and the shape to disk.
+        """
+        if not self._writable or self._data is None:
+            return
+        self._data.flush()
+        with open(os.path.join(self._path, "history.json"), "w") as info_file:
+            json.dump(
+                {
+                    "rows": self._shape[0],
+                    "columns": self._shape[1],
+                    "species": list(self.SPECIES),
+                    "first_year": self._first_year,
+                    "years": self._length,
+                },
+                info_file,
+            )
+
+    def close(self):
+        """Flushes the history and truncates the file to the years written.
+        """
+        if self._writable and self._data is not None:
+            self._resize(self._length)
+            self.flush()
+            self._writable = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _year_index(self, year):
+        index = year - self._first_year
+        if self._length == 0 or not 0 <= index < self._length:
+            raise KeyError(f"Year {year} is not in the history")
+        return index
+
+    def _species_index(self, species):
+        if species is None:
+            return slice(None)
+        if species not in self.SPECIES:
+            raise ValueError(f"Unknown species {species}")
+        return self.SPECIES.index(species)
+
+    def _year_slice(self, first_year, last_year):
+        start = 0 if first_year is None else self._year_index(first_year)
+        stop = (
+            self._length
+            if last_year is None
+            else self._year_index(last_year) + 1
+        )
+        return slice(start, stop)
+
+    def map_at(self, year, species=None):
+        """Returns the census of all cells in a year.
+
+        Parameters
+        ----------
+        year : int
+            The year.
+        species : str
+            "Herbivore" or "Carnivore", or None for both.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (rows, columns), or (rows, columns, 2) if species
+            is None.
+        """
+        index = self._year_index(year)
+        return np.array(self._data[index, :, :, self._species_index(species)])
+
+    def cell_series(
+        self, row, column, species=None, first_year=None, last_year=None
+    ):
+        """Returns the number of animals in one cell for a range of years.
+
+        Parameters
+        ----------
+        row, column : int
+            Position of the cell.
+        species : str
+            "Herbivore" or "Carnivore", or None for both.
+        first_year, last_year : int
+            Years the series starts and ends at, including both. None is
+            the first or last year in the history.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array with a value for each year, with a last axis of length 2
+            if species is None.
+        """
+        return np.array(
+            self._data[
+                self._year_slice(first_year, last_year),
+                row,
+                column,
+                self._species_index(species),
+            ]
+        )
+
+    def region_sum(
+        self, rows, columns, species=None, first_year=None, last_year=None
+    ):
+        """Returns the number of animals in a region for a range of years.
+
+        Parameters
+        ----------
+        rows, columns : slice
+            Rows and columns of the region.
+        species : str
+            "Herbivore" or "Carnivore", or None for both.
+        first_year, last_year : int
+            Years the sums start and end at, including both. None is the
+            first or last year in the history.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sum over the region for each year, with a last axis of length 2
+            if species is None.
+        """
+        region = self._data[
+            self._year_slice(first_year, last_year),
+            rows,
+            columns,
+            self._species_index(species),
+        ]
+        return region.sum(axis=(1, 2), dtype=np.int64)
+
+
+class CompressedCensusHistory:
+    """Census history stored as compressed year-to-year deltas.
+
+    The years are stored in chunks of keyframe_years years. The first year
+    of a chunk is a keyframe holding the occupied cells, and the following
+    years hold the cells that changed since the year before, so a year is
+    found by decompressing only its own chunk. Every year is stored
+    sparsely as flat cell indices and values, and the chunks are
+    compressed with zlib or lzma and appended to census.z, with
+    index.json listing the chunks.
+
+    The history is registered as a year observer on a BioSim or Island to
+    be written as the simulation runs, and read later with open.
+
+    Parameters
+    ----------
+    path : str
+        Directory the files are written to. Made if it does not exist.
+    keyframe_years : int
+        Number of years in a chunk.
+    compression : str
+        "zlib" or "lzma".
+
+    Raises
+    ------
+    ValueError
+        If the compression is unknown or keyframe_years is not positive.
+    """
+
+    _COMPRESSORS = {"zlib": zlib, "lzma": lzma}
+
+    def __init__(self, path, keyframe_years=64, compression="zlib"):
+        if compression not in self._COMPRESSORS:
+            raise ValueError(f"Unknown compression {compression}")
+        if keyframe_years < 1:
+            raise ValueError("keyframe_years must be positive")
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._keyframe_years = keyframe_years
+        self._compression = compression
+        self._shape = None
+        self._chunks = []
+        self._writable = True
+        self._first_year = None
+        self._length = 0
+        self._previous = None
+        self._deltas = []
+        self._cached = (None, None)
+        open(self._file_name, "wb").close()
+
+    @classmethod
+    def open(cls, path):
+        """Opens a history for reading.
+
+        Parameters
+        ----------
+        path : str
+            Directory the history was written to.
+
+        Returns
+        -------
+        CompressedCensusHistory
+            Read-only history.
+        """
+        history = cls.__new__(cls)
+        history._path = path
+        history._writable = False
+        history._cached = (None, None)
+        with open(os.path.join(path, "index.json")) as index_file:
+            index = json.load(index_file)
+        history._shape = (index["rows"], index["columns"])
+        history._keyframe_years = index["keyframe_years"]
+        history._compression = index["compression"]
+        history._chunks = index["chunks"]
+        history._first_year = index["first_year"]
+        history._length = index["years"]
+        return history
+
+    @property
+    def _file_name(self):
+        return os.path.join(self._path, "census.z")
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def years(self):
+        """Array of the years in the history.
+        """
+        if self._length == 0:
+            return np.arange(0)
+        return np.arange(self._first_year, self._first_year + self._length)
+
+    def __call__(self, event):
+        """Appends the census of a year to the history.
+
+        Parameters
+        ----------
+        event : PhaseEvent
+            Event with the year and the census grids.
+        """
+        self.append(event.year, event.herbivores, event.carnivores)
+
+    def append(self, year, herb_grid, carn_grid):
+        """Appends the census of a year to the history.
+
+        Parameters
+        ----------
+        year : int
+            The year, which must follow the last year in the history.
+        herb_grid, carn_grid : numpy.ndarray
+            Number of herbivores and carnivores in each cell.
+
+        Raises
+        ------
+        ValueError
+            If the history is read-only, or the year does not follow the
+            last year.
+        """
+        if not self._writable:
+            raise ValueError("History is opened read-only")
+        if self._shape is None:
+            self._shape = herb_grid.shape
+            self._first_year = year
+        elif year != self._first_year + self._length:
+            raise ValueError(
+                f"Year {year} does not follow year "
+                f"{self._first_year + self._length - 1}"
+            )
+        grid = np.stack((herb_grid, carn_grid), axis=-1).astype(np.int32)
+        grid = grid.ravel()
+        if self._previous is None:
+            changed = np.flatnonzero(grid)
+            delta = grid[changed]
+        else:
+            difference = grid - self._previous
+            changed = np.flatnonzero(difference)
+            delta = difference[changed]
+        self._deltas.append((changed.astype(np.int32), delta))
+        self._previous = grid
+        self._length += 1
+        if len(self._deltas) == self._keyframe_years:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        """Compresses the collected years and appends them to the file.
+        """
+        if not self._deltas:
+            return
+        sizes = np.array([len(changed) for changed, _ in self._deltas])
+        payload = np.concatenate(
+            [sizes.astype(np.int32)]
+            + [changed for changed, _ in self._deltas]
+            + [delta for _, delta in self._deltas]
+        ).astype(np.int32)
+        data = self._COMPRESSORS[self._compression].compress(
+            payload.tobytes()
+        )
+        with open(self._file_name, "ab") as data_file:
+            offset = data_file.tell()
+            data_file.write(data)
+        self._chunks.append(
+            {"offset": offset, "size": len(data), "years": len(self._deltas)}
+        )
+        self._deltas = []
+        self._previous = None
+
+    def close(self):
+        """Writes the remaining years and the index.
+        """
+        if not self._writable:
+            return
+        self._write_chunk()
+        with open(os.path.join(self._path, "index.json"), "w") as index_file:
+            json.dump(
+                {
+                    "rows": None if self._shape is None else self._shape[0],
+                    "columns": None if self._shape is None else self._shape[1],
+                    "keyframe_years": self._keyframe_years,
+                    "compression": self._compression,
+                    "first_year": self._first_year,
+                    "years": self._length,
+                    "chunks": self._chunks,
+                },
+                index_file,
+            )
+        self._writable = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _decode_chunk(self, chunk_index):
+        """Returns the cumulative census of every year in a chunk.
+
+        The last decoded chunk is kept, so reading the years of a chunk in
+        turn only decompresses it once.
+        """
+        if self._cached[0] == chunk_index:
+            return self._cached[1]
+        chunk = self._chunks[chunk_index]
+        with open(os.path.join(self._path, "census.z"), "rb") as data_file:
+            data_file.seek(chunk["offset"])
+            data = data_file.read(chunk["size"])
+        payload = np.frombuffer(
+            self._COMPRESSORS[self._compression].decompress(data),
+            dtype=np.int32,
+        )
+        num_years = chunk["years"]
+        sizes = payload[:num_years]
+        total = sizes.sum()
+        changed = payload[num_years: num_years + total]
+        deltas = payload[num_years + total:]
+        maps = np.zeros(
+            (num_years, self._shape[0] * self._shape[1] * 2), dtype=np.int32
+        )
+        ends = np.cumsum(sizes)
+        for year in range(num_years):
+            start = ends[year] - sizes[year]
+            maps[year, changed[start: ends[year]]] = deltas[
+                start: ends[year]
+            ]
+        maps = np.cumsum(maps, axis=0, dtype=np.int32).reshape(
+            (num_years,) + self._shape + (2,)
+        )
+        self._cached = (chunk_index, maps)
+        return maps
+
+    def map_at(self, year, species=None):
+        """Returns the census of all cells in a year.
+
+        Parameters
+        ----------
+        year : int
+            The year.
+        species : str
+            "Herbivore" or "Carnivore", or None for both.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (rows, columns), or (rows, columns, 2) if species
+            is None.
+
+        Raises
+        ------
+        KeyError
+            If the year is not written to the history.
+        """
+        index = year - (0 if self._first_year is None else self._first_year)
+        written = sum(chunk["years"] for chunk in self._chunks)
+        if self._first_year is None or not 0 <= index < written:
+            raise KeyError(f"Year {year} is not in the history")
+        chunk_index, position = divmod(index, self._keyframe_years)
+        census = self._decode_chunk(chunk_index)[position]
+        if species is None:
+            return census.copy()
+        return census[:, :, CensusHistory.SPECIES.index(species)].copy()
@@ -3,8 +3,37 @@
 __author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
 __email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
 
+import json
+import time
+import numpy as np
+from collections import namedtuple
+from . import counters
+from .profiling import PHASES
 from .landscape import Ocean, Mountain, Jungle, Savannah, Desert
 from .animals import Herb, Carn
+from .parameters import (
+    AnimalParameters,
+    LandscapeParameters,
+    SimulationParameters,
+)
+from .rng import (
+    RandomBuffer,
+    CounterRandom,
+    FEEDING,
+    PROCREATION,
+    MIGRATION,
+    DEATH,
+)
+
+PhaseEvent = namedtuple(
+    "PhaseEvent", ["year", "phase", "herbivores", "carnivores"]
+)
+PhaseEvent.__doc__ = """Event passed to observers after a phase of the year.
+
+herbivores and carnivores are read only views of arrays with the number
+of animals of the species in each cell, or None for observers that did
+not ask for the census.
+"""
 
 
 class Island:
@@ -16,6 +45,17 @@ class Island:
         A multiline string with letters mapping to landscape type.
     ini_pop : list
         An initial population of animals placed on the island
+    seed : int
+        Seed for the random numbers used in the annual cycle.
+    rng_mode : str
+        "block" draws all random numbers from one stream in large blocks.
+        "counter" gives every phase in every cell and year its own stream
+        keyed by (seed, year, cell, phase).
+    parameters : SimulationParameters or dict
+        Parameters for the species and landscape types of this island. A
+        dictionary of dictionaries, like the one returned by as_dict, is
+        converted with SimulationParameters.from_dict. If None, the current
+        parameters of the Herb, Carn, Jungle and Savannah classes are used.
 
     Attributes
     ----------
@@ -25,6 +65,32 @@ class Island:
         Number of columns on the map
     map_rows : int
         Number of rows on the map
+    rng : RandomBuffer or CounterRandom
+        Source of the random numbers used in the annual cycle.
+    year : int
+        Number of years that have passed on the island.
+    parameters : SimulationParameters
+        Parameters for the species and landscape types of this island.
+    species : dict
+        Animal classes bound to the island's parameters, by species name.
+    births : dict
+        Number of animals of each species born in the last year.
+    deaths : dict
+        Number of animals of each species that died or were eaten in the
+        last year.
+    totals : dict
+        Number of animals of each species on the island. Kept up to date by
+        add_population and one_year, so animals put directly into the cell
+        lists are only counted after recount is called.
+    profile : PhaseProfile
+        Time and animals of each phase of the years, if profiling is on.
+        None turns profiling off.
+    cell_profile : CellProfile
+        Time of each phase in each cell of sampled years, if sampling is on.
+        None turns sampling off.
+    counters : OperationCounts
+        Counts of the operations done in the years, if counting is on.
+        None turns counting off.
     Raises
     ------
     ValueError
@@ -33,17 +99,62 @@ class Island:
         If the island_map parameter contains invalid character.
     ValueError
         If the island is not surrounded by ocean.
+    ValueError
+        If the rng_mode is not "block" or "counter".
+    TypeError
+        If parameters is not a SimulationParameters or a dict.
     """
 
-    def __init__(self, island_map, ini_pop=None):
+    def __init__(
+        self,
+        island_map,
+        ini_pop=None,
+        seed=None,
+        rng_mode="block",
+        parameters=None,
+    ):
         self.map_list = []
+        self._island_map = island_map
+        self._rng_mode = rng_mode
+        if rng_mode == "block":
+            self.rng = RandomBuffer(seed)
+        elif rng_mode == "counter":
+            self.rng = CounterRandom(seed)
+        else:
+            raise ValueError(f"Unknown random number mode {rng_mode}")
+        self.year = 0
+        self.births = {"Herbivore": 0, "Carnivore": 0}
+        self.deaths = {"Herbivore": 0, "Carnivore": 0}
+        self.totals = {"Herbivore": 0, "Carnivore": 0}
+        self.profile = None
+        self.cell_profile = None
+        self._cell_costs = None
+        self.counters = None
+        if parameters is None:
+            parameters = self.class_parameters()
+        elif isinstance(parameters, dict):
+            parameters = SimulationParameters.from_dict(parameters)
+        elif not isinstance(parameters, SimulationParameters):
+            raise TypeError(
+                "parameters must be a SimulationParameters or a dict, got: "
+                f"{type(parameters).__name__}"
+            )
+        self.parameters = parameters
+        self.species = {
+            "Herbivore": Herb.with_parameters(parameters["Herbivore"]),
+            "Carnivore": Carn.with_parameters(parameters["Carnivore"]),
+        }
+        self._landscapes = {
+            "J": Jungle.with_parameters(parameters["J"]),
+            "S": Savannah.with_parameters(parameters["S"]),
+        }
         self.map_columns = len(island_map.splitlines()[0])
         self.map_rows = len(island_map.splitlines())
         map_dict = {
             "O": Ocean,
-            "S": Savannah,
+            "S": self._landscapes["S"],
             "M": Mountain,
-            "J": Jungle,
+            "J": self._landscapes["J"],
             "D": Desert,
         }
         for line in island_map.splitlines():
@@ -73,9 +184,79 @@ class Island:
                 self.map_list[nature_square][len(self.map_list[0]) - 1], Ocean
             ):
                 raise ValueError("Island not surrounded by ocean")
+        self._habitable_cells = [
+            (row * self.map_columns + column, nature_square)
+            for row, squares in enumerate(self.map_list)
+            for column, nature_square in enumerate(squares)
+            if nature_square.habitable
+        ]
+        self._observers = {
+            "feeding": [],
+            "procreation": [],
+            "migration": [],
+            "death": [],
+            "year": [],
+        }
+        self._herb_grid = np.zeros((self.map_rows, self.map_columns), int)
+        self._carn_grid = np.zeros((self.map_rows, self.map_columns), int)
+        self._herb_view = self._herb_grid.view()
+        self._herb_view.flags.writeable = False
+        self._carn_view = self._carn_grid.view()
+        self._carn_view.flags.writeable = False
         if ini_pop:
             self.add_population(population=ini_pop)
 
+    @staticmethod
+    def class_parameters():
+        """Returns the current parameters of the animal and landscape classes.
+
+        Returns
+        -------
+        SimulationParameters
+            Parameter sets for Herbivore, Carnivore, J and S.
+        """
+        if Herb.parameters is None:
+            Herb.set_default_parameters_for_species()
+        if Carn.parameters is None:
+            Carn.set_default_parameters_for_species()
+        if Jungle.parameters is None:
+            Jungle.set_default_parameters_for_jungle()
+        if Savannah.parameters is None:
+            Savannah.set_default_parameters_for_savannah()
+        return SimulationParameters(
+            {
+                "Herbivore": AnimalParameters(Herb.parameters),
+                "Carnivore": AnimalParameters(Carn.parameters),
+                "J": LandscapeParameters(Jungle.parameters),
+                "S": LandscapeParameters(Savannah.parameters),
+            }
+        )
+
+    def set_parameters(self, name, new_params):
+        """Updates the parameters of a species or landscape on this island.
+
+        Only the animals and cells of this island are affected.
+
+        Parameters
+        ----------
+        name : str
+            "Herbivore", "Carnivore", "J" or "S".
+        new_params : dict
+            New values for the parameters.
+
+        Raises
+        ------
+        KeyError
+            If a parameter does not exist.
+        ValueError
+            If a parameter value is not valid.
+        """
+        self.parameters = self.parameters.updated(name, new_params)
+        if name in self.species:
+            self.species[name].bind_parameters(self.parameters[name])
+        else:
+            self._landscapes[name].bind_parameters(self.parameters[name])
+
     def add_population(self, population):
         """Adds a population of animals to a given location on the island.
 
@@ -107,21 +288,151 @@ class Island:
             animal_pop = square["pop"]
             for animal in animal_pop:
                 if animal["species"] == "Carnivore":
-                    animal_object = Carn()
-                    animal_object.a = animal["age"]
-                    animal_object.weight = animal["weight"]
-                    animal_object.fitness_update()
+                    animal_object = self.species["Carnivore"].from_state(
+                        animal["age"], animal["weight"]
+                    )
                     nature_square.carn_list.append(animal_object)
+                    self.totals["Carnivore"] += 1
 
                 elif animal["species"] == "Herbivore":
-                    animal_object = Herb()
-                    animal_object.a = animal["age"]
-                    animal_object.weight = animal["weight"]
-                    animal_object.fitness_update()
+                    animal_object = self.species["Herbivore"].from_state(
+                        animal["age"], animal["weight"]
+                    )
                     nature_square.herb_list.append(animal_object)
+                    self.totals["Herbivore"] += 1
                 else:
                     raise ValueError("Incorrect Species name in dict")
 
+    def get_state(self):
+        """Returns the state of the island as NumPy arrays.
+
+        The animals are stored cell by cell in row major order, and in the
+        order of the lists of each cell, so the island made by from_state
+        continues exactly like this one.
+
+        Returns
+        -------
+        dict
+            Arrays with the map, the parameters, the year, the fodder and
+            the number of animals in each cell, the age, weight and fitness
+            of all animals of each species, and the state of the random
+            numbers with keys starting with "rng_".
+        """
+        state = {
+            "map": np.array(self._island_map),
+            "random_mode": np.array(self._rng_mode),
+            "parameters": np.array(json.dumps(self.parameters.as_dict())),
+            "year": np.array(self.year),
+            "births": np.array(
+                [self.births["Herbivore"], self.births["Carnivore"]]
+            ),
+            "deaths": np.array(
+                [self.deaths["Herbivore"], self.deaths["Carnivore"]]
+            ),
+            "fodder": np.array(
+                [[square.fodder for square in row] for row in self.map_list],
+                dtype=float,
+            ),
+        }
+        for prefix, list_name in (
+            ("herb", "herb_list"),
+            ("carn", "carn_list"),
+        ):
+            animals = [
+                animal
+                for row in self.map_list
+                for nature_square in row
+                for animal in getattr(nature_square, list_name)
+            ]
+            state[prefix + "_counts"] = np.array(
+                [
+                    [len(getattr(square, list_name)) for square in row]
+                    for row in self.map_list
+                ],
+                dtype=int,
+            )
+            state[prefix + "_age"] = np.array(
+                [animal.a for animal in animals], dtype=int
+            )
+            state[prefix + "_weight"] = np.array(
+                [animal.weight for animal in animals], dtype=float
+            )
+            state[prefix + "_fitness"] = np.array(
+                [animal.fitness for animal in animals], dtype=float
+            )
+        for key, value in self.rng.get_state().items():
+            state["rng_" + key] = value
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Makes an island from a state returned by get_state.
+
+        Parameters
+        ----------
+        state : dict
+            State of an island.
+
+        Returns
+        -------
+        Island
+            Island that continues like the one the state was taken from.
+        """
+        island = cls(
+            str(state["map"]),
+            rng_mode=str(state["random_mode"]),
+            parameters=SimulationParameters.from_dict(
+                json.loads(str(state["parameters"]))
+            ),
+        )
+        island.rng.set_state(
+            {
+                key[len("rng_"):]: value
+                for key, value in state.items()
+                if key.startswith("rng_")
+            }
+        )
+        island.year = int(state["year"])
+        island.births = dict(
+            zip(("Herbivore", "Carnivore"), state["births"].tolist())
+        )
+        island.deaths = dict(
+            zip(("Herbivore", "Carnivore"), state["deaths"].tolist())
+        )
+        fodder = state["fodder"].tolist()
+        for row, squares in enumerate(island.map_list):
+            for column, nature_square in enumerate(squares):
+                nature_square.fodder = fodder[row][column]
+        for prefix, list_name, species in (
+            ("herb", "herb_list", "Herbivore"),
+            ("carn", "carn_list", "Carnivore"),
+        ):
+            from_state = island.species[species].from_state
+            ages = state[prefix + "_age"].tolist()
+            weights = state[prefix + "_weight"].tolist()
+            fitnesses = state[prefix + "_fitness"].tolist()
+            start = 0
+            counts = state[prefix + "_counts"].ravel().tolist()
+            for nature_square, count in zip(
+                (square for row in island.map_list for square in row), counts
+            ):
+                end = start + count
+                setattr(
+                    nature_square,
+                    list_name,
+                    [
+                        from_state(age, weight, fitness)
+                        for age, weight, fitness in zip(
+                            ages[start:end],
+                            weights[start:end],
+                            fitnesses[start:end],
+                        )
+                    ],
+                )
+                start = end
+        island.recount()
+        return island
+
     def one_year(self):
         """Makes one year pass on the island.
 
@@ -133,20 +444,357 @@ class Island:
         5. Aging of animals
         6. Animals loose weight
         7. Death of animals
+
+        Each phase is done for all cells before the next one starts, and
+        the observers of a phase are called when it is done. Cells without
+        the animals a phase acts on are skipped, and so is migration when
+        no cell has animals. The cells are checked rather than totals, since
+        animals may have been put into the cell lists directly.
+
+        If profile is set, or cell_profile samples the year, the phases are
+        timed one by one. Fodder regrowth, herbivore feeding and carnivore
+        feeding, and aging, weight loss and death, are then done in separate
+        passes over the cells, which gives the same result since these
+        phases only change the cell they act on.
+
+        If a phase raises an error, the operation counts of the year are
+        thrown away, so counting stops with the year.
         """
-        for row in self.map_list:
-            for nature_square in row:
-                if nature_square.habitable:
+        year = self.year
+        timed = self._start_timing(year + 1)
+        if self.counters is not None:
+            self.counters.start_year(year + 1, self.rng)
+        try:
+            herb_births = carn_births = herb_deaths = carn_deaths = 0
+            if not timed:
+                for cell, nature_square in self._habitable_cells:
                     nature_square.fodder_update()
-                    nature_square.feed_all_animals()
-                    nature_square.birth_all_animals()
-        self.migration()
-        for row in self.map_list:
-            for nature_square in row:
-                if nature_square.habitable:
-                    nature_square.aging_all_animals()
-                    nature_square.weightloss_all_animals()
-                    nature_square.death_all_animals()
+                    if nature_square.herb_list or nature_square.carn_list:
+                        herb_deaths += nature_square.feed_all_animals(
+                            self.rng.stream(year, cell, FEEDING)
+                        )
+            else:
+                herb_deaths = self._timed_feeding(year)
+            if self._observers["feeding"]:
+                self.notify("feeding", year + 1)
+            if not timed:
+                herb_births, carn_births = self._procreation(year)
+            else:
+                herb_births, carn_births = self._timed_procreation(
+                    year,
+                    self.totals["Herbivore"]
+                    - herb_deaths
+                    + self.totals["Carnivore"],
+                )
+            if self._observers["procreation"]:
+                self.notify("procreation", year + 1)
+            animals = (
+                self.totals["Herbivore"]
+                - herb_deaths
+                + herb_births
+                + self.totals["Carnivore"]
+                + carn_births
+            )
+            if any(
+                nature_square.herb_list or nature_square.carn_list
+                for _, nature_square in self._habitable_cells
+            ):
+                if not timed:
+                    self.migration()
+                else:
+                    self._timed_migration(animals)
+            if self._observers["migration"]:
+                self.notify("migration", year + 1)
+            if not timed:
+                for cell, nature_square in self._habitable_cells:
+                    if nature_square.herb_list or nature_square.carn_list:
+                        nature_square.aging_all_animals()
+                        nature_square.weightloss_all_animals()
+                        died = nature_square.death_all_animals(
+                            self.rng.stream(year, cell, DEATH)
+                        )
+                        herb_deaths += died[0]
+                        carn_deaths += died[1]
+            else:
+                died = self._timed_death(year, animals)
+                herb_deaths += died[0]
+                carn_deaths += died[1]
+                self._cell_costs = None
+            self.births = {"Herbivore": herb_births, "Carnivore": carn_births}
+            self.deaths = {"Herbivore": herb_deaths, "Carnivore": carn_deaths}
+            self.totals["Herbivore"] += herb_births - herb_deaths
+            self.totals["Carnivore"] += carn_births - carn_deaths
+        except BaseException:
+            if self.counters is not None:
+                self.counters.abort_year()
+            raise
+        if self.counters is not None:
+            self.counters.end_year(self.rng)
+        if self._observers["death"]:
+            self.notify("death", year + 1)
+        self.year += 1
+        if self._observers["year"]:
+            self.notify("year", self.year)
+
+    def _procreation(self, year):
+        """Lets the animals in every cell give birth.
+
+        Returns
+        -------
+        tuple
+            Number of herbivores and carnivores born.
+        """
+        herb_births = carn_births = 0
+        for cell, nature_square in self._habitable_cells:
+            if len(nature_square.herb_list) > 1 or (
+                len(nature_square.carn_list) > 1
+            ):
+                born = nature_square.birth_all_animals(
+                    self.rng.stream(year, cell, PROCREATION)
+                )
+                herb_births += born[0]
+                carn_births += born[1]
+        return herb_births, carn_births
+
+    def _start_timing(self, year):
+        """Starts timing a year if it is profiled or sampled.
+
+        Returns
+        -------
+        bool
+            True if the phases of the year are to be timed.
+        """
+        timed = False
+        if self.profile is not None:
+            self.profile.start_year(year)
+            timed = True
+        if self.cell_profile is not None and self.cell_profile.is_due(year):
+            self._cell_costs = self.cell_profile.start_year(year)
+            timed = True
+        return timed
+
+    def _timed_pass(self, phase, cells, action, animals):
+        """Calls action(cell, nature_square) for the cells as a timed phase.
+
+        The time of the phase is added to profile, and when the year is
+        sampled, the time of every cell is added to the cell costs.
+
+        Returns
+        -------
+        list
+            The results of the calls.
+        """
+        costs = self._cell_costs
+        clock = time.perf_counter
+        start = clock()
+        if costs is None:
+            results = [
+                action(cell, nature_square) for cell, nature_square in cells
+            ]
+        else:
+            column = PHASES.index(phase)
+            results = []
+            for cell, nature_square in cells:
+                cell_start = clock()
+                results.append(action(cell, nature_square))
+                costs[cell, column] += clock() - cell_start
+        if self.profile is not None:
+            self.profile.add(phase, clock() - start, animals)
+        return results
+
+    def _timed_feeding(self, year):
+        """Regrows the fodder and feeds the herbivores and the carnivores in
+        three timed passes over the cells.
+
+        Returns
+        -------
+        int
+            Number of herbivores eaten.
+        """
+        cells = self._habitable_cells
+        self._timed_pass(
+            "fodder regrowth",
+            cells,
+            lambda cell, nature_square: nature_square.fodder_update(),
+            0,
+        )
+        self._timed_pass(
+            "herbivore feeding",
+            cells,
+            lambda cell, nature_square: nature_square.feed_herbivores()
+            if nature_square.herb_list
+            else None,
+            self.totals["Herbivore"],
+        )
+        eaten = self._timed_pass(
+            "carnivore feeding",
+            cells,
+            lambda cell, nature_square: nature_square.feed_carnivores(
+                self.rng.stream(year, cell, FEEDING)
+            )
+            if nature_square.carn_list
+            else 0,
+            self.totals["Carnivore"],
+        )
+        return sum(eaten)
+
+    def _timed_procreation(self, year, animals):
+        """Lets the animals in every cell give birth in a timed pass.
+
+        Returns
+        -------
+        tuple
+            Number of herbivores and carnivores born.
+        """
+        born = self._timed_pass(
+            "procreation",
+            self._habitable_cells,
+            lambda cell, nature_square: nature_square.birth_all_animals(
+                self.rng.stream(year, cell, PROCREATION)
+            )
+            if len(nature_square.herb_list) > 1
+            or len(nature_square.carn_list) > 1
+            else (0, 0),
+            animals,
+        )
+        return (
+            sum(herb_births for herb_births, _ in born),
+            sum(carn_births for _, carn_births in born),
+        )
+
+    def _timed_migration(self, animals):
+        """Decides and commits the migration in two timed passes.
+        """
+        self._timed_pass(
+            "migration decision",
+            self._habitable_cells,
+            lambda cell, nature_square: nature_square.migrate_all_animals(
+                self._neighbors(cell),
+                self.rng.stream(self.year, cell, MIGRATION),
+            )
+            if nature_square.herb_list or nature_square.carn_list
+            else None,
+            animals,
+        )
+        self._timed_pass(
+            "migration commit",
+            self._habitable_cells,
+            lambda cell, nature_square: self._commit_cell_moves(
+                nature_square
+            ),
+            animals,
+        )
+
+    def _timed_death(self, year, animals):
+        """Ages the animals, makes them lose weight and lets them die in
+        three timed passes over the cells.
+
+        Returns
+        -------
+        tuple
+            Number of herbivores and carnivores that died.
+        """
+        cells = [
+            (cell, nature_square)
+            for cell, nature_square in self._habitable_cells
+            if nature_square.herb_list or nature_square.carn_list
+        ]
+        self._timed_pass(
+            "aging",
+            cells,
+            lambda cell, nature_square: nature_square.aging_all_animals(),
+            animals,
+        )
+        self._timed_pass(
+            "weight loss",
+            cells,
+            lambda cell, nature_square: nature_square.weightloss_all_animals(),
+            animals,
+        )
+        died = self._timed_pass(
+            "death",
+            cells,
+            lambda cell, nature_square: nature_square.death_all_animals(
+                self.rng.stream(year, cell, DEATH)
+            ),
+            animals,
+        )
+        return (
+            sum(herb_deaths for herb_deaths, _ in died),
+            sum(carn_deaths for _, carn_deaths in died),
+        )
+
+    def add_observer(self, phase, callback, census=True):
+        """Registers a callback that is called after a phase of the year.
+
+        The callback gets a PhaseEvent with the year being simulated,
+        counted from 1, the phase and read only views of the number of
+        herbivores and carnivores in each cell. The views are updated in
+        place, so they must be copied to be kept. When no callback is
+        registered for a phase, the phase costs nothing extra, and the
+        census is only taken when a callback asks for it.
+
+        Parameters
+        ----------
+        phase : str
+            "feeding", "procreation", "migration", "death" or "year".
+        callback : callable
+            Function taking a PhaseEvent.
+        census : bool
+            If False, the herbivores and carnivores of the event are None.
+
+        Raises
+        ------
+        ValueError
+            If the phase does not exist.
+        """
+        if phase not in self._observers:
+            raise ValueError(f"Unknown phase {phase}")
+        self._observers[phase].append((callback, census))
+
+    def remove_observer(self, phase, callback):
+        """Removes a callback registered with add_observer.
+
+        Parameters
+        ----------
+        phase : str
+            The phase the callback was registered for.
+        callback : callable
+            The registered function.
+
+        Raises
+        ------
+        ValueError
+            If the callback is not registered for the phase.
+        """
+        observers = self._observers[phase]
+        for index, (registered, _) in enumerate(observers):
+            if registered == callback:
+                del observers[index]
+                return
+        raise ValueError(f"Callback is not registered for {phase}")
+
+    def notify(self, phase, year):
+        """Calls the callbacks registered for a phase.
+
+        Parameters
+        ----------
+        phase : str
+            The phase that has finished.
+        year : int
+            The year being simulated, counted from 1.
+        """
+        observers = self._observers[phase]
+        if not observers:
+            return
+        event = PhaseEvent(year, phase, None, None)
+        if any(census for _, census in observers):
+            self.census(self._herb_grid, self._carn_grid)
+            census_event = event._replace(
+                herbivores=self._herb_view, carnivores=self._carn_view
+            )
+        for callback, census in observers:
+            callback(census_event if census else event)
 
     def migration(self):
         """Migrates all animals that shall migrate.
@@ -155,33 +803,58 @@ class Island:
         by accessing the lists on each cell in which the animals that are
         supposed to migrate are stored.
         """
-        for row in range(1, self.map_rows - 1):
-            for column in range(1, self.map_columns - 1):
-                nature_square = self.map_list[row][column]
-                if nature_square.habitable:
-                    north = self.map_list[row - 1][column]
-                    east = self.map_list[row][column + 1]
-                    south = self.map_list[row + 1][column]
-                    west = self.map_list[row][column - 1]
-                    neighbors = (north, east, south, west)
-                    nature_square.migrate_all_animals(neighbors)
-
-        for row in range(1, self.map_rows - 1):
-            for column in range(1, self.map_columns - 1):
-                nature_square = self.map_list[row][column]
-                if nature_square.habitable:
-                    for moved_animal_to in nature_square.herb_move_to_list:
-                        nature_square.herb_list.append(moved_animal_to)
-                    for move_animal_from in nature_square.herb_move_from_list:
-                        nature_square.herb_list.remove(move_animal_from)
-                    for moved_animal_to in nature_square.carn_move_to_list:
-                        nature_square.carn_list.append(moved_animal_to)
-                    for moved_animal_from in nature_square.carn_move_from_list:
-                        nature_square.carn_list.remove(moved_animal_from)
-                    nature_square.herb_move_to_list = []
-                    nature_square.carn_move_to_list = []
-                    nature_square.herb_move_from_list = []
-                    nature_square.carn_move_from_list = []
+        self._decide_moves()
+        self._commit_moves()
+
+    def _neighbors(self, cell):
+        """Returns the cells north, east, south and west of a cell.
+        """
+        row, column = divmod(cell, self.map_columns)
+        return (
+            self.map_list[row - 1][column],
+            self.map_list[row][column + 1],
+            self.map_list[row + 1][column],
+            self.map_list[row][column - 1],
+        )
+
+    def _decide_moves(self):
+        """Decides which animals migrate and where they move.
+        """
+        for cell, nature_square in self._habitable_cells:
+            if nature_square.herb_list or nature_square.carn_list:
+                nature_square.migrate_all_animals(
+                    self._neighbors(cell),
+                    self.rng.stream(self.year, cell, MIGRATION),
+                )
+
+    def _commit_moves(self):
+        """Moves the animals that decided to migrate.
+        """
+        for _, nature_square in self._habitable_cells:
+            self._commit_cell_moves(nature_square)
+
+    @staticmethod
+    def _commit_cell_moves(nature_square):
+        """Moves the animals that decided to migrate into and out of a cell.
+        """
+        if counters.active:
+            counters.add(
+                "list_removes",
+                len(nature_square.herb_move_from_list)
+                + len(nature_square.carn_move_from_list),
+            )
+        for moved_animal_to in nature_square.herb_move_to_list:
+            nature_square.herb_list.append(moved_animal_to)
+        for move_animal_from in nature_square.herb_move_from_list:
+            nature_square.herb_list.remove(move_animal_from)
+        for moved_animal_to in nature_square.carn_move_to_list:
+            nature_square.carn_list.append(moved_animal_to)
+        for moved_animal_from in nature_square.carn_move_from_list:
+            nature_square.carn_list.remove(moved_animal_from)
+        nature_square.herb_move_to_list = []
+        nature_square.carn_move_to_list = []
+        nature_square.herb_move_from_list = []
+        nature_square.carn_move_from_list = []
 
     def animals_on_square(self):
         """Makes a list with the number of herbivores and carnivores on every
@@ -206,6 +879,70 @@ class Island:
                 )
         return animal_count_list
 
+    def census(self, herb_grid=None, carn_grid=None):
+        """Counts the animals of each species in every cell.
+
+        Parameters
+        ----------
+        herb_grid : numpy.ndarray
+            Array of shape (map_rows, map_columns) the herbivore counts are
+            written into. A new array is made if None.
+        carn_grid : numpy.ndarray
+            Array of shape (map_rows, map_columns) the carnivore counts are
+            written into. A new array is made if None.
+
+        Returns
+        -------
+        tuple
+            Two integer arrays of shape (map_rows, map_columns) with the
+            number of herbivores and carnivores in each cell.
+        """
+        if herb_grid is None:
+            herb_grid = np.zeros((self.map_rows, self.map_columns), dtype=int)
+        if carn_grid is None:
+            carn_grid = np.zeros((self.map_rows, self.map_columns), dtype=int)
+        for row in range(self.map_rows):
+            for column in range(self.map_columns):
+                nature_square = self.map_list[row][column]
+                herb_grid[row, column] = len(nature_square.herb_list)
+                carn_grid[row, column] = len(nature_square.carn_list)
+        return herb_grid, carn_grid
+
+    def mean_weight_and_fitness(self):
+        """Computes the mean weight and fitness of each species.
+
+        Returns
+        -------
+        dict
+            Tuple of mean weight and mean fitness by species name. Both are
+            0 for a species with no animals.
+        """
+        statistics = {}
+        for species, list_name in (
+            ("Herbivore", "herb_list"),
+            ("Carnivore", "carn_list"),
+        ):
+            count = 0
+            weight = 0
+            fitness = 0
+            for _, nature_square in self._habitable_cells:
+                animals = getattr(nature_square, list_name)
+                if animals:
+                    count += len(animals)
+                    weight += sum([animal.weight for animal in animals])
+                    fitness += sum([animal.fitness for animal in animals])
+            if count:
+                statistics[species] = (weight / count, fitness / count)
+            else:
+                statistics[species] = (0, 0)
+        return statistics
+
+    def recount(self):
+        """Counts the animals on the island again and updates totals.
+        """
+        num_herb, num_carn = self.count_animals()[:2]
+        self.totals = {"Herbivore": num_herb, "Carnivore": num_carn}
+
     def count_animals(self):
         """Counts animals on the island.
 
@@ -215,8 +952,11 @@ class Island:
         three-element tuple with counts of Herbivores and Carnivores on the
         island and the sum of these.
         """
-        animal_count_list = self.animals_on_square()
-        herbivore_count = sum(row[2] for row in animal_count_list)
-        carnivore_count = sum(row[3] for row in animal_count_list)
+        herbivore_count = 0
+        carnivore_count = 0
+        for row in self.map_list:
+            for nature_square in row:
+                herbivore_count += len(nature_square.herb_list)
+                carnivore_count += len(nature_square.carn_list)
         animal_sum = herbivore_count + carnivore_count
         return herbivore_count, carnivore_count, animal_sum
@@ -6,6 +6,8 @@ __email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
 
 import math as m
 import random
+from . import counters
+from .parameters import LandscapeParameters
 
 
 class BaseNature:
@@ -31,6 +33,42 @@ class BaseNature:
         A list with all the carnivores that shall migrate from the cell
     """
 
+    parameters = None
+
+    @classmethod
+    def bind_parameters(cls, parameter_set):
+        """Sets the values of a parameter set as attributes on class level.
+
+        Parameters
+        ----------
+        parameter_set : LandscapeParameters
+            Validated parameters for the landscape type.
+        """
+        cls.parameters = dict(parameter_set)
+        for key, value in parameter_set.attributes().items():
+            setattr(cls, key, value)
+
+    @classmethod
+    def with_parameters(cls, parameter_set):
+        """Returns a subclass of the landscape type bound to a parameter set.
+
+        Cells made from the subclass use the parameters of the set, while
+        the parameters of the landscape class itself are left untouched.
+
+        Parameters
+        ----------
+        parameter_set : LandscapeParameters
+            Validated parameters for the landscape type.
+
+        Returns
+        -------
+        type
+            Subclass of the landscape type.
+        """
+        subclass = type(cls.__name__, (cls,), {"__module__": cls.__module__})
+        subclass.bind_parameters(parameter_set)
+        return subclass
+
     def __init__(self):
         self.fodder = 0
         self.habitable = True
@@ -41,52 +79,117 @@ class BaseNature:
         self.carn_move_to_list = []
         self.carn_move_from_list = []
 
-    def feed_all_animals(self):
+    def feed_all_animals(self, rng=None):
         """Feeds all animals in the landscape cell.
 
         The animals feed in order of fitness, i.e., the animal with the
         highest fitness eats first.
+
+        Parameters
+        ----------
+        rng : RandomBuffer
+            Buffer handing out the random numbers used by the carnivores.
+            If None, the animals draw their own numbers.
+
+        Returns
+        -------
+        int
+            Number of herbivores eaten by the carnivores.
+        """
+        self.feed_herbivores()
+        return self.feed_carnivores(rng)
+
+    def feed_herbivores(self):
+        """Feeds the herbivores in the cell on its fodder, fittest first.
         """
         self.herb_list.sort(key=lambda x: x.fitness, reverse=True)
+        if counters.active:
+            counters.add("sorts")
+            counters.add("sorted_elements", len(self.herb_list))
         for animal in self.herb_list:
             if self.fodder > 0:
                 self.fodder -= animal.feeding(self.fodder)
             else:
                 break
+
+    def feed_carnivores(self, rng=None):
+        """Lets the carnivores in the cell prey on the herbivores, fittest
+        first.
+
+        Parameters
+        ----------
+        rng : RandomBuffer
+            Buffer handing out the random numbers used by the carnivores.
+            If None, the animals draw their own numbers.
+
+        Returns
+        -------
+        int
+            Number of herbivores eaten by the carnivores.
+        """
+        num_eaten = 0
+        if not self.carn_list:
+            return num_eaten
         self.carn_list.sort(key=lambda x: x.fitness, reverse=True)
         for animal in self.carn_list:
             if len(self.herb_list) == 0:
                 break
-            eaten_herbs = animal.feeding(self.herb_list)
+            eaten_herbs = animal.feeding(self.herb_list, rng)
+            num_eaten += len(eaten_herbs)
             for eaten_herb in eaten_herbs:
                 self.herb_list.remove(eaten_herb)
+        if counters.active:
+            counters.add("sorts")
+            counters.add("sorted_elements", len(self.carn_list))
+            counters.add("list_removes", num_eaten)
+        return num_eaten
 
-    def birth_all_animals(self):
+    def birth_all_animals(self, rng=None):
         """Determines which of the animals in the cell that give birth.
 
         Two animals are required to give birth. If a new animal is born the
         newborn is added to the list of the newborn's species.
+
+        Parameters
+        ----------
+        rng : RandomBuffer
+            Buffer handing out one random number per animal and the weights
+            of the newborns. If None, the animals draw their own numbers.
+
+        Returns
+        -------
+        tuple
+            Number of herbivores and carnivores born.
         """
+        herb_births = 0
+        carn_births = 0
         num_herb = len(self.herb_list)
         if num_herb >= 2:
             newborn_list = []
-            for animal in self.herb_list:
-                newborn = animal.will_birth(num_herb)
+            for animal, number in zip(
+                self.herb_list, self._random_numbers(rng, num_herb)
+            ):
+                newborn = animal.will_birth(num_herb, number, rng)
                 if newborn:
                     newborn_list.append(newborn)
             for newborn in newborn_list:
                 self.herb_list.append(newborn)
+            herb_births = len(newborn_list)
         num_carn = len(self.carn_list)
         if num_carn >= 2:
             newborn_list = []
-            for animal in self.carn_list:
-                newborn = animal.will_birth(num_carn)
+            for animal, number in zip(
+                self.carn_list, self._random_numbers(rng, num_carn)
+            ):
+                newborn = animal.will_birth(num_carn, number, rng)
                 if newborn:
                     newborn_list.append(newborn)
             for newborn in newborn_list:
                 self.carn_list.append(newborn)
+            carn_births = len(newborn_list)
+        return herb_births, carn_births
 
-    def migrate_all_animals(self, neighbors):
+    def migrate_all_animals(self, neighbors, rng=None):
         r"""Determines all animals in the cell that shall migrate.
 
         The animals can migrate to the square located directly north, west,
@@ -141,13 +244,21 @@ class BaseNature:
         ----------
         neighbors : tuple
             A tuple containing the four different neighbour locations.
+        rng : RandomBuffer
+            Buffer handing out the random numbers used for the migration
+            decisions. Two numbers per animal of each species are taken as
+            one slice, the first half for the decisions to migrate and the
+            second half for the choice of neighbour. If None, the animals
+            draw their own numbers.
         """
         north_nature_square = neighbors[0]
         east_nature_square = neighbors[1]
         south_nature_square = neighbors[2]
         west_nature_square = neighbors[3]
-        for animal in self.herb_list:
-            if animal.migrate():
+        num_herb = len(self.herb_list)
+        numbers = self._random_numbers(rng, 2 * num_herb)
+        for index, animal in enumerate(self.herb_list):
+            if animal.migrate(numbers[index]):
                 if animal.F == 0:
                     (
                         north_relative_abundance,
@@ -211,10 +322,14 @@ class BaseNature:
                     south_move_prob,
                     west_move_prob,
                 )
-                n = self.square_random_select(p)
+                n = self.square_random_select(p, numbers[num_herb + index])
                 neighbors[n].herb_move_to_list.append(animal)
                 self.herb_move_from_list.append(animal)
 
+        if counters.active:
+            self._count_migration_exps(neighbors, self.herb_move_from_list)
+        if not self.carn_list:
+            return
         north_herb_weight = sum(
             [herb.weight for herb in north_nature_square.herb_list]
         )
@@ -227,8 +342,10 @@ class BaseNature:
         west_herb_weight = sum(
             [herb.weight for herb in west_nature_square.herb_list]
         )
-        for animal in self.carn_list:
-            if animal.migrate():
+        num_carn = len(self.carn_list)
+        numbers = self._random_numbers(rng, 2 * num_carn)
+        for index, animal in enumerate(self.carn_list):
+            if animal.migrate(numbers[index]):
                 if animal.F == 0:
                     (
                         north_relative_abundance,
@@ -292,9 +409,19 @@ class BaseNature:
                     south_move_prob,
                     west_move_prob,
                 )
-                n = self.square_random_select(p)
+                n = self.square_random_select(p, numbers[num_carn + index])
                 neighbors[n].carn_move_to_list.append(animal)
                 self.carn_move_from_list.append(animal)
+        if counters.active:
+            self._count_migration_exps(neighbors, self.carn_move_from_list)
+
+    @staticmethod
+    def _count_migration_exps(neighbors, migrants):
+        """Counts the math.exp calls made for the animals that migrate, one
+        per habitable neighbour.
+        """
+        habitable = sum(1 for neighbor in neighbors if neighbor.habitable)
+        counters.add("exp_calls", habitable * len(migrants))
 
     def aging_all_animals(self):
         """Determines which of the animals in the cell give birth.
@@ -319,25 +446,70 @@ class BaseNature:
             animal.weightloss()
             animal.fitness_update()
 
-    def death_all_animals(self):
+    def death_all_animals(self, rng=None):
         """Determines which of the animals in the cell that dies.
 
         Replaces the list of animals with new lists that do not contain
         the ones that died.
 
+        Parameters
+        ----------
+        rng : RandomBuffer
+            Buffer handing out one random number per animal. If None, the
+            animals draw their own numbers.
+
+        Returns
+        -------
+        tuple
+            Number of herbivores and carnivores that died.
         """
+        num_herb = len(self.herb_list)
+        num_carn = len(self.carn_list)
         self.herb_list = [
-            animal for animal in self.herb_list if not animal.death()
+            animal
+            for animal, number in zip(
+                self.herb_list,
+                self._random_numbers(rng, num_herb),
+            )
+            if not animal.death(number)
         ]
         self.carn_list = [
-            animal for animal in self.carn_list if not animal.death()
+            animal
+            for animal, number in zip(
+                self.carn_list,
+                self._random_numbers(rng, num_carn),
+            )
+            if not animal.death(number)
         ]
+        return (
+            num_herb - len(self.herb_list),
+            num_carn - len(self.carn_list),
+        )
 
     @staticmethod
-    def square_random_select(p):
+    def _random_numbers(rng, n):
+        """Returns n random numbers from the buffer, or n None values that
+        makes the animals draw their own numbers if no buffer is given.
+        """
+        if rng is None:
+            return [None] * n
+        return rng.uniform(n)
+
+    @staticmethod
+    def square_random_select(p, r=None):
         """Select a square based on their move probabilities using the
-        linear search method"""
-        r = random.uniform(0, 1)
+        linear search method
+
+        Parameters
+        ----------
+        p : tuple
+            Probabilities of moving to each of the squares.
+        r : float
+            Uniform random number in [0, 1]. Drawn with random.uniform if
+            not given.
+        """
+        if r is None:
+            r = random.uniform(0, 1)
         n = 0
         while r >= p[n]:
             r -= p[n]
@@ -512,30 +684,14 @@ class Savannah(BaseNature):
         ValueError
             If the assigned parameter values are not in the right ranges.
         """
-        for key in new_params:
-            if key not in cls.parameters.keys():
-                raise KeyError(f"Parameter {key} is not valid")
-            if isinstance(new_params[key], int) or isinstance(
-                new_params[key], float
-            ):
-                continue
-            else:
-                raise ValueError(
-                    f"Value needs to be int or float, "
-                    f"got:{type(new_params[key]).__name__}"
-                )
-        for key in new_params:
-            if new_params[key] < 0:
-                raise ValueError("All parameters must be positive")
-        cls.parameters.update(new_params)
-        cls._set_params_as_attributes()
+        parameter_set = LandscapeParameters(cls.parameters).updated(new_params)
+        cls.bind_parameters(parameter_set)
 
     @classmethod
     def _set_params_as_attributes(cls):
         """Sets the Savannah parameters to attributes on a class level.
         """
-        for key in cls.parameters:
-            setattr(cls, key, cls.parameters[key])
+        cls.bind_parameters(LandscapeParameters(cls.parameters))
 
     def __init__(self):
         if self.parameters is None:
@@ -615,30 +771,14 @@ class Jungle(BaseNature):
         ValueError
             If the assigned parameter values are not in the right ranges.
         """
-        for key in new_params:
-            if key not in cls.parameters.keys():
-                raise KeyError(f"Parameter {key} is not valid")
-            if isinstance(new_params[key], int) or isinstance(
-                new_params[key], float
-            ):
-                continue
-            else:
-                raise ValueError(
-                    f"Value needs to be int or float, "
-                    f"got:{type(new_params[key]).__name__}"
-                )
-        for key in new_params:
-            if new_params[key] < 0:
-                raise ValueError("All parameters must be positive")
-        cls.parameters.update(new_params)
-        cls._set_params_as_attributes()
+        parameter_set = LandscapeParameters(cls.parameters).updated(new_params)
+        cls.bind_parameters(parameter_set)
 
     @classmethod
     def _set_params_as_attributes(cls):
         """Sets the Savannah parameters to attributes on a class level.
         """
-        for key in cls.parameters:
-            setattr(cls, key, cls.parameters[key])
+        cls.bind_parameters(LandscapeParameters(cls.parameters))
 
     def __init__(self):
         if self.parameters is None:
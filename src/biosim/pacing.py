@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import sys
+import time
+from collections import namedtuple
+
+Throughput = namedtuple("Throughput", ["years", "seconds", "years_per_second"])
+Throughput.__doc__ = """Number of years simulated, the wall clock time it took
+and the resulting rate.
+"""
+
+
+class YearClock:
+    """Measures the cost of simulated years against a time budget and pace.
+
+    The cost of a year is estimated by an exponential moving average of the
+    wall clock time of the years so far, so a simulation with a time budget
+    stops before a year that is not expected to fit in it. With a pace, the
+    simulation waits after a year that finished earlier than the pace
+    allows. The waiting is not counted as cost.
+
+    Parameters
+    ----------
+    time_budget : float
+        Seconds of wall clock time the years may take, or None.
+    years_per_second : float
+        Maximum number of years simulated per second, or None.
+    smoothing : float
+        Weight of the newest year in the moving average, between 0 and 1.
+
+    Raises
+    ------
+    ValueError
+        If a limit is not positive, or smoothing is not in (0, 1].
+
+    Attributes
+    ----------
+    year_cost : float
+        Moving average of the seconds a year takes, or None before the
+        first year.
+    years : int
+        Number of years done since start.
+    """
+
+    def __init__(self, time_budget=None, years_per_second=None, smoothing=0.2):
+        if time_budget is not None and time_budget <= 0:
+            raise ValueError("time_budget must be positive")
+        if years_per_second is not None and years_per_second <= 0:
+            raise ValueError("years_per_second must be positive")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in the interval (0, 1]")
+        self.time_budget = time_budget
+        self.years_per_second = years_per_second
+        self.smoothing = smoothing
+        self.start()
+
+    def start(self):
+        """Starts measuring from now.
+        """
+        self._start = time.perf_counter()
+        self._year_start = self._start
+        self.years = 0
+        self.year_cost = None
+
+    def year_done(self):
+        """Records that a year is done and updates the estimated cost.
+        """
+        now = time.perf_counter()
+        cost = now - self._year_start
+        if self.year_cost is None:
+            self.year_cost = cost
+        else:
+            self.year_cost += self.smoothing * (cost - self.year_cost)
+        self.years += 1
+        self._year_start = now
+
+    def has_time_for_year(self):
+        """Returns whether the next year is expected to fit in the budget.
+        """
+        if self.time_budget is None:
+            return True
+        elapsed = time.perf_counter() - self._start
+        return elapsed + (self.year_cost or 0) <= self.time_budget
+
+    def delay(self):
+        """Returns the seconds to wait before the next year to keep the pace.
+        """
+        if self.years_per_second is None:
+            return 0
+        target = self._start + self.years / self.years_per_second
+        return max(0.0, target - time.perf_counter())
+
+    def waited(self):
+        """Records that waiting is done, so it is not counted as cost.
+        """
+        self._year_start = time.perf_counter()
+
+    @property
+    def throughput(self):
+        """Years done, seconds since start and years per second.
+        """
+        seconds = time.perf_counter() - self._start
+        return Throughput(
+            self.years, seconds, self.years / seconds if seconds else 0.0
+        )
+
+
+Progress = namedtuple(
+    "Progress",
+    [
+        "year",
+        "years_done",
+        "total_years",
+        "years_per_second",
+        "animals_per_second",
+        "eta",
+    ],
+)
+Progress.__doc__ = """Progress of a running simulation.
+
+years_per_second and animals_per_second are smoothed rates, and eta is the
+estimated number of seconds left.
+"""
+
+
+class ProgressReporter:
+    """Reports the progress of a simulation at most every interval seconds.
+
+    A reporter is passed to BioSim.simulate. The cost of a year grows with
+    the number of animals, so the reporter keeps a moving average of the
+    seconds spent per animal and year, and estimates the time left from it
+    and the current number of animals. The animals are counted from the
+    running totals of the island, so reporting never counts the cells.
+
+    Parameters
+    ----------
+    interval : float
+        Minimum number of seconds between reports.
+    callback : callable
+        Function taking a Progress. If None, a line is written to stream.
+    stream : file
+        Stream the lines are written to if there is no callback. Standard
+        error if None.
+    smoothing : float
+        Weight of the newest year in the moving averages, between 0 and 1.
+
+    Raises
+    ------
+    ValueError
+        If interval is negative, or smoothing is not in (0, 1].
+    """
+
+    def __init__(
+        self, interval=5.0, callback=None, stream=None, smoothing=0.2
+    ):
+        if interval < 0:
+            raise ValueError("interval can not be negative")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in the interval (0, 1]")
+        self.interval = interval
+        self.callback = callback
+        self.stream = stream
+        self.smoothing = smoothing
+
+    def start(self, sim, num_years):
+        """Starts reporting on a simulation.
+
+        Parameters
+        ----------
+        sim : BioSim
+            The simulation.
+        num_years : int
+            Number of years that are to be simulated.
+        """
+        self._total_years = num_years
+        self._years_done = 0
+        self._animals = self._count(sim)
+        self._year_cost = None
+        self._animal_cost = None
+        now = time.perf_counter()
+        self._year_start = now
+        self._last_report = now
+
+    @staticmethod
+    def _count(sim):
+        totals = sim._island.totals
+        return totals["Herbivore"] + totals["Carnivore"]
+
+    def year_done(self, sim):
+        """Updates the rates after a year, and reports if it is time.
+
+        Parameters
+        ----------
+        sim : BioSim
+            The simulation after the year.
+        """
+        now = time.perf_counter()
+        cost = now - self._year_start
+        animal_cost = cost / max(self._animals, 1)
+        if self._year_cost is None:
+            self._year_cost = cost
+            self._animal_cost = animal_cost
+        else:
+            self._year_cost += self.smoothing * (cost - self._year_cost)
+            self._animal_cost += self.smoothing * (
+                animal_cost - self._animal_cost
+            )
+        self._years_done += 1
+        self._animals = self._count(sim)
+        self._year_start = now
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report(sim)
+
+    def progress(self, sim):
+        """Returns the current progress.
+
+        Parameters
+        ----------
+        sim : BioSim
+            The simulation.
+
+        Returns
+        -------
+        Progress
+        """
+        years_left = self._total_years - self._years_done
+        if self._year_cost is None:
+            return Progress(sim.year, 0, self._total_years, 0.0, 0.0, None)
+        return Progress(
+            sim.year,
+            self._years_done,
+            self._total_years,
+            1 / self._year_cost if self._year_cost else 0.0,
+            1 / self._animal_cost if self._animal_cost else 0.0,
+            years_left * self._animal_cost * max(self._animals, 1),
+        )
+
+    def report(self, sim):
+        """Reports the current progress to the callback or stream.
+
+        Parameters
+        ----------
+        sim : BioSim
+            The simulation.
+        """
+        progress = self.progress(sim)
+        if self.callback is not None:
+            self.callback(progress)
+            return
+        eta = "?" if progress.eta is None else f"{progress.eta:.0f} s"
+        stream = sys.stderr if self.stream is None else self.stream
+        stream.write(
+            f"Year {progress.year} ({progress.years_done}/"
+            f"{progress.total_years}), "
+            f"{progress.years_per_second:.3g} years/s, "
+            f"{progress.animals_per_second:.3g} animals/s, ETA {eta}\n"
+        )
+        stream.flush()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from collections.abc import Mapping
+
+
+class ParameterSet(Mapping):
+    """Immutable set of validated parameters for a species or landscape.
+
+    The values are validated once when the set is made, and derived
+    constants used in the annual cycle are computed at the same time.
+    Changing a parameter gives a new set through the updated method.
+
+    Parameters
+    ----------
+    params : dict
+        The complete set of parameter values.
+    defaults : dict
+        Default values of the species or landscape type. If given, params
+        must have exactly the same keys.
+
+    Raises
+    ------
+    KeyError
+        If params misses keys of the defaults or has keys they do not have.
+    ValueError
+        If a value is not an int or float, or not in the right range.
+    """
+
+    def __init__(self, params, defaults=None):
+        self._params = dict(params)
+        if defaults is not None and set(self._params) != set(defaults):
+            missing = sorted(set(defaults) - set(self._params))
+            unknown = sorted(set(self._params) - set(defaults), key=str)
+            raise KeyError(
+                f"Parameters do not match the defaults, missing: {missing},"
+                f" unknown: {unknown}"
+            )
+        self._check(self._params)
+        self._derived = self._derive()
+
+    def __getitem__(self, key):
+        return self._params[key]
+
+    def __iter__(self):
+        return iter(self._params)
+
+    def __len__(self):
+        return len(self._params)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._params})"
+
+    def _derive(self):
+        """Returns the derived constants of the parameter set.
+        """
+        return {}
+
+    def _check(self, new_params):
+        """Checks that new parameter values are valid for the set.
+
+        Parameters
+        ----------
+        new_params: dict
+            Dictionary containing key(s) that exist in the parameter set.
+        Raises
+        ------
+        KeyError
+            If the key(s) in new_params does not exist in parameters.
+        ValueError
+            If the new value assigned to the key(s) is not of type float or int
+        ValueError
+            If the assigned parameter values are not in the right ranges.
+        """
+        for key in new_params:
+            if key not in self._params:
+                raise KeyError(f"Parameter {key} is not valid")
+            if not isinstance(new_params[key], (int, float)):
+                raise ValueError(
+                    f"Value needs to be int or float, "
+                    f"got:{type(new_params[key]).__name__}"
+                )
+        for key in new_params:
+            if new_params[key] < 0:
+                raise ValueError("All parameters must be positive")
+
+    def updated(self, new_params):
+        """Returns a new parameter set with some of the values changed.
+
+        Parameters
+        ----------
+        new_params: dict
+            Dictionary containing key(s) that exist in the parameter set.
+
+        Returns
+        -------
+        ParameterSet
+            A new set of the same type with the new values.
+        """
+        self._check(new_params)
+        params = dict(self._params)
+        params.update(new_params)
+        return self.__class__(params)
+
+    def attributes(self):
+        """Returns the class attributes a class bound to the set gets.
+
+        Returns
+        -------
+        dict
+            Parameter values and derived constants by attribute name.
+        """
+        attributes = dict(self._params)
+        attributes.update(self._derived)
+        return attributes
+
+
+class AnimalParameters(ParameterSet):
+    r"""Immutable set of validated parameters for an animal species.
+
+    The derived constant birth_weight_limit is the weight
+    :math:`\zeta(\omega_{birth}+\sigma_{birth})` an animal must have to
+    give birth.
+    """
+
+    def _derive(self):
+        return {
+            "birth_weight_limit": self._params["zeta"]
+            * (self._params["w_birth"] + self._params["sigma_birth"])
+        }
+
+    def _check(self, new_params):
+        super()._check(new_params)
+        for key in new_params:
+            if key == "DeltaPhiMax" and new_params[key] <= 0:
+                raise ValueError("DeltaPhiMax must be strictly positive")
+            if key == "eta" and new_params[key] > 1:
+                raise ValueError("Eta must be less or equal to one")
+
+    def attributes(self):
+        attributes = super().attributes()
+        attributes["_lambda"] = attributes.pop("lambda")
+        return attributes
+
+
+class LandscapeParameters(ParameterSet):
+    """Immutable set of validated parameters for a landscape type.
+    """
+
+
+class SimulationParameters(Mapping):
+    """Immutable collection of the parameter sets used by one simulation.
+
+    Parameters
+    ----------
+    parameter_sets : dict
+        Parameter sets by name, "Herbivore", "Carnivore", "J" and "S".
+    """
+
+    def __init__(self, parameter_sets):
+        self._sets = dict(parameter_sets)
+
+    def __getitem__(self, key):
+        return self._sets[key]
+
+    def __iter__(self):
+        return iter(self._sets)
+
+    def __len__(self):
+        return len(self._sets)
+
+    def updated(self, name, new_params):
+        """Returns a new collection with one of the sets updated.
+
+        Parameters
+        ----------
+        name : str
+            Name of the parameter set to update.
+        new_params : dict
+            New values for the parameter set.
+
+        Returns
+        -------
+        SimulationParameters
+            A new collection with the updated set.
+        """
+        parameter_sets = dict(self._sets)
+        parameter_sets[name] = self._sets[name].updated(new_params)
+        return SimulationParameters(parameter_sets)
+
+    def as_dict(self):
+        """Returns the parameter values as a dictionary of dictionaries.
+        """
+        return {name: dict(params) for name, params in self._sets.items()}
+
+    @classmethod
+    def from_dict(cls, params):
+        """Makes a collection from a dictionary returned by as_dict.
+
+        Parameters
+        ----------
+        params : dict
+            Parameter values by name, "Herbivore", "Carnivore", "J" and "S".
+
+        Returns
+        -------
+        SimulationParameters
+
+        Raises
+        ------
+        KeyError
+            If a name is missing or unknown, or the values of a name do not
+            have the keys of its default parameters.
+        ValueError
+            If a value is not valid.
+        """
+        from .animals import Herb, Carn
+        from .landscape import Jungle, Savannah
+
+        defaults = {
+            "Herbivore": Herb.DEFAULT_PARAMETERS,
+            "Carnivore": Carn.DEFAULT_PARAMETERS,
+            "J": Jungle.DEFAULT_PARAMETERS,
+            "S": Savannah.DEFAULT_PARAMETERS,
+        }
+        if set(params) != set(defaults):
+            raise KeyError(
+                f"Parameters are needed for exactly {sorted(defaults)},"
+                f" got: {sorted(params, key=str)}"
+            )
+        return cls(
+            {
+                name: (
+                    AnimalParameters(values, defaults[name])
+                    if name in ("Herbivore", "Carnivore")
+                    else LandscapeParameters(values, defaults[name])
+                )
+                for name, values in params.items()
+            }
+        )
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import numpy as np
+
+PHASES = (
+    "fodder regrowth",
+    "herbivore feeding",
+    "carnivore feeding",
+    "procreation",
+    "migration decision",
+    "migration commit",
+    "aging",
+    "weight loss",
+    "death",
+)
+_PHASE_INDEX = {phase: index for index, phase in enumerate(PHASES)}
+
+
+class PhaseProfile:
+    """Wall clock time and animals processed by each phase of the year.
+
+    A profile is given to an Island, which then times every phase of
+    Island.one_year separately and adds the time and the number of animals
+    the phase processed. The phases are in the order of PHASES.
+
+    Attributes
+    ----------
+    years : list
+        The years that have been profiled.
+    """
+
+    def __init__(self):
+        self.years = []
+        self._seconds = []
+        self._animals = []
+
+    def start_year(self, year):
+        """Starts profiling a year.
+
+        Parameters
+        ----------
+        year : int
+            The year being simulated, counted from 1.
+        """
+        self.years.append(year)
+        self._seconds.append([0.0] * len(PHASES))
+        self._animals.append([0] * len(PHASES))
+
+    def add(self, phase, seconds, animals):
+        """Adds the time and animals of a phase to the current year.
+
+        Parameters
+        ----------
+        phase : str
+            Name of the phase, one of PHASES.
+        seconds : float
+            Wall clock time the phase took.
+        animals : int
+            Number of animals the phase processed.
+        """
+        index = _PHASE_INDEX[phase]
+        self._seconds[-1][index] += seconds
+        self._animals[-1][index] += animals
+
+    def __len__(self):
+        return len(self.years)
+
+    @property
+    def seconds(self):
+        """Array of shape (years, phases) with the seconds of each phase.
+        """
+        return np.array(self._seconds, dtype=float).reshape(-1, len(PHASES))
+
+    @property
+    def animals(self):
+        """Array of shape (years, phases) with the animals each phase
+        processed.
+        """
+        return np.array(self._animals, dtype=np.int64).reshape(
+            -1, len(PHASES)
+        )
+
+    def as_dict(self):
+        """Returns the profile as arrays.
+
+        Returns
+        -------
+        dict
+            "year", "seconds" and "animals" arrays.
+        """
+        return {
+            "year": np.array(self.years, dtype=np.int64),
+            "seconds": self.seconds,
+            "animals": self.animals,
+        }
+
+    def report(self):
+        """Makes a table of the total time and animals of each phase.
+
+        Returns
+        -------
+        str
+            One line per phase with the total seconds, the share of the
+            total time, the total number of animals and the microseconds
+            per animal.
+        """
+        seconds = self.seconds.sum(axis=0)
+        animals = self.animals.sum(axis=0)
+        total = seconds.sum()
+        lines = [
+            f"Profile of {len(self)} years, {total:.3f} s",
+            f"{'Phase':<20}{'Seconds':>10}{'Share':>8}"
+            f"{'Animals':>12}{'us/animal':>11}",
+        ]
+        for name, phase_seconds, phase_animals in zip(
+            PHASES, seconds, animals
+        ):
+            share = phase_seconds / total if total else 0.0
+            per_animal = (
+                f"{1e6 * phase_seconds / phase_animals:.2f}"
+                if phase_animals
+                else "-"
+            )
+            lines.append(
+                f"{name:<20}{phase_seconds:>10.4f}{share:>8.1%}"
+                f"{phase_animals:>12d}{per_animal:>11}"
+            )
+        return "\n".join(lines)
+
+
+class CellProfile:
+    """Wall clock time spent in each cell by each phase of sampled years.
+
+    A cell profile is given to an Island, which then times every phase in
+    every cell in every every_years'th year. Other years are not timed.
+    The cost arrays have shape (rows, columns, phases), with the phases in
+    the order of PHASES, so the crowded cells that take most of the time,
+    and the phases that dominate in them, can be found.
+
+    Parameters
+    ----------
+    shape : tuple
+        Number of rows and columns of the island.
+    every_years : int
+        Number of years between the sampled years.
+
+    Raises
+    ------
+    ValueError
+        If every_years is not positive.
+
+    Attributes
+    ----------
+    years : list
+        The sampled years.
+    """
+
+    def __init__(self, shape, every_years=10):
+        if every_years < 1:
+            raise ValueError("every_years must be positive")
+        self.shape = tuple(shape)
+        self.every_years = every_years
+        self.years = []
+        self._samples = []
+
+    def is_due(self, year):
+        """Returns whether a year is sampled.
+
+        Parameters
+        ----------
+        year : int
+            The year being simulated, counted from 1.
+        """
+        return year % self.every_years == 0
+
+    def start_year(self, year):
+        """Starts sampling a year.
+
+        Parameters
+        ----------
+        year : int
+            The year being simulated, counted from 1.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (cells, phases) that the seconds of each phase in
+            each cell, indexed by row * columns + column, are added to.
+        """
+        costs = np.zeros((self.shape[0] * self.shape[1], len(PHASES)))
+        self.years.append(year)
+        self._samples.append(costs)
+        return costs
+
+    def __len__(self):
+        return len(self.years)
+
+    @property
+    def costs(self):
+        """Array of shape (samples, rows, columns, phases) with the seconds
+        of each phase in each cell in the sampled years.
+        """
+        return np.array(self._samples).reshape(
+            (len(self._samples),) + self.shape + (len(PHASES),)
+        )
+
+    def latest(self):
+        """Returns the costs of the last sampled year.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (rows, columns, phases), zeros if no year has
+            been sampled.
+        """
+        if not self._samples:
+            return np.zeros(self.shape + (len(PHASES),))
+        return self._samples[-1].reshape(self.shape + (len(PHASES),))
+
+    def mean(self):
+        """Returns the mean costs of the sampled years.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (rows, columns, phases), zeros if no year has
+            been sampled.
+        """
+        if not self._samples:
+            return np.zeros(self.shape + (len(PHASES),))
+        return self.costs.mean(axis=0)
+
+    def hotspots(self, n=5):
+        """Returns the cells with the largest mean cost.
+
+        Parameters
+        ----------
+        n : int
+            Number of cells.
+
+        Returns
+        -------
+        list
+            Tuples of row, column, mean seconds per sampled year and the
+            name of the phase that takes most of the time in the cell,
+            most expensive cell first.
+        """
+        mean = self.mean()
+        totals = mean.sum(axis=2)
+        cells = np.argsort(totals, axis=None)[::-1][:n]
+        rows, columns = np.unravel_index(cells, self.shape)
+        return [
+            (
+                int(row),
+                int(column),
+                float(totals[row, column]),
+                PHASES[int(mean[row, column].argmax())],
+            )
+            for row, column in zip(rows, columns)
+        ]
+
+    def as_dict(self):
+        """Returns the profile as arrays.
+
+        Returns
+        -------
+        dict
+            "year" and "costs" arrays.
+        """
+        return {
+            "year": np.array(self.years, dtype=np.int64),
+            "costs": self.costs,
+        }
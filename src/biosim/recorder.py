@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import numpy as np
+
+
+class Recorder:
+    """Time series of per-year statistics for a simulation.
+
+    The values are stored in preallocated NumPy arrays that double in
+    size when they are full, so recording a year costs O(1) amortized.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of years there is room for before the arrays grow.
+
+    Attributes
+    ----------
+    FIELDS : tuple
+        Names of the recorded time series.
+    """
+
+    FIELDS = (
+        "year",
+        "herbivores",
+        "carnivores",
+        "herbivore_births",
+        "carnivore_births",
+        "herbivore_deaths",
+        "carnivore_deaths",
+        "herbivore_weight",
+        "carnivore_weight",
+        "herbivore_fitness",
+        "carnivore_fitness",
+    )
+    _INT_FIELDS = FIELDS[:7]
+
+    def __init__(self, capacity=128):
+        self._length = 0
+        self._data = {
+            field: np.zeros(
+                capacity, dtype=int if field in self._INT_FIELDS else float
+            )
+            for field in self.FIELDS
+        }
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, field):
+        """Returns a view of the recorded values of a field.
+
+        Parameters
+        ----------
+        field : str
+            One of the names in FIELDS.
+
+        Returns
+        -------
+        numpy.ndarray
+            The values recorded so far.
+        """
+        return self._data[field][: self._length]
+
+    @property
+    def last_year(self):
+        """The last year recorded, or None if nothing is recorded.
+        """
+        if self._length == 0:
+            return None
+        return int(self._data["year"][self._length - 1])
+
+    def record(self, **values):
+        """Records the statistics of one year.
+
+        Parameters
+        ----------
+        values
+            Value for each of the fields in FIELDS. Fields not given are
+            recorded as 0.
+        """
+        if self._length == len(self._data["year"]):
+            for field, data in self._data.items():
+                grown = np.zeros(2 * len(data), dtype=data.dtype)
+                grown[: self._length] = data
+                self._data[field] = grown
+        for field, value in values.items():
+            self._data[field][self._length] = value
+        self._length += 1
+
+    def as_dict(self):
+        """Returns copies of the recorded time series.
+
+        Returns
+        -------
+        dict
+            Array of recorded values for each field.
+        """
+        return {field: self[field].copy() for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Makes a recorder from time series returned by as_dict.
+
+        Parameters
+        ----------
+        data : dict
+            Array of recorded values for each field.
+
+        Returns
+        -------
+        Recorder
+        """
+        length = len(data["year"])
+        recorder = cls(capacity=max(length, 1))
+        for field in cls.FIELDS:
+            recorder._data[field][:length] = data[field]
+        recorder._length = length
+        return recorder
+
+    def to_csv(self, path):
+        """Writes the recorded time series to a CSV file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file.
+        """
+        np.savetxt(
+            path,
+            np.column_stack([self[field] for field in self.FIELDS]),
+            delimiter=",",
+            header=",".join(self.FIELDS),
+            comments="",
+            fmt=["%d"] * len(self._INT_FIELDS)
+            + ["%.10g"] * (len(self.FIELDS) - len(self._INT_FIELDS)),
+        )
+
+    def save(self, path):
+        """Writes the recorded time series to a NumPy .npz file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file.
+        """
+        np.savez(path, **self.as_dict())
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+import json
+import numpy as np
+
+FEEDING = 0
+PROCREATION = 1
+MIGRATION = 2
+DEATH = 3
+
+
+class RandomBuffer:
+    """Hands out uniform random numbers that are drawn in large blocks.
+
+    Drawing one number at a time with random.uniform costs one Python level
+    call per decision. The buffer instead draws a block of numbers from a
+    numpy Generator and hands out slices of it, so the generator is only
+    called when a block is used up.
+
+    Parameters
+    ----------
+    seed : int, numpy.random.Generator or None
+        Seed for a new generator, or an already created generator.
+    block_size : int
+        Number of uniform numbers drawn from the generator at a time.
+
+    Raises
+    ------
+    ValueError
+        If block_size is not a positive integer.
+    """
+
+    def __init__(self, seed=None, block_size=65536):
+        if not isinstance(block_size, int) or block_size <= 0:
+            raise ValueError("Block size must be a positive integer")
+        if isinstance(seed, np.random.Generator):
+            self._generator = seed
+        else:
+            self._generator = np.random.default_rng(seed)
+        self._block_size = block_size
+        self._block = []
+        self._pos = 0
+        self._normals = []
+        self._normal_pos = 0
+        self._drawn = 0
+
+    @property
+    def draws(self):
+        """Number of random numbers handed out.
+
+        The count is kept when blocks are drawn, so handing out numbers
+        costs nothing extra.
+        """
+        return (
+            self._drawn
+            - (len(self._block) - self._pos)
+            - (len(self._normals) - self._normal_pos)
+        )
+
+    def reset(self):
+        """Discards the numbers drawn but not yet handed out.
+        """
+        self._drawn = self.draws
+        self._block = []
+        self._pos = 0
+        self._normals = []
+        self._normal_pos = 0
+
+    def get_state(self):
+        """Returns the state of the buffer as arrays.
+
+        Returns
+        -------
+        dict
+            The state of the generator as a JSON string, and the uniform
+            and normal numbers drawn but not yet handed out.
+        """
+        return {
+            "generator": np.array(
+                json.dumps(
+                    self._generator.bit_generator.state,
+                    default=lambda value: value.tolist(),
+                )
+            ),
+            "block": np.array(self._block[self._pos:], dtype=float),
+            "normals": np.array(self._normals[self._normal_pos:], dtype=float),
+        }
+
+    def set_state(self, state):
+        """Restores a state returned by get_state.
+
+        Parameters
+        ----------
+        state : dict
+            State of a buffer.
+        """
+        self._generator.bit_generator.state = json.loads(
+            str(state["generator"])
+        )
+        self._block = state["block"].tolist()
+        self._pos = 0
+        self._normals = state["normals"].tolist()
+        self._normal_pos = 0
+        self._drawn = len(self._block) + len(self._normals)
+
+    def branch(self, index):
+        """Returns a new buffer with an independent stream.
+
+        The stream of branch index starts index + 1 jumps ahead of the
+        generator, where a jump is far longer than any simulation uses, so
+        the branches of a buffer do not overlap each other or the buffer
+        itself.
+
+        Parameters
+        ----------
+        index : int
+            Number of the branch.
+
+        Returns
+        -------
+        RandomBuffer
+        """
+        return RandomBuffer(
+            np.random.Generator(
+                self._generator.bit_generator.jumped(index + 1)
+            ),
+            self._block_size,
+        )
+
+    def stream(self, year, cell, phase):
+        """Returns the buffer to use for a phase in a cell.
+
+        All cells and phases share one stream in a RandomBuffer, so the
+        buffer itself is returned.
+
+        Parameters
+        ----------
+        year : int
+            The year being simulated.
+        cell : int
+            Index of the cell, row * map_columns + column.
+        phase : int
+            One of the phase constants FEEDING, PROCREATION, MIGRATION, DEATH.
+
+        Returns
+        -------
+        RandomBuffer
+            This buffer.
+        """
+        return self
+
+    def _refill(self, n):
+        """Draws a new block, keeping the numbers not yet handed out.
+
+        Parameters
+        ----------
+        n : int
+            Minimum number of unused numbers needed after the refill.
+        """
+        leftover = self._block[self._pos:]
+        size = max(self._block_size, n - len(leftover))
+        self._block = leftover + self._generator.random(size).tolist()
+        self._pos = 0
+        self._drawn += size
+
+    def uniform(self, n):
+        """Returns n uniform random numbers in the interval [0, 1).
+
+        Parameters
+        ----------
+        n : int
+            Number of random numbers to hand out.
+
+        Returns
+        -------
+        list
+            List of n floats.
+        """
+        end = self._pos + n
+        if end > len(self._block):
+            self._refill(n)
+            end = n
+        numbers = self._block[self._pos:end]
+        self._pos = end
+        return numbers
+
+    def normal(self, loc, scale):
+        """Returns a normally distributed random number.
+
+        Standard normal numbers are drawn in blocks just like the uniform
+        numbers.
+
+        Parameters
+        ----------
+        loc : float
+            Mean of the distribution.
+        scale : float
+            Standard deviation of the distribution.
+
+        Returns
+        -------
+        float
+        """
+        if self._normal_pos >= len(self._normals):
+            self._normals = self._generator.standard_normal(
+                self._block_size
+            ).tolist()
+            self._normal_pos = 0
+            self._drawn += self._block_size
+        number = self._normals[self._normal_pos]
+        self._normal_pos += 1
+        return loc + scale * number
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Returns the next uniform random number in the buffer.
+        """
+        if self._pos >= len(self._block):
+            self._refill(1)
+        number = self._block[self._pos]
+        self._pos += 1
+        return number
+
+
+class CounterRandom:
+    """Counter based random numbers keyed by (seed, year, cell, phase).
+
+    The numbers are made by the Philox bit generator. Its key is derived
+    from the seed, and its counter is set from the year, the cell and the
+    phase. The numbers used in any cell in any year can therefore be made
+    again without replaying the earlier years, and the order in which the
+    cells are visited does not change the numbers they get.
+
+    Parameters
+    ----------
+    seed : int or None
+        Seed the Philox key is derived from.
+    block_size : int
+        Number of uniform numbers drawn from a stream at a time.
+
+    Attributes
+    ----------
+    key : numpy.ndarray
+        The two 64 bit words of the Philox key.
+    """
+
+    def __init__(self, seed=None, block_size=256):
+        self.key = np.random.SeedSequence(seed).generate_state(
+            2, dtype=np.uint64
+        )
+        self._bit_generator = np.random.Philox(key=self.key)
+        self._buffer = RandomBuffer(
+            np.random.Generator(self._bit_generator), block_size
+        )
+
+    def get_state(self):
+        """Returns the state as arrays.
+
+        Every stream starts from its own key and counter, so the key is
+        all that is needed to continue a simulation.
+
+        Returns
+        -------
+        dict
+            The Philox key.
+        """
+        return {"key": self.key.copy()}
+
+    def set_state(self, state):
+        """Restores a state returned by get_state.
+
+        Parameters
+        ----------
+        state : dict
+            State of a CounterRandom.
+        """
+        self.key = np.asarray(state["key"], dtype=np.uint64)
+        self._bit_generator = np.random.Philox(key=self.key)
+        self._buffer = RandomBuffer(
+            np.random.Generator(self._bit_generator), self._buffer._block_size
+        )
+
+    def branch(self, index):
+        """Returns a new CounterRandom with an independent key.
+
+        Parameters
+        ----------
+        index : int
+            Number of the branch.
+
+        Returns
+        -------
+        CounterRandom
+        """
+        counter_random = CounterRandom(block_size=self._buffer._block_size)
+        counter_random.set_state(
+            {
+                "key": np.random.SeedSequence(
+                    [*self.key.tolist(), index]
+                ).generate_state(2, dtype=np.uint64)
+            }
+        )
+        return counter_random
+
+    @property
+    def draws(self):
+        """Number of random numbers handed out by all streams.
+        """
+        return self._buffer.draws
+
+    def _state(self, year, cell, phase):
+        """Returns the Philox state for the start of a stream.
+        """
+        return {
+            "bit_generator": "Philox",
+            "state": {
+                "counter": np.array([0, phase, cell, year], dtype=np.uint64),
+                "key": self.key,
+            },
+            "buffer": np.zeros(4, dtype=np.uint64),
+            "buffer_pos": 4,
+            "has_uint32": 0,
+            "uinteger": 0,
+        }
+
+    def stream(self, year, cell, phase):
+        """Returns the buffer for a phase in a cell in a given year.
+
+        The same buffer object is reused for every stream, so it is only
+        valid until the next call to stream.
+
+        Parameters
+        ----------
+        year : int
+            The year being simulated.
+        cell : int
+            Index of the cell, row * map_columns + column.
+        phase : int
+            One of the phase constants FEEDING, PROCREATION, MIGRATION, DEATH.
+
+        Returns
+        -------
+        RandomBuffer
+            Buffer positioned at the start of the stream.
+        """
+        self._bit_generator.state = self._state(year, cell, phase)
+        self._buffer.reset()
+        return self._buffer
+
+    def replay(self, year, cell, phase, n):
+        """Returns the first n uniform numbers of a stream.
+
+        Does not disturb the stream used by the simulation, and is meant
+        for looking into the history of a single cell. The numbers match
+        the ones used by the simulation up to the first normal number
+        drawn from the stream.
+
+        Parameters
+        ----------
+        year : int
+            The year of the stream.
+        cell : int
+            Index of the cell, row * map_columns + column.
+        phase : int
+            One of the phase constants FEEDING, PROCREATION, MIGRATION, DEATH.
+        n : int
+            Number of uniform numbers to return.
+
+        Returns
+        -------
+        list
+            The n first uniform numbers of the stream.
+        """
+        bit_generator = np.random.Philox(key=self.key)
+        bit_generator.state = self._state(year, cell, phase)
+        return RandomBuffer(np.random.Generator(bit_generator)).uniform(n)
@@ -6,17 +6,42 @@
 __author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
 __email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
 
+from . import __version__
 from .landscape import Jungle, Savannah
 from .animals import Herb, Carn
 from .island import Island
+from .recorder import Recorder
+from .autosave import checkpoint_files
+from .checkpoint import make_delta, read_checkpoint, write_checkpoint
+from .cache import operation_key
+from .stopping import StopReason, check_conditions
+from .pacing import YearClock
+from .profiling import CellProfile, PhaseProfile
+from .counters import OperationCounts
 import random as rd
 import numpy as np
-import subprocess
-import matplotlib.pyplot as plt
-import pandas as pd
+import os
+import pickle
 import textwrap
+import traceback
 import shutil
-from matplotlib.widgets import Button
+import time
+import zipfile
+from collections import namedtuple
+
+# matplotlib, pandas and subprocess are imported where they are used, so
+# that importing the module and running without graphics stays fast.
+
+YearSnapshot = namedtuple(
+    "YearSnapshot",
+    ["year", "num_herbivores", "num_carnivores", "herbivores", "carnivores"],
+)
+YearSnapshot.__doc__ = """State of the island after a simulated year.
+
+The herbivores and carnivores fields are arrays with the number of
+animals of the species in each cell, or None if not asked for. The arrays
+are reused for every snapshot, so they must be copied to be kept.
+"""
 
 
 class BioSim:
@@ -38,6 +63,43 @@ class BioSim:
         String with beginning of file name for figures, including path.
     img_fmt: string
         String with file type for figures, e.g. 'png'.
+    rng_mode: string
+        "block" (default) draws the random numbers from one stream in large
+        blocks, "counter" keys them by (seed, year, cell, phase) so they can
+        be regenerated for any cell and year without replaying the run.
+    parameters: SimulationParameters or dict
+        Parameters for the species and landscape types owned by this
+        simulation, or a dictionary of dictionaries like the one returned
+        by parameters.as_dict. If None, the current class level parameters
+        are used.
+    headless: bool
+        If True, pyplot is never used. Nothing is shown on screen, and
+        figures are only drawn, with the Agg backend, when they are saved
+        to file.
+    cache: StateCache
+        Cache of simulated states. If given, the constructor arguments,
+        parameter changes, added populations and simulated years are
+        logged, and simulate continues from the state after the longest
+        logged sequence of operations that is in the cache, instead of
+        simulating it again. The state at the end of simulate is stored in
+        the cache. No figures or observer calls are made for years taken
+        from the cache. A seed must be given to use a cache.
+    profile: bool
+        If True, the time and the number of animals of every phase of the
+        simulated years are recorded, see profile_report.
+    cell_profile_years: int
+        If given, the time of every phase in every cell is sampled every
+        cell_profile_years years, see cell_profile, and a heat map of the
+        cost of the cells is drawn next to the animal heat maps.
+    count_operations: bool
+        If True, the random numbers, exponentials, sorts, removals from
+        lists and births of every simulated year are counted, see
+        operation_counts.
+    record_statistics: bool
+        If True, the mean weight and fitness of each species are recorded
+        every year. They take a pass over every animal, so by default they
+        are not computed and are recorded as NaN, and recording a year
+        costs O(1).
 
     Attributes
     ----------
@@ -67,6 +129,8 @@ class BioSim:
     img_base should contain a path and beginning of a file name.
     """
 
+    CHECKPOINT_FORMAT = 1
+
     def __init__(
         self,
         island_map,
@@ -76,20 +140,94 @@ class BioSim:
         cmax_animals=None,
         img_base=None,
         img_fmt="png",
+        rng_mode="block",
+        parameters=None,
+        headless=False,
+        cache=None,
+        profile=False,
+        cell_profile_years=None,
+        count_operations=False,
+        record_statistics=False,
     ):
 
         rd.seed(seed)
         np.random.seed(seed)
         island_map = textwrap.dedent(island_map)
+        self._setup(
+            island_map,
+            Island(
+                island_map,
+                ini_pop=ini_pop,
+                seed=seed,
+                rng_mode=rng_mode,
+                parameters=parameters,
+            ),
+            ymax_animals,
+            cmax_animals,
+            img_base,
+            img_fmt,
+            headless,
+            record_statistics,
+        )
+        if profile:
+            self._island.profile = PhaseProfile()
+        if cell_profile_years is not None:
+            self._island.cell_profile = CellProfile(
+                (self._island.map_rows, self._island.map_columns),
+                cell_profile_years,
+            )
+        if count_operations:
+            self._island.counters = OperationCounts()
+        if cache is not None and seed is None:
+            raise ValueError("A seed is needed to use a cache")
+        self._cache = cache
+        self._log_operation(
+            [
+                "BioSim",
+                __version__,
+                island_map,
+                ini_pop,
+                seed,
+                rng_mode,
+                record_statistics,
+                self._island.parameters.as_dict(),
+            ]
+        )
+
+    def _setup(
+        self,
+        island_map,
+        island,
+        ymax_animals,
+        cmax_animals,
+        img_base,
+        img_fmt,
+        headless,
+        record_statistics,
+    ):
+        """Sets the attributes of a simulation of an island.
+
+        Used by the constructor and by load_checkpoint, which must not seed
+        the random and numpy.random modules.
+        """
         self._island_map = island_map
-        self._island = Island(island_map, ini_pop=ini_pop)
-        self._year = 0
+        self._island = island
+        self._year = island.year
         self._img_ctr = 0
         self._ymax_animals = ymax_animals
         self._cmax_animals = cmax_animals
         self._img_base = img_base
         self._img_fmt = img_fmt
         self._img_pause_time = 1e-20
+        self._headless = headless
+        self._record_statistics = record_statistics
+        self._paused = False
+        self._recorder = Recorder()
+        self._stop_reason = None
+        self._throughput = None
+        self._cache = None
+        self._prefix_key = None
+        self._cached_years = 0
         # the following will be initialized by _setup_graphics
         self._fig = None
         self._map_ax = None
@@ -102,6 +240,8 @@ class BioSim:
         self._herb_map = None
         self._carn_map_ax = None
         self._carn_map = None
+        self._cost_map_ax = None
+        self._cost_map = None
         self._cmax_herb = None
         self._cmax_carn = None
         self._island_map_ax = None
@@ -116,14 +256,23 @@ class BioSim:
         Resets the parameters for the different classes using the
         set_default_parameters for the different classes.
         """
-        Herb().set_default_parameters_for_species()
-        Carn().set_default_parameters_for_species()
-        Jungle().set_default_parameters_for_jungle()
-        Savannah().set_default_parameters_for_savannah()
+        Herb.set_default_parameters_for_species()
+        Carn.set_default_parameters_for_species()
+        Jungle.set_default_parameters_for_jungle()
+        Savannah.set_default_parameters_for_savannah()
+
+    @property
+    def parameters(self):
+        """Parameters of the species and landscape types in the simulation.
+        """
+        return self._island.parameters
 
     def set_animal_parameters(self, species, params):
         """Sets parameters for animal species.
 
+        The parameters are owned by the simulation, so other simulations in
+        the same process are not affected.
+
         Parameters
         ----------
         species : string
@@ -136,18 +285,18 @@ class BioSim:
             If the species does not exist.
 
         """
-        if species == "Herbivore":
-            h = Herb()
-            h.set_parameters(params)
-        elif species == "Carnivore":
-            c = Carn()
-            c.set_parameters(params)
+        if species in ("Herbivore", "Carnivore"):
+            self._island.set_parameters(species, params)
+            self._log_operation(["set_animal_parameters", species, params])
         else:
             raise ValueError(f"Got non existing species {species} ")
 
     def set_landscape_parameters(self, landscape, params):
         """Sets parameters for landscape type.
 
+        The parameters are owned by the simulation, so other simulations in
+        the same process are not affected.
+
         Parameters
         ----------
         landscape : string
@@ -160,19 +309,28 @@ class BioSim:
             If the given landscape type doesn't exist.
 
         """
-        if landscape == "J":
-            j = Jungle()
-            j.set_parameters(params)
-        elif landscape == "S":
-            s = Savannah()
-            s.set_parameters(params)
+        if landscape in ("J", "S"):
+            self._island.set_parameters(landscape, params)
+            self._log_operation(
+                ["set_landscape_parameters", landscape, params]
+            )
         else:
             raise ValueError(
                 f"Only Jungle and Savannah landscapes can have"
                 f" parameters updated. Got landscape {landscape}"
             )
 
-    def simulate(self, num_years, vis_years=1, img_years=None):
+    def simulate(
+        self,
+        num_years,
+        vis_years=1,
+        img_years=None,
+        autosave=None,
+        stop_when=None,
+        time_budget=None,
+        years_per_second=None,
+        progress=None,
+    ):
         """Run simulation while visualizing the result.
 
         Parameters
@@ -183,30 +341,615 @@ class BioSim:
             years between visualization updates
         img_years: int
             years between visualizations saved to files (default: vis_years)
+        autosave: Autosaver
+            Saves rotating checkpoints while the simulation runs, if given.
+        stop_when: list
+            Conditions from the stopping module, e.g. Extinction or
+            SteadyState, checked after every year. The simulation stops
+            early when one of them is met, and stop_reason tells why. No
+            states are taken from the cache when conditions are given.
+        time_budget: float
+            Seconds of wall clock time the simulation may take. The years
+            are simulated until the next year is not expected to fit in the
+            budget, estimated from a moving average of the cost of a year,
+            but at most num_years years.
+        years_per_second: float
+            Maximum pace of the simulation, e.g. for live display. The
+            simulation waits after years that finish early.
+        progress: ProgressReporter
+            Reports years done, rates and the estimated time left while
+            the simulation runs, if given.
+        Returns
+        -------
+        Recorder
+            The recorder with the statistics of every simulated year.
+
         Notes
         -----
             Image files will be numbered consecutively.
+
+            No figure is made if vis_years is 0 and no images are saved. In
+            headless mode vis_years is ignored, and the figure is only drawn
+            when an image is saved.
+
+            The number of years simulated, the time it took and the rate
+            are given by throughput afterwards.
         """
 
         start_year = self._year
         self._final_year = start_year + num_years
-        self._setup_graphics()
-        self._update_graphics()
-        plt.pause(self._img_pause_time)
-        while self.year < self._final_year:
-            self._island.one_year()
-            self._year += 1
-            if vis_years:
-                if img_years is None:
-                    img_years = vis_years
-                if self.year % vis_years == 0:
+        self._stop_reason = None
+        conditions = list(stop_when or ())
+        if self._cache is not None and not conditions:
+            self._warm_start(num_years)
+        if img_years is None:
+            img_years = vis_years
+        show = bool(vis_years) and not self._headless
+        save = bool(img_years) and self._img_base is not None
+        self._record_year()
+        if show or save:
+            self._setup_graphics()
+            self._update_graphics()
+        if show:
+            import matplotlib.pyplot as plt
+
+            plt.pause(self._img_pause_time)
+        if autosave is not None:
+            autosave.start()
+        clock = YearClock(time_budget, years_per_second)
+        if progress is not None:
+            progress.start(self, self._final_year - self._year)
+        try:
+            while self.year < self._final_year:
+                if not clock.has_time_for_year():
+                    self._stop_reason = StopReason(
+                        self._year, "Time budget used"
+                    )
+                    break
+                self._run_year()
+                updated = False
+                if show and self.year % vis_years == 0:
                     self._update_graphics()
-                if self.year % img_years == 0:
+                    updated = True
+                if save and self.year % img_years == 0:
+                    if not updated:
+                        self._update_graphics()
                     self._save_graphics()
-                plt.pause(self._img_pause_time)
+                if show:
+                    plt.pause(self._img_pause_time)
+                    while self._paused:
+                        plt.pause(0.05)
+                if autosave is not None:
+                    autosave.year_done(self)
+                clock.year_done()
+                if progress is not None:
+                    progress.year_done(self)
+                if conditions:
+                    reason = check_conditions(conditions, self._recorder)
+                    if reason is not None:
+                        self._stop_reason = StopReason(self._year, reason)
+                        break
+                delay = clock.delay()
+                if delay:
+                    if show:
+                        plt.pause(delay)
+                    else:
+                        time.sleep(delay)
+                    clock.waited()
+            if progress is not None:
+                progress.report(self)
+        finally:
+            self._throughput = clock.throughput
+            if autosave is not None:
+                autosave.stop()
+        if self._cache is not None and self._state_key() not in self._cache:
+            self._cache.put(self._state_key(), self._checkpoint_arrays())
+        return self._recorder
+
+    def _run_year(self):
+        """Simulates one year and records its statistics.
+        """
+        self._island.one_year()
+        self._year += 1
+        self._cached_years += 1
+        self._record_year()
+
+    def _log_operation(self, operation):
+        """Adds an operation to the log used for cache keys.
+        """
+        if self._cache is not None:
+            self._prefix_key = operation_key(self._state_key(), operation)
+            self._cached_years = 0
+
+    def _state_key(self):
+        """Returns the cache key of the current state.
+        """
+        return operation_key(
+            self._prefix_key, ["simulate", self._cached_years]
+        )
+
+    def _warm_start(self, num_years):
+        """Continues from the latest cached state within the next years.
+        """
+        for years in range(
+            self._cached_years + num_years, self._cached_years, -1
+        ):
+            arrays = self._cache.get(
+                operation_key(self._prefix_key, ["simulate", years])
+            )
+            if (
+                arrays is not None
+                and int(arrays.get("format", -1)) == self.CHECKPOINT_FORMAT
+            ):
+                self._restore(arrays)
+                self._cached_years = years
+                return
+
+    def _restore(self, arrays):
+        """Replaces the island and recorder with a saved state.
+        """
+        island = Island.from_state(arrays)
+        island._observers = self._island._observers
+        island.profile = self._island.profile
+        island.cell_profile = self._island.cell_profile
+        island.counters = self._island.counters
+        self._island = island
+        self._year = island.year
+        self._restore_recorder(arrays)
+
+    def _restore_recorder(self, arrays):
+        """Replaces the recorder with saved statistics, if they are saved.
+        """
+        if "recorder_year" in arrays:
+            self._recorder = Recorder.from_dict(
+                {
+                    field: arrays["recorder_" + field]
+                    for field in Recorder.FIELDS
+                }
+            )
+
+    def _record_year(self):
+        """Records the statistics of the current year, unless it is already
+        recorded.
+        """
+        if self._recorder.last_year == self._year:
+            return
+        island = self._island
+        num_herb = island.totals["Herbivore"]
+        num_carn = island.totals["Carnivore"]
+        if self._record_statistics:
+            statistics = island.mean_weight_and_fitness()
+        else:
+            statistics = dict.fromkeys(island.totals, (np.nan, np.nan))
+        self._recorder.record(
+            year=self._year,
+            herbivores=num_herb,
+            carnivores=num_carn,
+            herbivore_births=island.births["Herbivore"],
+            carnivore_births=island.births["Carnivore"],
+            herbivore_deaths=island.deaths["Herbivore"],
+            carnivore_deaths=island.deaths["Carnivore"],
+            herbivore_weight=statistics["Herbivore"][0],
+            carnivore_weight=statistics["Carnivore"][0],
+            herbivore_fitness=statistics["Herbivore"][1],
+            carnivore_fitness=statistics["Carnivore"][1],
+        )
+
+    @property
+    def throughput(self):
+        """Years simulated, seconds taken and years per second in the last
+        call to simulate, or None before the first call.
+        """
+        return self._throughput
+
+    @property
+    def stop_reason(self):
+        """Year and reason the last call to simulate stopped early, or None
+        if it simulated all the years.
+        """
+        return self._stop_reason
+
+    @property
+    def recorder(self):
+        """Recorder with the statistics of every simulated year.
+        """
+        return self._recorder
+
+    @property
+    def profile(self):
+        """PhaseProfile of the simulated years, or None if profiling is off.
+        """
+        return self._island.profile
+
+    def profile_report(self):
+        """Makes a table of the time and animals of each phase of the year.
+
+        Returns
+        -------
+        str
+            The report of the PhaseProfile.
+
+        Raises
+        ------
+        ValueError
+            If the simulation was not made with profile=True.
+        """
+        if self._island.profile is None:
+            raise ValueError("Profiling is not enabled")
+        return self._island.profile.report()
+
+    @property
+    def cell_profile(self):
+        """CellProfile with the time of each phase in each cell of the
+        sampled years, or None if sampling is off.
+        """
+        return self._island.cell_profile
+
+    @property
+    def operation_counts(self):
+        """OperationCounts of the simulated years, or None if counting is
+        off.
+        """
+        return self._island.counters
+
+    def add_observer(self, callback, phase="year", census=True):
+        """Registers a callback that is called after a phase of the year.
+
+        With the default phase the callback is called at the end of every
+        simulated year. The callback gets a PhaseEvent with the year, the
+        phase and read only views of the census grids. No time is spent on
+        phases without observers, and the census is only taken when an
+        observer of the phase asks for it.
+
+        Parameters
+        ----------
+        callback : callable
+            Function taking a PhaseEvent.
+        phase : str
+            "year", "feeding", "procreation", "migration" or "death".
+        census : bool
+            If False, the census grids of the event are None.
+
+        Raises
+        ------
+        ValueError
+            If the phase does not exist.
+        """
+        self._island.add_observer(phase, callback, census)
+
+    def remove_observer(self, callback, phase="year"):
+        """Removes a callback registered with add_observer.
+
+        Parameters
+        ----------
+        callback : callable
+            The registered function.
+        phase : str
+            The phase the callback was registered for.
+        """
+        self._island.remove_observer(phase, callback)
+
+    def iter_years(self, num_years, every=1, fields=()):
+        """Simulates years and yields a snapshot of the island along the way.
+
+        No figure is made. The census arrays are allocated once and reused,
+        so memory use does not grow with the number of years, and the
+        simulation can be stopped early by breaking out of the loop.
+
+        Parameters
+        ----------
+        num_years : int
+            Number of years to simulate.
+        every : int
+            Number of simulated years between snapshots.
+        fields : iterable
+            Census grids to include in the snapshots, "Herbivore" and/or
+            "Carnivore".
+
+        Yields
+        ------
+        YearSnapshot
+            Year, animal totals and the census grids asked for.
+
+        Raises
+        ------
+        ValueError
+            If every is not a positive integer or a field is unknown.
+        """
+        if not isinstance(every, int) or every < 1:
+            raise ValueError("every must be a positive integer")
+        fields = set(fields)
+        if not fields <= {"Herbivore", "Carnivore"}:
+            raise ValueError(f"Unknown census fields {fields}")
+        shape = (self._island.map_rows, self._island.map_columns)
+        herb_grid = np.zeros(shape, dtype=int)
+        carn_grid = np.zeros(shape, dtype=int)
+        self._record_year()
+        for years_done in range(1, num_years + 1):
+            self._run_year()
+            if years_done % every:
+                continue
+            if fields:
+                self._island.census(herb_grid, carn_grid)
+                num_herb = int(herb_grid.sum())
+                num_carn = int(carn_grid.sum())
+            else:
+                num_herb = self._island.totals["Herbivore"]
+                num_carn = self._island.totals["Carnivore"]
+            yield YearSnapshot(
+                self._year,
+                num_herb,
+                num_carn,
+                herb_grid if "Herbivore" in fields else None,
+                carn_grid if "Carnivore" in fields else None,
+            )
+
+    async def aiter_years(self, num_years, every=1, fields=(), executor=None):
+        """Asynchronous version of iter_years for use in asyncio programs.
+
+        The years are simulated in a worker thread, so the event loop is
+        free to serve other tasks while a year is running. The next years
+        are only simulated when the consumer asks for the next snapshot,
+        which gives backpressure from slow consumers. Cancelling the
+        consuming task stops the simulation after the year that is
+        running.
+
+        Parameters
+        ----------
+        num_years : int
+            Number of years to simulate.
+        every : int
+            Number of simulated years between snapshots.
+        fields : iterable
+            Census grids to include in the snapshots, "Herbivore" and/or
+            "Carnivore".
+        executor : concurrent.futures.Executor
+            Executor the years are run in. A single worker thread is used
+            if None.
+
+        Yields
+        ------
+        YearSnapshot
+            Year, animal totals and the census grids asked for.
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=1)
+        years = self.iter_years(num_years, every=every, fields=fields)
+        future = None
+        try:
+            while True:
+                future = executor.submit(next, years, None)
+                snapshot = await asyncio.wrap_future(future)
+                if snapshot is None:
+                    break
+                yield snapshot
+        finally:
+            if future is not None and not future.done():
+                # The year is still running in the worker thread, so the
+                # generator is closed there once it is done
+                future.add_done_callback(lambda _: years.close())
+            else:
+                years.close()
+            if own_executor:
+                executor.shutdown(wait=False)
+
+    def _checkpoint_arrays(self, recorder=True):
+        """Returns the state of the simulation as a dictionary of arrays.
+        """
+        arrays = {
+            "format": np.array(self.CHECKPOINT_FORMAT),
+            "img_ctr": np.array(self._img_ctr),
+            "record_statistics": np.array(self._record_statistics),
+        }
+        arrays.update(self._island.get_state())
+        if recorder:
+            for field, values in self._recorder.as_dict().items():
+                arrays["recorder_" + field] = values
+        return arrays
+
+    def save_checkpoint(self, path, recorder=True, base=None):
+        """Saves the state of the simulation to a NumPy .npz file.
+
+        The file holds the map, the parameters, the year, the fodder of
+        every cell, the age, weight and fitness of every animal, the state
+        of the random numbers and whether statistics are recorded, so a
+        simulation loaded from the file continues exactly like this one.
+        Figures are not saved.
+
+        If base is given, an incremental checkpoint is saved, which only
+        holds the cells that changed since the base checkpoint. It is
+        loaded like a full checkpoint as long as the base is kept in the
+        same directory, and can be merged with the base by
+        checkpoint.compact_checkpoint. Since every animal ages every year,
+        every cell with animals has changed a year after the base, see
+        checkpoint.make_delta.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file.
+        recorder : bool
+            If True, the recorded statistics are saved as well.
+        base : str
+            Path of a full checkpoint of this simulation, or None.
+        """
+        arrays = self._checkpoint_arrays(recorder)
+        if base is not None:
+            arrays = make_delta(arrays, base)
+        write_checkpoint(path, arrays)
+
+    @classmethod
+    def load_checkpoint(
+        cls,
+        path,
+        ymax_animals=None,
+        cmax_animals=None,
+        img_base=None,
+        img_fmt="png",
+        headless=False,
+    ):
+        """Loads a simulation saved with save_checkpoint.
+
+        Incremental checkpoints are applied to their base. Unlike the
+        constructor, loading does not seed the random and numpy.random
+        modules.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file.
+        ymax_animals, cmax_animals, img_base, img_fmt, headless
+            Graphics settings as for the constructor.
+
+        Returns
+        -------
+        BioSim
+            Simulation that continues from the saved year.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a checkpoint of a known format.
+        """
+        arrays = read_checkpoint(path)
+        if int(arrays.get("format", -1)) != cls.CHECKPOINT_FORMAT:
+            raise ValueError(f"{path} is not a known checkpoint format")
+        sim = cls.__new__(cls)
+        sim._setup(
+            str(arrays["map"]),
+            Island.from_state(arrays),
+            ymax_animals,
+            cmax_animals,
+            img_base,
+            img_fmt,
+            headless,
+            bool(arrays.get("record_statistics", False)),
+        )
+        sim._restore_recorder(arrays)
+        sim._img_ctr = int(arrays["img_ctr"])
+        return sim
+
+    @classmethod
+    def resume(cls, directory, **kwargs):
+        """Loads the newest valid checkpoint saved by an Autosaver.
+
+        Checkpoints that cannot be read, e.g. because the run was stopped
+        while one was written, are skipped.
+
+        Parameters
+        ----------
+        directory : str
+            Directory the checkpoints are saved in.
+        kwargs
+            Graphics settings passed on to load_checkpoint.
+
+        Returns
+        -------
+        BioSim
+            Simulation that continues from the newest valid checkpoint.
+
+        Raises
+        ------
+        FileNotFoundError
+            If there is no valid checkpoint in the directory.
+        """
+        for path in checkpoint_files(directory):
+            try:
+                return cls.load_checkpoint(path, **kwargs)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                continue
+        raise FileNotFoundError(f"No valid checkpoint in {directory}")
 
-            while self._paused:
-                plt.pause(0.05)
+    def fork(self, n, modify=None, num_years=0, result=None):
+        """Runs branches of the simulation in child processes.
+
+        Each branch is a child process made with os.fork, so it starts from
+        a copy-on-write copy of the simulation in its current state without
+        simulating the shared years again. Every branch gets its own random
+        number stream, is changed by modify, simulates num_years years
+        without graphics and sends result back to this process through a
+        pipe. The simulation itself is not changed.
+
+        The process should not have other threads running, e.g. an
+        autosaver, when it is forked.
+
+        Parameters
+        ----------
+        n : int
+            Number of branches.
+        modify : callable
+            Function taking the branch simulation and the branch number,
+            e.g. to change parameters or add animals. Nothing is changed if
+            None.
+        num_years : int
+            Number of years each branch simulates.
+        result : callable
+            Function taking the branch simulation after the years are
+            simulated and returning a picklable result. If None, the
+            statistics of the branch recorder are returned as by
+            Recorder.as_dict.
+
+        Returns
+        -------
+        list
+            The result of every branch.
+
+        Raises
+        ------
+        RuntimeError
+            If os.fork is not available, or a branch failed.
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Forking needs os.fork, which is not available")
+        children = []
+        for branch in range(n):
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                try:
+                    self._island.rng = self._island.rng.branch(branch)
+                    self._log_operation(["fork", branch])
+                    self._headless = True
+                    if modify is not None:
+                        modify(self, branch)
+                    self.simulate(num_years, vis_years=0)
+                    value = (
+                        self._recorder.as_dict()
+                        if result is None
+                        else result(self)
+                    )
+                    payload = pickle.dumps((True, value))
+                except BaseException:
+                    payload = pickle.dumps((False, traceback.format_exc()))
+                try:
+                    with os.fdopen(write_fd, "wb") as pipe:
+                        pipe.write(payload)
+                finally:
+                    os._exit(0)
+            os.close(write_fd)
+            children.append((pid, read_fd))
+        results = []
+        errors = []
+        for branch, (pid, read_fd) in enumerate(children):
+            with os.fdopen(read_fd, "rb") as pipe:
+                payload = pipe.read()
+            os.waitpid(pid, 0)
+            if not payload:
+                errors.append(f"Branch {branch} exited without a result")
+                continue
+            succeeded, value = pickle.loads(payload)
+            if succeeded:
+                results.append(value)
+            else:
+                errors.append(f"Branch {branch} failed:\n{value}")
+        if errors:
+            raise RuntimeError("\n".join(errors))
+        return results
 
     def add_population(self, population):
         """Adds a population of animals to a given location on the island.
@@ -217,6 +960,7 @@ class BioSim:
             List of dictionaries with animals of given location and population.
         """
         self._island.add_population(population)
+        self._log_operation(["add_population", population])
 
     @property
     def year(self):
@@ -246,6 +990,8 @@ class BioSim:
         """Pandas DataFrame with animal count per species for each cell
         on island.
         """
+        import pandas as pd
+
         animal_count_list = self._island.animals_on_square()
         pd_data = pd.DataFrame(
             data=animal_count_list,
@@ -260,6 +1006,8 @@ class BioSim:
         The movie is stored as img_base + movie_fmt
         """
 
+        import subprocess
+
         if self._img_base is None:
             raise RuntimeError("No filename defined.")
 
@@ -317,8 +1065,19 @@ class BioSim:
     def _setup_graphics(self):
         """ Sets up the graphic windows.
         """
+        from matplotlib.patches import Rectangle
+
         if self._fig is None:
-            self._fig = plt.figure(figsize=(15, 9))
+            if self._headless:
+                from matplotlib.figure import Figure
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+                self._fig = Figure(figsize=(15, 9))
+                FigureCanvasAgg(self._fig)
+            else:
+                import matplotlib.pyplot as plt
+
+                self._fig = plt.figure(figsize=(15, 9))
         if self._animal_lines_ax is None:
             self._animal_lines_ax = self._fig.add_axes([0.6, 0.6, 0.35, 0.35])
             self._animal_lines_ax.set_xlabel("Years")
@@ -335,48 +1094,15 @@ class BioSim:
             self._large_island = True
 
         if self._herb_line is None:
-            # Creates plot object with no y-values that has the correct length,
-            # y-data will be gathered and set by self._update_graphics
-            herb_plot = self._animal_lines_ax.plot(
-                np.arange(0, self._final_year + 1),
-                np.full(self._final_year + 1, np.nan),
-                label="Herbivores",
-            )
-            # Saves the line object from herb_plot
-            self._herb_line = herb_plot[0]
-        else:
-            # Collects the data of the current active herb_line
-            xdata, ydata = self._herb_line.get_data()
-            # Creates array of values for the new years that is about to be
-            # simulated
-            xnew = np.arange(xdata[-1] + 1, self._final_year + 1)
-            if len(xnew) > 0:
-                ynew = np.full(xnew.shape, np.nan)
-                self._herb_line.set_data(
-                    np.hstack((xdata, xnew)), np.hstack((ydata, ynew))
-                )
+            # The line data is set from the recorder by _update_animal_lines
+            self._herb_line = self._animal_lines_ax.plot(
+                [], [], label="Herbivores"
+            )[0]
 
         if self._carn_line is None:
-            # Creates plot object with no y-values that has the correct length,
-            # y-data will be gathered and set by self._update_graphics
-            carn_plot = self._animal_lines_ax.plot(
-                np.arange(0, self._final_year + 1),
-                np.full(self._final_year + 1, np.nan),
-                label="Carnivores",
-            )
-            # Saves the line object from herb_plot
-            self._carn_line = carn_plot[0]
-        else:
-            # Collects the data of the current active herb_line
-            xdata, ydata = self._carn_line.get_data()
-            # Creates array of values for the new years that is about to be
-            # simulated
-            xnew = np.arange(xdata[-1] + 1, self._final_year + 1)
-            if len(xnew) > 0:
-                ynew = np.full(xnew.shape, np.nan)
-                self._carn_line.set_data(
-                    np.hstack((xdata, xnew)), np.hstack((ydata, ynew))
-                )
+            self._carn_line = self._animal_lines_ax.plot(
+                [], [], label="Carnivores"
+            )[0]
 
         if self._animal_lines_ax_legend is None:
             self._animal_lines_ax.legend(loc="upper left")
@@ -428,6 +1154,12 @@ class BioSim:
                 self._carn_map_ax.set_yticklabels(range(self._island.map_rows))
                 self._carn_map_ax.set_title("Carnivore distribution")
 
+        if self._cost_map_ax is None and self._island.cell_profile is not None:
+            self._cost_map_ax = self._fig.add_axes([0.33, 0.05, 0.25, 0.25])
+            self._cost_map_ax.set_xticks((0, self._island.map_columns - 1))
+            self._cost_map_ax.set_yticks((0, self._island.map_rows - 1))
+            self._cost_map_ax.set_title("Cost per cell (ms)")
+
         if self._island_map_ax is None:
             rgb_value = {
                 "O": (0.0, 0.0, 1.0),  # blue
@@ -474,7 +1206,7 @@ class BioSim:
                 ("Ocean", "Mountain", "Jungle", "Savannah", "Desert")
             ):
                 map_rect.add_patch(
-                    plt.Rectangle(
+                    Rectangle(
                         (0.0, ix * 0.2),
                         0.1,
                         0.1,
@@ -510,8 +1242,9 @@ class BioSim:
                 fontsize=14,
             )
 
-        if self._pause_ax is None:
-            self._paused = False
+        if self._pause_ax is None and not self._headless:
+            from matplotlib.widgets import Button
+
             self._pause_ax = self._fig.add_axes([0.6, 0.10, 0.3, 0.15])
             self._pause_widget = Button(
                 self._pause_ax, "Pause/Run", hovercolor="0.5"
@@ -520,20 +1253,32 @@ class BioSim:
 
     def _update_graphics(self):
         """Updates the graphics figure
+
+        The census of the island is only taken once per update, and shared
+        by the lines, heat maps and text.
         """
-        self._update_animal_lines()
-        self._update_animal_heat_maps()
-        self._update_text()
+        herb_grid, carn_grid = self._island.census()
+        num_herb = int(herb_grid.sum())
+        num_carn = int(carn_grid.sum())
+        self._update_animal_lines(num_herb, num_carn)
+        self._update_animal_heat_maps(herb_grid, carn_grid)
+        if self._cost_map_ax is not None:
+            self._update_cost_map()
+        self._update_text(num_herb, num_carn)
 
-    def _update_text(self):
+    def _update_text(self, num_herb, num_carn):
         """Updates the text in the graphics
+
+        Parameters
+        ----------
+        num_herb : int
+            Number of herbivores on the island.
+        num_carn : int
+            Number of carnivores on the island.
         """
         self._island_text.set_text(
             self._island_text_values.format(
-                self.year,
-                self.num_animals,
-                self.num_animals_per_species["Herbivore"],
-                self.num_animals_per_species["Carnivore"],
+                self.year, num_herb + num_carn, num_herb, num_carn,
             )
         )
 
@@ -556,42 +1301,42 @@ class BioSim:
         else:
             self._paused = True
 
-    def _update_animal_lines(self):
+    def _update_animal_lines(self, num_herb, num_carn):
         """ Updates the animal lines in the graphics.
+
+        Parameters
+        ----------
+        num_herb : int
+            Number of herbivores on the island.
+        num_carn : int
+            Number of carnivores on the island.
         """
         if self._ymax_animals is None:
-            # Saves number of animals in a variable so that property
-            # num_animals dont need to be called multiple times
-            number_of_animals = self.num_animals
+            number_of_animals = num_herb + num_carn
             if number_of_animals > self._animal_lines_ax.get_ylim()[1]:
                 self._animal_lines_ax.set_ylim(0, number_of_animals + 100)
-        ydata_herb = self._herb_line.get_ydata()
-        ydata_herb[self._year] = self.num_animals_per_species["Herbivore"]
-        self._herb_line.set_ydata(ydata_herb)
-        ydata_carn = self._carn_line.get_ydata()
-        ydata_carn[self.year] = self.num_animals_per_species["Carnivore"]
-        self._carn_line.set_ydata(ydata_carn)
-
-    def _update_animal_heat_maps(self):
+        years = self._recorder["year"]
+        self._herb_line.set_data(years, self._recorder["herbivores"])
+        self._carn_line.set_data(years, self._recorder["carnivores"])
+
+    def _update_animal_heat_maps(self, herb_grid, carn_grid):
         """Updates the animal heat maps in the graphics.
+
+        Parameters
+        ----------
+        herb_grid : numpy.ndarray
+            Number of herbivores in each cell.
+        carn_grid : numpy.ndarray
+            Number of carnivores in each cell.
         """
 
         if self._herb_map is not None:
-            self._herb_map.set_data(
-                np.reshape(
-                    self.animal_distribution["Herbivore"].values,
-                    newshape=(self._island.map_rows, self._island.map_columns),
-                )
-            )
+            self._herb_map.set_data(herb_grid)
         else:
             self._herb_map = self._herb_map_ax.imshow(
-                np.reshape(
-                    self.animal_distribution["Herbivore"].values,
-                    newshape=(self._island.map_rows, self._island.map_columns),
-                ),
-                vmax=self._cmax_herb,
+                herb_grid, vmax=self._cmax_herb,
             )
-            plt.colorbar(
+            self._fig.colorbar(
                 self._herb_map,
                 ax=self._herb_map_ax,
                 orientation="vertical",
@@ -599,27 +1344,37 @@ class BioSim:
             )
 
         if self._carn_map is not None:
-            self._carn_map.set_data(
-                np.reshape(
-                    self.animal_distribution["Carnivore"].values,
-                    newshape=(self._island.map_rows, self._island.map_columns),
-                )
-            )
+            self._carn_map.set_data(carn_grid)
         else:
             self._carn_map = self._carn_map_ax.imshow(
-                np.reshape(
-                    self.animal_distribution["Carnivore"].values,
-                    newshape=(self._island.map_rows, self._island.map_columns),
-                ),
-                vmax=self._cmax_carn,
+                carn_grid, vmax=self._cmax_carn,
             )
-            plt.colorbar(
+            self._fig.colorbar(
                 self._carn_map,
                 ax=self._carn_map_ax,
                 orientation="vertical",
                 fraction=0.05,
             )
 
+    def _update_cost_map(self):
+        """Updates the heat map of the time spent in each cell in the last
+        sampled year.
+        """
+        cost_grid = 1000 * self._island.cell_profile.latest().sum(axis=2)
+        if self._cost_map is not None:
+            self._cost_map.set_data(cost_grid)
+        else:
+            self._cost_map = self._cost_map_ax.imshow(
+                cost_grid, cmap="inferno"
+            )
+            self._fig.colorbar(
+                self._cost_map,
+                ax=self._cost_map_ax,
+                orientation="vertical",
+                fraction=0.05,
+            )
+        self._cost_map.set_clim(0, max(cost_grid.max(), 1e-3))
+
     def _save_graphics(self):
         """Saves graphics to file if file name given.
         """
@@ -627,7 +1382,7 @@ class BioSim:
         if self._img_base is None:
             return
 
-        plt.savefig(
+        self._fig.savefig(
             "{base}_{num:05d}.{type}".format(
                 base=self._img_base, num=self._img_ctr, type=self._img_fmt
             )
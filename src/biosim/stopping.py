@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from collections import namedtuple
+
+StopReason = namedtuple("StopReason", ["year", "reason"])
+StopReason.__doc__ = """Year a simulation was stopped early, and why.
+"""
+
+_FIELDS = {"Herbivore": "herbivores", "Carnivore": "carnivores"}
+
+
+class Extinction:
+    """Stops a simulation when a species, or all animals, are extinct.
+
+    Parameters
+    ----------
+    species : str
+        "Herbivore" or "Carnivore", or None to stop when both are extinct.
+
+    Raises
+    ------
+    ValueError
+        If the species does not exist.
+    """
+
+    def __init__(self, species=None):
+        if species is not None and species not in _FIELDS:
+            raise ValueError(f"Got non existing species {species}")
+        self.species = species
+
+    def check(self, recorder):
+        """Checks the last recorded year.
+
+        Parameters
+        ----------
+        recorder : Recorder
+            The statistics of the simulation.
+
+        Returns
+        -------
+        str
+            Reason to stop, or None to continue.
+        """
+        if self.species is None:
+            if recorder["herbivores"][-1] + recorder["carnivores"][-1] == 0:
+                return "All animals are extinct"
+        elif recorder[_FIELDS[self.species]][-1] == 0:
+            return f"{self.species} is extinct"
+        return None
+
+
+class SteadyState:
+    """Stops a simulation when the animal totals have settled.
+
+    The totals of the last window years are compared with the totals of
+    the window years before. The populations are steady when the means of
+    the two windows differ by at most tolerance times the larger mean, and
+    the larger variance is at most variance_ratio times the smaller.
+
+    Parameters
+    ----------
+    window : int
+        Number of years in each window.
+    tolerance : float
+        Largest relative difference of the means.
+    variance_ratio : float
+        Largest ratio of the variances.
+    species : tuple
+        Species whose totals must be steady.
+
+    Raises
+    ------
+    ValueError
+        If window is less than 2, or a species does not exist.
+    """
+
+    def __init__(
+        self,
+        window=50,
+        tolerance=0.05,
+        variance_ratio=2.0,
+        species=("Herbivore", "Carnivore"),
+    ):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        for name in species:
+            if name not in _FIELDS:
+                raise ValueError(f"Got non existing species {name}")
+        self.window = window
+        self.tolerance = tolerance
+        self.variance_ratio = variance_ratio
+        self.species = tuple(species)
+
+    def check(self, recorder):
+        """Checks the last recorded years.
+
+        Parameters
+        ----------
+        recorder : Recorder
+            The statistics of the simulation.
+
+        Returns
+        -------
+        str
+            Reason to stop, or None to continue.
+        """
+        if len(recorder) < 2 * self.window:
+            return None
+        for name in self.species:
+            totals = recorder[_FIELDS[name]][-2 * self.window:]
+            earlier, later = totals[: self.window], totals[self.window:]
+            means = earlier.mean(), later.mean()
+            if abs(means[0] - means[1]) > self.tolerance * max(means):
+                return None
+            variances = sorted((earlier.var(), later.var()))
+            if variances[1] > self.variance_ratio * variances[0]:
+                return None
+        return f"Steady state over the last {2 * self.window} years"
+
+
+def check_conditions(conditions, recorder):
+    """Returns the reason of the first condition that stops a simulation.
+
+    Parameters
+    ----------
+    conditions : list
+        Stopping conditions, objects with a check method taking a Recorder.
+    recorder : Recorder
+        The statistics of the simulation.
+
+    Returns
+    -------
+    str
+        Reason to stop, or None to continue.
+    """
+    for condition in conditions:
+        reason = condition.check(recorder)
+        if reason is not None:
+            return reason
+    return None
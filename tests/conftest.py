@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.simulation import BioSim
+import pytest
+
+
+@pytest.fixture
+def small_island_map():
+    """Return the map of a small island with jungle and savannah"""
+    return "OOOOO\nOJJJO\nOJSJO\nOOOOO"
+
+
+@pytest.fixture
+def make_population():
+    """Return a function making a population of animals of age 5 and
+    weight 20 in one cell"""
+
+    def make(loc, herbivores=0, carnivores=0):
+        return [
+            {
+                "loc": loc,
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(herbivores)
+                ]
+                + [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(carnivores)
+                ],
+            }
+        ]
+
+    return make
+
+
+@pytest.fixture
+def make_populated_sim(small_island_map, make_population):
+    """Return a function making simulations of the small island with
+    herbivores and carnivores, taking the other BioSim arguments"""
+
+    def make(herbivores=40, carnivores=5, seed=1, **kwargs):
+        return BioSim(
+            island_map=small_island_map,
+            ini_pop=make_population((1, 2), herbivores, carnivores),
+            seed=seed,
+            **kwargs
+        )
+
+    return make
+
+
+@pytest.fixture
+def populated_sim(make_populated_sim):
+    """Return a small island with herbivores and carnivores"""
+    return make_populated_sim()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.autosave import Autosaver, checkpoint_files
+from biosim.simulation import BioSim
+import pytest
+import numpy as np
+import os
+import signal
+
+
+def test_invalid_arguments_raise_error(tmpdir):
+    """Tests that an autosaver without an interval raises ValueError"""
+    with pytest.raises(ValueError):
+        Autosaver(str(tmpdir))
+    with pytest.raises(ValueError):
+        Autosaver(str(tmpdir), every_years=1, keep=0)
+
+
+def test_rotating_checkpoints_and_resume(populated_sim, tmpdir):
+    """Tests that only the newest checkpoints are kept, and that resuming
+    from the newest continues like the run that was never stopped"""
+    directory = str(tmpdir)
+    populated_sim.simulate(
+        7, vis_years=0, autosave=Autosaver(directory, every_years=2, keep=2)
+    )
+    names = [os.path.basename(path) for path in checkpoint_files(directory)]
+    assert names == ["checkpoint_00000006.npz", "checkpoint_00000004.npz"]
+    resumed = BioSim.resume(directory)
+    assert resumed.year == 6
+    resumed.simulate(1, vis_years=0)
+    assert np.array_equal(
+        resumed.recorder["herbivores"], populated_sim.recorder["herbivores"]
+    )
+
+
+def test_resume_skips_broken_checkpoints(populated_sim, tmpdir):
+    """Tests that resume skips a checkpoint that cannot be read, and raises
+    FileNotFoundError when there is no valid checkpoint"""
+    directory = str(tmpdir)
+    with pytest.raises(FileNotFoundError):
+        BioSim.resume(directory)
+    populated_sim.simulate(
+        2, vis_years=0, autosave=Autosaver(directory, every_years=2)
+    )
+    with open(os.path.join(directory, "checkpoint_00000009.npz"), "w") as f:
+        f.write("not a checkpoint")
+    assert BioSim.resume(directory).year == 2
+
+
+def test_sigint_writes_final_checkpoint(populated_sim, tmpdir):
+    """Tests that SIGINT stops the simulation after the running year and
+    writes a checkpoint of it"""
+    directory = str(tmpdir)
+    populated_sim.add_observer(
+        lambda event: os.kill(os.getpid(), signal.SIGINT)
+        if event.year == 3
+        else None
+    )
+    handler = signal.getsignal(signal.SIGINT)
+    with pytest.raises(KeyboardInterrupt):
+        populated_sim.simulate(
+            10, vis_years=0, autosave=Autosaver(directory, every_years=100)
+        )
+    assert populated_sim.year == 3
+    assert signal.getsignal(signal.SIGINT) is handler
+    assert BioSim.resume(directory).year == 3
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.cache import StateCache, ResultCache, operation_key
+from biosim.simulation import BioSim
+import pytest
+import numpy as np
+import os
+import glob
+
+
+@pytest.fixture
+def run(make_populated_sim, make_population):
+    """Return a function running a burn-in with herbivores, then adding
+    carnivores and continuing, which returns the simulation and the number
+    of years it simulated"""
+
+    def run_simulation(cache, burn_in, years):
+        sim = make_populated_sim(
+            30, 0, seed=2, cache=cache, record_statistics=True
+        )
+        years_run = []
+        sim.add_observer(
+            lambda event: years_run.append(event.year), census=False
+        )
+        sim.set_animal_parameters("Herbivore", {"F": 12.0})
+        sim.simulate(burn_in, vis_years=0)
+        sim.add_population(make_population((2, 2), carnivores=5))
+        sim.simulate(years, vis_years=0)
+        return sim, len(years_run)
+
+    return run_simulation
+
+
+def test_operation_key_depends_on_all_operations(small_island_map):
+    """Tests that keys are equal for equal sequences of operations only"""
+    key = operation_key(None, ["BioSim", small_island_map, 1])
+    assert key == operation_key(None, ["BioSim", small_island_map, 1])
+    assert operation_key(key, ["simulate", 5]) != operation_key(
+        key, ["simulate", 6]
+    )
+    assert operation_key(key, {"a": 1, "b": 2}) == operation_key(
+        key, {"b": 2, "a": 1}
+    )
+
+
+def test_cache_needs_seed(make_populated_sim, tmpdir):
+    """Tests that using a cache without a seed raises ValueError"""
+    with pytest.raises(ValueError):
+        make_populated_sim(seed=None, cache=StateCache(str(tmpdir)))
+
+
+def test_warm_start_from_longest_cached_prefix(run, tmpdir):
+    """Tests that a run continues from the longest cached prefix of its
+    operations and ends like a run without a cache"""
+    cache = StateCache(str(tmpdir))
+    expected, _ = run(None, 6, 4)
+    _, years_run = run(cache, 6, 2)
+    assert years_run == 8
+    sim, years_run = run(cache, 6, 4)
+    assert years_run == 2
+    for field, values in expected.recorder.as_dict().items():
+        assert np.array_equal(sim.recorder[field], values)
+    _, years_run = run(cache, 5, 4)
+    assert years_run == 9
+
+
+def test_least_recently_used_states_are_evicted(
+    make_populated_sim, tmpdir
+):
+    """Tests that the cache removes the least recently used states when it
+    is full"""
+    cache = StateCache(str(tmpdir))
+    sim = make_populated_sim(30, 0, seed=2)
+    arrays = sim._checkpoint_arrays()
+    for key in ("a", "b", "c"):
+        cache.put(key, arrays)
+        os.utime(os.path.join(str(tmpdir), key + ".npz"), (0, ord(key)))
+    size = os.path.getsize(os.path.join(str(tmpdir), "a.npz"))
+    assert cache.get("a") is not None
+    cache.max_bytes = 2 * size
+    cache.put("d", arrays)
+    assert "a" in cache and "d" in cache
+    assert "b" not in cache and "c" not in cache
+    assert cache.get("b") is None
+
+
+def test_result_cache_returns_stored_runs(
+    small_island_map, make_population, tmpdir
+):
+    """Tests that equal runs are simulated once and give the same result,
+    while changed inputs are simulated again"""
+    herbivores = make_population((1, 2), herbivores=30)
+    parameters = {"Herbivore": {"F": 12.0}}
+    cache = ResultCache(str(tmpdir))
+    first = cache.run(small_island_map, herbivores, 3, 5, parameters)
+    again = cache.run(small_island_map, herbivores, 3, 5, parameters)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert np.array_equal(first.herbivores, again.herbivores)
+    for field, values in first.recorder.as_dict().items():
+        assert np.array_equal(again.recorder[field], values, equal_nan=True)
+    assert first.herbivores.sum() == first.recorder["herbivores"][-1]
+    cache.run(small_island_map, herbivores, 3, 5, {"Herbivore": {"F": 11.0}})
+    cache.run(small_island_map, herbivores, 3, 6, parameters)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_result_cache_key_includes_version(
+    small_island_map, make_population, tmpdir, monkeypatch
+):
+    """Tests that results of another version of biosim are not used"""
+    import biosim.cache
+
+    herbivores = make_population((1, 2), herbivores=30)
+    cache = ResultCache(str(tmpdir))
+    cache.run(small_island_map, herbivores, 3, 2)
+    monkeypatch.setattr(biosim.cache, "__version__", "0.0.0")
+    cache.run(small_island_map, herbivores, 3, 2)
+    assert cache.misses == 2
+
+
+def test_result_cache_hit_makes_no_simulation(
+    make_populated_sim, small_island_map, make_population, tmpdir, monkeypatch
+):
+    """Tests that a run gives the result of a simulation with the same
+    parameters, and that a cached run makes no simulation"""
+    import biosim.simulation
+
+    herbivores = make_population((1, 2), herbivores=30)
+    parameters = {"J": {"f_max": 500}}
+    cache = ResultCache(str(tmpdir))
+    result = cache.run(small_island_map, herbivores, 3, 4, parameters)
+    sim = make_populated_sim(30, 0, seed=3, headless=True)
+    sim.set_landscape_parameters("J", {"f_max": 500})
+    expected = sim.simulate(4, vis_years=0)
+    assert np.array_equal(
+        result.recorder["herbivores"], expected["herbivores"]
+    )
+    monkeypatch.setattr(biosim.simulation, "BioSim", None)
+    cache.run(small_island_map, herbivores, 3, 4, parameters)
+    assert cache.hits == 1
+    with pytest.raises(ValueError):
+        cache.run(small_island_map, herbivores, 3, 4, {"D": {"f_max": 1}})
+
+
+def test_result_cache_replaces_broken_results(
+    small_island_map, make_population, tmpdir
+):
+    """Tests that a stored result that misses arrays is removed and
+    simulated again"""
+    herbivores = make_population((1, 2), herbivores=30)
+    cache = ResultCache(str(tmpdir))
+    expected = cache.run(small_island_map, herbivores, 3, 2)
+    (path,) = glob.glob(os.path.join(str(tmpdir), "*.npz"))
+    np.savez(path, herbivores=expected.herbivores)
+    result = cache.run(small_island_map, herbivores, 3, 2)
+    assert cache.misses == 2
+    assert np.array_equal(result.herbivores, expected.herbivores)
+    cache.run(small_island_map, herbivores, 3, 2)
+    assert cache.hits == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_branches_do_not_share_cached_states(
+    make_populated_sim, tmpdir
+):
+    """Tests that the states of fork branches are cached under their own
+    keys, so they are not taken for the states of the unforked simulation
+    or of other branches"""
+    expected = make_populated_sim(seed=2).simulate(10, vis_years=0)
+    cache = StateCache(str(tmpdir))
+    sim = make_populated_sim(seed=2, cache=cache)
+    sim.simulate(5, vis_years=0)
+    branches = sim.fork(2, num_years=5)
+    assert not np.array_equal(
+        branches[0]["herbivores"], branches[1]["herbivores"]
+    )
+    sim.simulate(5, vis_years=0)
+    assert np.array_equal(sim.recorder["herbivores"], expected["herbivores"])
+    again = make_populated_sim(seed=2, cache=cache)
+    again.simulate(5, vis_years=0)
+    for branch, recorder in zip(branches, again.fork(2, num_years=5)):
+        assert np.array_equal(recorder["herbivores"], branch["herbivores"])
+
+
+def test_cached_states_of_other_versions_are_not_used(
+    make_populated_sim, tmpdir, monkeypatch
+):
+    """Tests that states cached by another version of biosim, or in another
+    checkpoint format, are simulated again"""
+    import biosim.simulation
+
+    cache = StateCache(str(tmpdir))
+    make_populated_sim(seed=2, cache=cache).simulate(3, vis_years=0)
+    monkeypatch.setattr(biosim.simulation, "__version__", "0.0.0")
+    years_run = []
+    sim = make_populated_sim(seed=2, cache=cache)
+    sim.add_observer(lambda event: years_run.append(event.year), census=False)
+    sim.simulate(3, vis_years=0)
+    assert years_run == [1, 2, 3]
+    monkeypatch.setattr(BioSim, "CHECKPOINT_FORMAT", 0)
+    years_run.clear()
+    sim = make_populated_sim(seed=2, cache=cache)
+    sim.add_observer(lambda event: years_run.append(event.year), census=False)
+    sim.simulate(3, vis_years=0)
+    assert years_run == [1, 2, 3]
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.checkpoint import compact_checkpoint, write_arrays
+from biosim.simulation import BioSim
+import pytest
+import numpy as np
+import os
+import threading
+
+
+@pytest.fixture
+def sim():
+    """Return an island where the animals live in one corner"""
+    island_map = "\n".join(
+        ["O" * 12] + ["O" + "J" * 10 + "O" for _ in range(10)] + ["O" * 12]
+    )
+    return BioSim(
+        island_map=island_map,
+        ini_pop=[
+            {
+                "loc": (1, 1),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(20)
+                ],
+            }
+        ],
+        seed=4,
+        record_statistics=True,
+    )
+
+
+def test_delta_checkpoint_resumes_exactly(sim, tmpdir):
+    """Tests that a delta checkpoint only holds changed cells and loads
+    into a simulation that continues like the saved one"""
+    base = os.path.join(str(tmpdir), "base.npz")
+    delta = os.path.join(str(tmpdir), "delta.npz")
+    sim.simulate(2, vis_years=0)
+    sim.save_checkpoint(base)
+    sim.simulate(2, vis_years=0)
+    sim.save_checkpoint(delta, base=base)
+    with np.load(delta) as arrays:
+        assert 0 < len(arrays["cells"]) < 144 / 4
+    resumed = BioSim.load_checkpoint(delta)
+    assert resumed.year == 4
+    resumed.simulate(3, vis_years=0)
+    sim.simulate(3, vis_years=0)
+    for field, values in sim.recorder.as_dict().items():
+        assert np.array_equal(resumed.recorder[field], values)
+    assert resumed._island.census()[0].tolist() == (
+        sim._island.census()[0].tolist()
+    )
+
+
+def test_compacted_checkpoint_equals_full_checkpoint(sim, tmpdir):
+    """Tests that merging a delta with its base gives the full checkpoint
+    of the same state"""
+    base = os.path.join(str(tmpdir), "base.npz")
+    delta = os.path.join(str(tmpdir), "delta.npz")
+    full = os.path.join(str(tmpdir), "full.npz")
+    compacted = os.path.join(str(tmpdir), "compacted.npz")
+    sim.simulate(2, vis_years=0)
+    sim.save_checkpoint(base)
+    sim.set_animal_parameters("Herbivore", {"F": 5.0})
+    sim.simulate(3, vis_years=0)
+    sim.save_checkpoint(delta, base=base)
+    sim.save_checkpoint(full)
+    compact_checkpoint(delta, compacted)
+    with np.load(full) as expected, np.load(compacted) as actual:
+        assert sorted(expected.files) == sorted(actual.files)
+        for key in expected.files:
+            assert np.array_equal(expected[key], actual[key])
+
+
+def test_delta_checkpoint_needs_its_base(sim, tmpdir):
+    """Tests that a delta cannot be made from a delta, and cannot be loaded
+    after its base is replaced"""
+    base = os.path.join(str(tmpdir), "base.npz")
+    delta = os.path.join(str(tmpdir), "delta.npz")
+    sim.save_checkpoint(base)
+    sim.simulate(1, vis_years=0)
+    sim.save_checkpoint(delta, base=base)
+    with pytest.raises(ValueError):
+        sim.save_checkpoint(os.path.join(str(tmpdir), "other.npz"), base=delta)
+    sim.save_checkpoint(base)
+    with pytest.raises(ValueError):
+        BioSim.load_checkpoint(delta)
+
+
+def test_concurrent_writers_leave_one_complete_file(tmpdir):
+    """Tests that writers of the same path use their own temporary files,
+    and that a failed write removes its temporary file"""
+    path = os.path.join(str(tmpdir), "state.npz")
+    errors = []
+
+    def write(value):
+        try:
+            write_arrays(path, {"value": np.full(100000, value)})
+        except Exception as error:
+            errors.append(error)
+
+    writers = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert errors == []
+    assert os.listdir(str(tmpdir)) == ["state.npz"]
+    with np.load(path) as arrays:
+        assert len(set(arrays["value"])) == 1
+    with pytest.raises(TypeError):
+        write_arrays(path, {"file": np.zeros(1)})
+    assert os.listdir(str(tmpdir)) == ["state.npz"]
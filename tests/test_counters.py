@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim import counters
+from biosim.animals import Herb
+from biosim.counters import OPERATIONS, OperationCounts
+from biosim.rng import RandomBuffer
+from biosim.simulation import BioSim
+import numpy as np
+import pytest
+import threading
+
+ISLAND_MAP = """\
+OOOOOOO
+OJJSJJO
+OJSDJJO
+OJJJJJO
+OOOOOOO"""
+
+POPULATION = [
+    {
+        "loc": (2, 2),
+        "pop": [
+            {"species": "Herbivore", "age": 5, "weight": 20}
+            for _ in range(40)
+        ]
+        + [
+            {"species": "Carnivore", "age": 5, "weight": 20}
+            for _ in range(8)
+        ],
+    }
+]
+
+
+def test_counts_are_kept_per_thread():
+    """Tests that a thread only counts its own operations, and that nothing
+    is counted outside a year"""
+    operation_counts = OperationCounts()
+    rng = RandomBuffer(1)
+    operation_counts.start_year(1, rng)
+    counters.add("sorts", 2)
+    other = threading.Thread(target=counters.add, args=("sorts", 5))
+    other.start()
+    other.join()
+    rng.uniform(3)
+    operation_counts.end_year(rng)
+    counters.add("sorts", 7)
+    assert counters.active == 0
+    assert operation_counts["sorts"].tolist() == [2]
+    assert operation_counts["rng_draws"].tolist() == [3]
+
+
+def test_births_count_the_animals_made():
+    """Tests that a birth the mother is too light for makes no animal and
+    is not counted, while a birth that happens is"""
+    operation_counts = OperationCounts()
+    rng = RandomBuffer(1)
+    mother = Herb(age=5, weight=100.0)
+    operation_counts.start_year(1, rng)
+    mother.xi = 1000.0
+    assert mother.will_birth(100, 0.0, rng) is None
+    assert mother.weight == 100.0
+    del mother.xi
+    assert isinstance(mother.will_birth(100, 0.0, rng), Herb)
+    operation_counts.end_year(rng)
+    assert operation_counts["births"].tolist() == [1]
+    assert operation_counts["rng_draws"].tolist() == [2]
+
+
+@pytest.mark.parametrize("rng_mode", ["block", "counter"])
+def test_simulation_operation_counts(rng_mode):
+    """Tests that every simulated year is counted, that the births match
+    the recorded births, and that counting does not change the results"""
+    results = []
+    for count_operations in (False, True):
+        sim = BioSim(
+            ISLAND_MAP,
+            POPULATION,
+            seed=2,
+            rng_mode=rng_mode,
+            headless=True,
+            record_statistics=True,
+            count_operations=count_operations,
+        )
+        sim.simulate(10, vis_years=0)
+        results.append(sim.recorder.as_dict())
+    for field, values in results[0].items():
+        assert np.array_equal(values, results[1][field])
+    counts = sim.operation_counts.as_dict()
+    assert list(counts) == ["year"] + list(OPERATIONS)
+    assert counts["year"].tolist() == list(range(1, 11))
+    recorder = sim.recorder
+    assert np.array_equal(
+        counts["births"],
+        (recorder["herbivore_births"] + recorder["carnivore_births"])[-10:],
+    )
+    assert (counts["sorted_elements"] >= counts["sorts"]).all()
+    assert (counts["rng_draws"] > 0).all()
+    assert (counts["exp_calls"] > 0).all()
+    assert counts["list_removes"].sum() > 0
+    assert BioSim(ISLAND_MAP, POPULATION, seed=2).operation_counts is None
+
+
+def test_failed_year_stops_counting():
+    """Tests that a year an observer fails in is not stored, and that
+    counting stops with it"""
+    sim = BioSim(
+        ISLAND_MAP, POPULATION, seed=2, headless=True, count_operations=True
+    )
+    sim.simulate(2, vis_years=0)
+
+    def fail(event):
+        raise RuntimeError("Observer failed")
+
+    sim.add_observer(fail, phase="migration", census=False)
+    with pytest.raises(RuntimeError):
+        sim.simulate(1, vis_years=0)
+    assert counters.active == 0
+    assert getattr(counters._local, "counts", None) is None
+    assert sim.operation_counts.as_dict()["year"].tolist() == [1, 2]
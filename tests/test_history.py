@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.history import (
+    CensusWriter,
+    CensusHistory,
+    CompressedCensusHistory,
+    load_census,
+)
+import pytest
+import numpy as np
+import os
+import threading
+
+
+class TestCensusWriter:
+    """Test class for the CensusWriter class.
+    """
+
+    def test_invalid_arguments_raise_error(self, tmpdir):
+        """Tests that an unknown format or chunk size raises ValueError.
+        """
+        with pytest.raises(ValueError):
+            CensusWriter(str(tmpdir), fmt="xls")
+        with pytest.raises(ValueError):
+            CensusWriter(str(tmpdir), chunk_years=0)
+
+    def test_npy_blocks_match_census(self, populated_sim, tmpdir):
+        """Tests that the written blocks hold the census of every year, and
+        that the index is written when the writer is closed.
+        """
+        expected = []
+        populated_sim.add_observer(
+            lambda event: expected.append(
+                (event.herbivores.copy(), event.carnivores.copy())
+            )
+        )
+        with CensusWriter(str(tmpdir), chunk_years=3) as writer:
+            populated_sim.add_observer(writer)
+            populated_sim.simulate(7, vis_years=0)
+            assert not os.path.exists(os.path.join(str(tmpdir), "index.json"))
+        years, census = load_census(str(tmpdir))
+        assert list(years) == list(range(1, 8))
+        assert census.shape == (7, 2, 4, 5)
+        assert len(os.listdir(str(tmpdir))) == 4
+        for year, (herb_grid, carn_grid) in enumerate(expected):
+            assert np.array_equal(census[year, 0], herb_grid)
+            assert np.array_equal(census[year, 1], carn_grid)
+
+    def test_csv_rows_match_census(self, populated_sim, tmpdir):
+        """Tests that the CSV file has a row for every cell and year.
+        """
+        writer = CensusWriter(str(tmpdir), fmt="csv", chunk_years=2)
+        populated_sim.add_observer(writer)
+        populated_sim.simulate(3, vis_years=0)
+        writer.close()
+        table = np.loadtxt(
+            os.path.join(str(tmpdir), "census.csv"),
+            delimiter=",",
+            skiprows=1,
+            dtype=int,
+        )
+        assert table.shape == (3 * 20, 5)
+        last_year = table[table[:, 0] == 3]
+        assert last_year[:, 3].sum() == populated_sim.num_animals_per_species[
+            "Herbivore"
+        ]
+        assert last_year[:, 4].sum() == populated_sim.num_animals_per_species[
+            "Carnivore"
+        ]
+
+    def test_failed_index_raises_error_on_close(self, populated_sim, tmpdir):
+        """Tests that closing raises RuntimeError instead of hanging when
+        the index cannot be written.
+        """
+        os.mkdir(os.path.join(str(tmpdir), "index.json"))
+        writer = CensusWriter(str(tmpdir), chunk_years=2)
+        populated_sim.add_observer(writer)
+        populated_sim.simulate(3, vis_years=0)
+        errors = []
+
+        def close():
+            try:
+                writer.close()
+            except RuntimeError as error:
+                errors.append(error)
+
+        closer = threading.Thread(target=close, daemon=True)
+        closer.start()
+        closer.join(timeout=5)
+        assert not closer.is_alive()
+        assert len(errors) == 1
+
+
+class TestCensusHistory:
+    """Test class for the CensusHistory class.
+    """
+
+    def test_queries_match_census(self, populated_sim, tmpdir):
+        """Tests that the queries on a reopened history give the census of
+        the simulation, also after the file has grown.
+        """
+        expected = []
+        populated_sim.add_observer(
+            lambda event: expected.append(
+                np.stack((event.herbivores, event.carnivores), axis=-1)
+            )
+        )
+        with CensusHistory(str(tmpdir), capacity_years=2) as history:
+            populated_sim.add_observer(history)
+            populated_sim.simulate(5, vis_years=0)
+        expected = np.array(expected)
+        history = CensusHistory.open(str(tmpdir))
+        assert len(history) == 5
+        assert list(history.years) == [1, 2, 3, 4, 5]
+        assert os.path.getsize(os.path.join(str(tmpdir), "history.dat")) == (
+            expected.nbytes // expected.itemsize * 4
+        )
+        assert np.array_equal(history.map_at(3), expected[2])
+        assert np.array_equal(
+            history.map_at(3, "Carnivore"), expected[2, :, :, 1]
+        )
+        assert np.array_equal(
+            history.cell_series(1, 2, "Herbivore", first_year=2),
+            expected[1:, 1, 2, 0],
+        )
+        assert np.array_equal(
+            history.region_sum(slice(1, 3), slice(1, 4), last_year=4),
+            expected[:4, 1:3, 1:4].sum(axis=(1, 2)),
+        )
+
+    def test_invalid_years_raise_errors(self, tmpdir):
+        """Tests that appending a year out of order raises ValueError, and
+        that asking for a missing year raises KeyError.
+        """
+        history = CensusHistory(str(tmpdir))
+        grid = np.zeros((2, 2), dtype=int)
+        history.append(0, grid, grid)
+        with pytest.raises(ValueError):
+            history.append(2, grid, grid)
+        with pytest.raises(KeyError):
+            history.map_at(1)
+        history.close()
+        with pytest.raises(ValueError):
+            CensusHistory.open(str(tmpdir)).append(1, grid, grid)
+
+
+class TestCompressedCensusHistory:
+    """Test class for the CompressedCensusHistory class.
+    """
+
+    def test_invalid_arguments_raise_error(self, tmpdir):
+        """Tests that an unknown compression or chunk size raises
+        ValueError.
+        """
+        with pytest.raises(ValueError):
+            CompressedCensusHistory(str(tmpdir), compression="bz2")
+        with pytest.raises(ValueError):
+            CompressedCensusHistory(str(tmpdir), keyframe_years=0)
+
+    @pytest.mark.parametrize("compression", ["zlib", "lzma"])
+    def test_maps_match_census(self, populated_sim, tmpdir, compression):
+        """Tests that every year is reconstructed exactly from a reopened
+        history, with chunks split between keyframes.
+        """
+        expected = []
+        populated_sim.add_observer(
+            lambda event: expected.append(
+                np.stack((event.herbivores, event.carnivores), axis=-1)
+            )
+        )
+        with CompressedCensusHistory(
+            str(tmpdir), keyframe_years=4, compression=compression
+        ) as history:
+            populated_sim.add_observer(history)
+            populated_sim.simulate(10, vis_years=0)
+        history = CompressedCensusHistory.open(str(tmpdir))
+        assert list(history.years) == list(range(1, 11))
+        for year in (7, 1, 10, 4, 5):
+            assert np.array_equal(history.map_at(year), expected[year - 1])
+        assert np.array_equal(
+            history.map_at(6, "Carnivore"), expected[5][:, :, 1]
+        )
+        with pytest.raises(KeyError):
+            history.map_at(11)
+
+    def test_sparse_history_is_small(self, tmpdir):
+        """Tests that a history of a mostly empty map with few changes is
+        much smaller than the dense grids.
+        """
+        herb_grid = np.zeros((50, 50), dtype=int)
+        carn_grid = np.zeros((50, 50), dtype=int)
+        herb_grid[20:25, 20:25] = 30
+        with CompressedCensusHistory(str(tmpdir)) as history:
+            for year in range(200):
+                herb_grid[22, 22] = year
+                carn_grid[21, 21] = year % 3
+                history.append(year, herb_grid, carn_grid)
+        dense_size = 200 * 50 * 50 * 2 * 4
+        assert os.path.getsize(os.path.join(str(tmpdir), "census.z")) < (
+            dense_size / 100
+        )
@@ -112,3 +112,180 @@ class TestIsland:
                     }
                 ]
             )
+
+    def test_one_year_is_reproducible_with_seed(self):
+        """Tests that two islands with the same seed evolve identically.
+        """
+        population = [
+            {
+                "loc": (2, 2),
+                "pop": [
+                    {"species": "Herbivore", "age": 5, "weight": 20}
+                    for _ in range(50)
+                ]
+                + [
+                    {"species": "Carnivore", "age": 5, "weight": 20}
+                    for _ in range(10)
+                ],
+            }
+        ]
+        counts = []
+        for rng_mode in ("block", "block", "counter", "counter"):
+            island = Island(
+                "OOOOO\nOJJJO\nOJSJO\nOJJJO\nOOOOO",
+                seed=3,
+                rng_mode=rng_mode,
+            )
+            island.add_population(population)
+            for _ in range(5):
+                island.one_year()
+            counts.append(island.animals_on_square())
+        assert counts[0] == counts[1]
+        assert counts[2] == counts[3]
+
+    def test_invalid_rng_mode_raises_error(self):
+        """Tests that an unknown random number mode raises ValueError.
+        """
+        with pytest.raises(ValueError):
+            Island("OOO\nOJO\nOOO", rng_mode="mersenne")
+
+    def test_parameters_may_be_given_as_dict(self):
+        """Tests that parameters given as a dictionary of dictionaries are
+        converted, and that other types raise TypeError.
+        """
+        params = Island.class_parameters().as_dict()
+        params["Herbivore"]["F"] = 3.0
+        island = Island("OOO\nOJO\nOOO", parameters=params)
+        assert island.species["Herbivore"]().F == 3.0
+        with pytest.raises(TypeError):
+            Island("OOO\nOJO\nOOO", parameters=[params])
+
+    def test_census(self, island_small):
+        """Tests that the census counts the animals in each cell.
+        """
+        island_small.add_population(
+            [
+                {
+                    "loc": (1, 1),
+                    "pop": [{"species": "Herbivore", "age": 5, "weight": 20}]
+                    * 3
+                    + [{"species": "Carnivore", "age": 5, "weight": 20}],
+                }
+            ]
+        )
+        herb_grid, carn_grid = island_small.census()
+        assert herb_grid.shape == (3, 3)
+        assert herb_grid[1, 1] == 3
+        assert carn_grid[1, 1] == 1
+        assert herb_grid.sum() == 3
+
+    def test_observers_are_called_after_each_phase(self, island_small):
+        """Tests that observers get an event with census views after their
+        phase, and that unknown phases raise ValueError.
+        """
+        island_small.add_population(
+            [
+                {
+                    "loc": (1, 1),
+                    "pop": [{"species": "Herbivore", "age": 5, "weight": 20}]
+                    * 10,
+                }
+            ]
+        )
+        events = []
+
+        def observer(event):
+            events.append((event.year, event.phase, event.herbivores.sum()))
+            assert not event.herbivores.flags.writeable
+
+        for phase in ("feeding", "procreation", "migration", "death", "year"):
+            island_small.add_observer(phase, observer)
+        island_small.one_year()
+        assert [event[1] for event in events] == [
+            "feeding",
+            "procreation",
+            "migration",
+            "death",
+            "year",
+        ]
+        assert all(event[0] == 1 for event in events)
+        assert events[-1][2] == island_small.count_animals()[0]
+        island_small.remove_observer("year", observer)
+        island_small.one_year()
+        assert len(events) == 9
+        with pytest.raises(ValueError):
+            island_small.add_observer("lunch", observer)
+
+    def test_census_is_only_taken_for_observers_asking_for_it(
+        self, island_small
+    ):
+        """Tests that observers not asking for the census get no census
+        grids, and that no census is taken for them."""
+        without_census = []
+        with_census = []
+        island_small.census = None
+        island_small.add_observer("year", without_census.append, False)
+        island_small.one_year()
+        assert without_census[0].herbivores is None
+        assert without_census[0].carnivores is None
+        del island_small.census
+        island_small.add_observer("year", with_census.append)
+        island_small.one_year()
+        assert without_census[1].herbivores is None
+        assert with_census[0].herbivores.shape == (3, 3)
+        island_small.remove_observer("year", with_census.append)
+        with pytest.raises(ValueError):
+            island_small.remove_observer("year", with_census.append)
+
+    def test_animals_put_into_cells_migrate(self):
+        """Tests that animals put into the cell lists directly, and not yet
+        counted in totals, migrate.
+        """
+        island = Island("OOOOO\nOJJJO\nOOOOO", seed=1)
+        island.set_parameters("Herbivore", {"mu": 1.0})
+        middle = island.map_list[1][2]
+        middle.herb_list = [
+            island.species["Herbivore"](age=5, weight=50) for _ in range(50)
+        ]
+        assert island.totals["Herbivore"] == 0
+        island.one_year()
+        assert len(island.map_list[1][1].herb_list) > 0
+        assert len(island.map_list[1][3].herb_list) > 0
+
+    def test_totals_follow_births_and_deaths(self):
+        """Tests that the running totals match a count of the animals, and
+        that cells without animals are not visited.
+        """
+        island = Island(
+            "OOOOOOO\nOJJJJJO\nOJJJJJO\nOOOOOOO",
+            ini_pop=[
+                {
+                    "loc": (1, 1),
+                    "pop": [{"species": "Herbivore", "age": 5, "weight": 20}]
+                    * 20
+                    + [{"species": "Carnivore", "age": 5, "weight": 20}] * 5,
+                }
+            ],
+            seed=1,
+        )
+        assert island.totals == {"Herbivore": 20, "Carnivore": 5}
+
+        def fail(*args):
+            raise AssertionError("Empty cell visited")
+
+        far_cell = island.map_list[2][5]
+        methods = (
+            "feed_all_animals",
+            "birth_all_animals",
+            "migrate_all_animals",
+            "death_all_animals",
+        )
+        for method in methods:
+            setattr(far_cell, method, fail)
+        island.one_year()
+        for method in methods:
+            delattr(far_cell, method)
+        for _ in range(5):
+            herbs, carns = island.count_animals()[:2]
+            assert island.totals == {"Herbivore": herbs, "Carnivore": carns}
+            island.one_year()
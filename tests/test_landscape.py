@@ -11,11 +11,20 @@ from biosim.landscape import (
     Ocean,
     Desert,
 )
+from biosim.rng import RandomBuffer
 import pytest
 from scipy.stats import chisquare
 import numpy as np
 
 
+class SliceOnlyBuffer(RandomBuffer):
+    """Random buffer that fails if a number is taken one at a time.
+    """
+
+    def __next__(self):
+        pytest.fail("A random number was taken with next")
+
+
 class TestBaseNature:
     """Test class for BaseNature class.
     """
@@ -236,6 +245,24 @@ class TestBaseNature:
         _, pvalue = chisquare(num_moved, num_expected)
         assert pvalue > 0.001
 
+    def test_migrate_all_animals_takes_one_slice_per_species(
+        self, jungle, herb_list_gen, carn_list_gen, tear_down_params
+    ):
+        """Test that migration with a random buffer takes two numbers per
+        animal of each species as one slice, and no numbers one at a time.
+        """
+        j = jungle
+        j.herb_list = herb_list_gen
+        j.carn_list = carn_list_gen
+        neighbors = (Jungle(), Jungle(), Jungle(), Jungle())
+        Herb.set_parameters({"mu": 100, "F": 0})
+        Carn.set_parameters({"mu": 100, "F": 0})
+        rng = SliceOnlyBuffer(4, block_size=1000)
+        j.migrate_all_animals(neighbors, rng)
+        assert rng.draws == 2 * 100 + 2 * 100
+        assert len(j.herb_move_from_list) == 100
+        assert len(j.carn_move_from_list) == 100
+
 
 class TestOcean:
     @pytest.fixture
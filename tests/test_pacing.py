@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.pacing import ProgressReporter, YearClock
+from biosim.simulation import BioSim
+from biosim.stopping import StopReason
+import io
+import pytest
+import time
+
+HERBIVORES = [
+    {
+        "loc": (1, 1),
+        "pop": [
+            {"species": "Herbivore", "age": 5, "weight": 20}
+            for _ in range(20)
+        ],
+    }
+]
+
+
+def test_invalid_arguments_raise_error():
+    """Tests that non positive limits and smoothing raise ValueError"""
+    with pytest.raises(ValueError):
+        YearClock(time_budget=0)
+    with pytest.raises(ValueError):
+        YearClock(years_per_second=-1)
+    with pytest.raises(ValueError):
+        YearClock(smoothing=0)
+
+
+def test_year_cost_is_moving_average():
+    """Tests that the cost estimate follows the cost of the years, and that
+    a year is not started when it is not expected to fit in the budget"""
+    clock = YearClock(time_budget=0.2, smoothing=0.5)
+    assert clock.has_time_for_year()
+    time.sleep(0.02)
+    clock.year_done()
+    assert 0.02 <= clock.year_cost < 0.1
+    clock.year_done()
+    assert 0.01 <= clock.year_cost < 0.05
+    clock.year_cost = 0.5
+    assert not clock.has_time_for_year()
+    assert clock.throughput.years == 2
+
+
+def test_simulate_with_time_budget():
+    """Tests that a simulation with a time budget stops when the budget is
+    used, and reports why and its throughput"""
+    sim = BioSim("OOO\nOJO\nOOO", HERBIVORES, seed=1)
+    sim.simulate(10 ** 6, vis_years=0, time_budget=0.3)
+    assert 0 < sim.year < 10 ** 6
+    assert sim.stop_reason == StopReason(sim.year, "Time budget used")
+    years, seconds, rate = sim.throughput
+    assert years == sim.year
+    assert 0.1 < seconds < 0.6
+    assert rate == pytest.approx(years / seconds)
+
+
+def test_simulate_keeps_pace():
+    """Tests that a paced simulation does not go faster than the pace"""
+    sim = BioSim("OOO\nOJO\nOOO", HERBIVORES, seed=1)
+    sim.simulate(5, vis_years=0, years_per_second=50)
+    assert sim.year == 5
+    assert sim.stop_reason is None
+    assert sim.throughput.seconds >= 4 / 50
+    assert sim.throughput.years_per_second <= 50
+
+
+def test_invalid_progress_arguments_raise_error():
+    """Tests that a negative interval or bad smoothing raise ValueError"""
+    with pytest.raises(ValueError):
+        ProgressReporter(interval=-1)
+    with pytest.raises(ValueError):
+        ProgressReporter(smoothing=1.5)
+
+
+def test_progress_is_reported_to_callback():
+    """Tests that progress is reported every year with interval 0, and once
+    more when the simulation ends, with rates and a shrinking estimate of
+    the time left"""
+    reports = []
+    sim = BioSim("OOO\nOJO\nOOO", HERBIVORES, seed=1)
+    sim.simulate(
+        5, vis_years=0, progress=ProgressReporter(0, reports.append)
+    )
+    assert len(reports) == 6
+    assert [report.years_done for report in reports[:5]] == [1, 2, 3, 4, 5]
+    assert all(report.total_years == 5 for report in reports)
+    assert reports[-1].year == 5
+    assert reports[-1].eta == 0
+    assert all(report.years_per_second > 0 for report in reports)
+    assert all(report.animals_per_second > 0 for report in reports)
+
+
+def test_progress_reports_are_rate_limited():
+    """Tests that reports are at most every interval seconds, and that lines
+    are written to the stream without a callback"""
+    stream = io.StringIO()
+    sim = BioSim("OOO\nOJO\nOOO", HERBIVORES, seed=1)
+    sim.simulate(
+        20, vis_years=0, progress=ProgressReporter(60, stream=stream)
+    )
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert lines[0].startswith("Year 20 (20/20), ")
+    assert "animals/s, ETA 0 s" in lines[0]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.parameters import (
+    AnimalParameters,
+    LandscapeParameters,
+    SimulationParameters,
+)
+from biosim.animals import Herb, Carn
+from biosim.landscape import Jungle, Savannah
+import pytest
+
+
+class TestParameterSets:
+    """Test class for the parameter set classes.
+    """
+
+    @pytest.fixture
+    def herb_params(self):
+        """Creates a fixture of a herbivore parameter set.
+        """
+        return AnimalParameters(Herb.DEFAULT_PARAMETERS)
+
+    def test_updated_returns_new_set(self, herb_params):
+        """Tests that updated leaves the original set unchanged.
+        """
+        new_params = herb_params.updated({"zeta": 4})
+        assert new_params["zeta"] == 4
+        assert herb_params["zeta"] == Herb.DEFAULT_PARAMETERS["zeta"]
+        with pytest.raises(TypeError):
+            herb_params["zeta"] = 4
+
+    def test_updated_raises_errors(self, herb_params):
+        """Tests that invalid values are rejected.
+        """
+        with pytest.raises(KeyError):
+            herb_params.updated({"key_not_valid": 1})
+        with pytest.raises(ValueError):
+            herb_params.updated({"F": "some_string"})
+        with pytest.raises(ValueError):
+            herb_params.updated({"F": -1})
+        with pytest.raises(ValueError):
+            herb_params.updated({"eta": 3})
+        with pytest.raises(ValueError):
+            AnimalParameters(Carn.DEFAULT_PARAMETERS).updated(
+                {"DeltaPhiMax": 0}
+            )
+        with pytest.raises(ValueError):
+            LandscapeParameters(Jungle.DEFAULT_PARAMETERS).updated(
+                {"f_max": -1}
+            )
+
+    def test_new_set_raises_errors(self):
+        """Tests that the values and keys of a new set are checked.
+        """
+        with pytest.raises(ValueError):
+            AnimalParameters(dict(Herb.DEFAULT_PARAMETERS, eta=5))
+        with pytest.raises(ValueError):
+            AnimalParameters(dict(Carn.DEFAULT_PARAMETERS, DeltaPhiMax=-1))
+        with pytest.raises(KeyError):
+            AnimalParameters(
+                dict(Herb.DEFAULT_PARAMETERS, bogus=1), Herb.DEFAULT_PARAMETERS
+            )
+        with pytest.raises(KeyError):
+            LandscapeParameters({}, Jungle.DEFAULT_PARAMETERS)
+
+    def test_from_dict_raises_errors(self):
+        """Tests that from_dict needs every species and landscape type with
+        the keys of their defaults.
+        """
+        params = {
+            "Herbivore": dict(Herb.DEFAULT_PARAMETERS),
+            "Carnivore": dict(Carn.DEFAULT_PARAMETERS),
+            "J": dict(Jungle.DEFAULT_PARAMETERS),
+            "S": dict(Savannah.DEFAULT_PARAMETERS),
+        }
+        assert SimulationParameters.from_dict(params).as_dict() == params
+        with pytest.raises(KeyError):
+            SimulationParameters.from_dict(dict(params, bogus={}))
+        params["Herbivore"]["bogus"] = 1
+        with pytest.raises(KeyError):
+            SimulationParameters.from_dict(params)
+
+    def test_derived_birth_weight_limit(self, herb_params):
+        """Tests that the birth weight limit is derived from the parameters.
+        """
+        attributes = herb_params.updated({"zeta": 2}).attributes()
+        assert attributes["birth_weight_limit"] == 2 * (8.0 + 1.5)
+        assert "_lambda" in attributes
+        assert "lambda" not in attributes
+
+    def test_bound_class_leaves_species_untouched(self, herb_params):
+        """Tests that a bound subclass does not change the species class.
+        """
+        bound_herb = Herb.with_parameters(herb_params.updated({"F": 3.0}))
+        assert bound_herb().F == 3.0
+        assert isinstance(bound_herb(), Herb)
+        assert Herb().F == Herb.parameters["F"]
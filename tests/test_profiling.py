@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.profiling import PHASES, CellProfile, PhaseProfile
+from biosim.simulation import BioSim
+import numpy as np
+import pytest
+
+ISLAND_MAP = """\
+OOOOOOO
+OJJSJJO
+OJSDJJO
+OJJJJJO
+OOOOOOO"""
+
+POPULATION = [
+    {
+        "loc": (2, 2),
+        "pop": [
+            {"species": "Herbivore", "age": 5, "weight": 20}
+            for _ in range(40)
+        ]
+        + [
+            {"species": "Carnivore", "age": 5, "weight": 20}
+            for _ in range(8)
+        ],
+    }
+]
+
+
+def test_profile_adds_time_and_animals_per_phase():
+    """Tests that the time and animals of a phase are added to the current
+    year, and that the arrays have one row per year"""
+    profile = PhaseProfile()
+    profile.start_year(1)
+    profile.add("procreation", 0.5, 10)
+    profile.add("procreation", 0.25, 5)
+    profile.start_year(2)
+    profile.add("death", 1.0, 3)
+    assert profile.seconds.shape == (2, len(PHASES))
+    assert profile.seconds[0, PHASES.index("procreation")] == 0.75
+    assert profile.animals[0, PHASES.index("procreation")] == 15
+    assert profile.animals[1].sum() == 3
+    assert list(profile.as_dict()["year"]) == [1, 2]
+    assert "procreation" in profile.report()
+
+
+@pytest.mark.parametrize("rng_mode", ["block", "counter"])
+def test_profiling_does_not_change_results(rng_mode):
+    """Tests that a profiled simulation gives the same populations as one
+    that is not profiled"""
+    results = []
+    for profile in (False, True):
+        sim = BioSim(
+            ISLAND_MAP,
+            POPULATION,
+            seed=5,
+            rng_mode=rng_mode,
+            headless=True,
+            record_statistics=True,
+            profile=profile,
+        )
+        sim.simulate(20, vis_years=0)
+        results.append(sim.recorder.as_dict())
+    for field, values in results[0].items():
+        assert np.array_equal(values, results[1][field])
+
+
+def test_simulation_profile_report():
+    """Tests that every simulated year is profiled, that the animals of the
+    phases are counted from the totals, and that a report is only made
+    when profiling is on"""
+    sim = BioSim(ISLAND_MAP, POPULATION, seed=5, headless=True, profile=True)
+    sim.simulate(10, vis_years=0)
+    profile = sim.profile
+    assert len(profile) == 10
+    assert (profile.seconds >= 0).all()
+    animals = profile.animals
+    assert animals[0, PHASES.index("herbivore feeding")] == 40
+    assert animals[0, PHASES.index("carnivore feeding")] == 8
+    assert (animals[:, PHASES.index("fodder regrowth")] == 0).all()
+    births = sim.recorder["herbivore_births"] + sim.recorder[
+        "carnivore_births"
+    ]
+    assert np.array_equal(
+        animals[:, PHASES.index("death")]
+        - animals[:, PHASES.index("procreation")],
+        births[-10:],
+    )
+    report = sim.profile_report()
+    assert report.startswith("Profile of 10 years")
+    for phase in PHASES:
+        assert phase in report
+    with pytest.raises(ValueError):
+        BioSim(ISLAND_MAP, POPULATION, seed=5).profile_report()
+
+
+def test_cell_profile_samples_every_k_years():
+    """Tests that only every k'th year is sampled, and that the costs have
+    one row and column per cell"""
+    with pytest.raises(ValueError):
+        CellProfile((3, 4), every_years=0)
+    cell_profile = CellProfile((3, 4), every_years=5)
+    assert [year for year in range(1, 21) if cell_profile.is_due(year)] == [
+        5,
+        10,
+        15,
+        20,
+    ]
+    assert cell_profile.latest().shape == (3, 4, len(PHASES))
+    costs = cell_profile.start_year(5)
+    costs[1 * 4 + 2, PHASES.index("migration decision")] = 0.5
+    costs[2 * 4 + 1, PHASES.index("death")] = 0.25
+    assert cell_profile.costs.shape == (1, 3, 4, len(PHASES))
+    assert cell_profile.hotspots(2) == [
+        (1, 2, 0.5, "migration decision"),
+        (2, 1, 0.25, "death"),
+    ]
+
+
+@pytest.mark.parametrize("rng_mode", ["block", "counter"])
+def test_cell_sampling_does_not_change_results(rng_mode):
+    """Tests that sampling the cost of the cells gives the same populations
+    as a simulation that is not sampled, and that only the sampled years
+    and inhabited cells get a cost"""
+    results = []
+    for cell_profile_years in (None, 3):
+        sim = BioSim(
+            ISLAND_MAP,
+            POPULATION,
+            seed=5,
+            rng_mode=rng_mode,
+            headless=True,
+            record_statistics=True,
+            cell_profile_years=cell_profile_years,
+        )
+        sim.simulate(10, vis_years=0)
+        results.append(sim.recorder.as_dict())
+    for field, values in results[0].items():
+        assert np.array_equal(values, results[1][field])
+    assert sim.cell_profile.years == [3, 6, 9]
+    costs = sim.cell_profile.as_dict()["costs"]
+    assert costs.shape == (3, 5, 7, len(PHASES))
+    assert (costs[:, 0, :, :] == 0).all()
+    assert costs[:, 2, 2, PHASES.index("procreation")].min() > 0
+
+
+def test_cost_map_is_drawn(tmp_path):
+    """Tests that a cost heat map is drawn when the cells are sampled, and
+    that sampling and phase profiling can be combined"""
+    sim = BioSim(
+        ISLAND_MAP,
+        POPULATION,
+        seed=5,
+        img_base=str(tmp_path / "fig"),
+        headless=True,
+        profile=True,
+        cell_profile_years=2,
+    )
+    sim.simulate(4, vis_years=1, img_years=4)
+    assert sim._cost_map is not None
+    assert sim._cost_map.get_array().shape == (5, 7)
+    assert len(sim.profile) == 4
+    assert len(sim.cell_profile) == 2
+    assert (tmp_path / "fig_00000.png").is_file()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.recorder import Recorder
+import numpy as np
+
+
+class TestRecorder:
+    """Test class for the Recorder class.
+    """
+
+    def test_record_grows_arrays(self):
+        """Tests that the recorder keeps all years when the arrays grow.
+        """
+        recorder = Recorder(capacity=2)
+        for year in range(10):
+            recorder.record(year=year, herbivores=2 * year)
+        assert len(recorder) == 10
+        assert recorder.last_year == 9
+        assert list(recorder["year"]) == list(range(10))
+        assert list(recorder["herbivores"]) == [2 * y for y in range(10)]
+        assert list(recorder["carnivores"]) == [0] * 10
+
+    def test_export(self, tmpdir):
+        """Tests that the time series can be written to CSV and npz files.
+        """
+        recorder = Recorder()
+        recorder.record(year=0, herbivores=5, herbivore_weight=20.5)
+        recorder.record(year=1, herbivores=7, herbivore_weight=21.0)
+        csv_path = str(tmpdir.join("series.csv"))
+        recorder.to_csv(csv_path)
+        data = np.genfromtxt(csv_path, delimiter=",", names=True)
+        assert list(data["herbivores"]) == [5, 7]
+        assert list(data["herbivore_weight"]) == [20.5, 21.0]
+        npz_path = str(tmpdir.join("series.npz"))
+        recorder.save(npz_path)
+        assert list(np.load(npz_path)["year"]) == [0, 1]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.rng import RandomBuffer, CounterRandom, FEEDING, DEATH
+import pytest
+import numpy as np
+
+
+class TestRandomBuffer:
+    """Test class for the RandomBuffer class.
+    """
+
+    def test_block_size_raises_error(self):
+        """Tests that a non positive block size raises ValueError.
+        """
+        with pytest.raises(ValueError):
+            RandomBuffer(1, block_size=0)
+        with pytest.raises(ValueError):
+            RandomBuffer(1, block_size=2.5)
+
+    def test_uniform_in_unit_interval(self):
+        """Tests that the numbers handed out are in the interval [0, 1).
+        """
+        numbers = RandomBuffer(1).uniform(1000)
+        assert len(numbers) == 1000
+        assert all(0 <= number < 1 for number in numbers)
+
+    def test_slices_follow_generator_stream(self):
+        """Tests that slices and single numbers follow the generator stream
+        across block refills.
+        """
+        buffer = RandomBuffer(12, block_size=7)
+        numbers = buffer.uniform(5) + [next(buffer)] + buffer.uniform(20)
+        expected = np.random.default_rng(12).random(26).tolist()
+        assert numbers == expected
+
+    def test_same_seed_gives_same_numbers(self):
+        """Tests that two buffers with the same seed hand out equal numbers.
+        """
+        assert RandomBuffer(5).uniform(100) == RandomBuffer(5).uniform(100)
+        assert RandomBuffer(5).uniform(100) != RandomBuffer(6).uniform(100)
+
+    def test_draws_counts_numbers_handed_out(self):
+        """Tests that draws counts the numbers handed out across refills,
+        and not the numbers discarded by reset.
+        """
+        buffer = RandomBuffer(3, block_size=4)
+        buffer.uniform(6)
+        next(buffer)
+        buffer.normal(0, 1)
+        assert buffer.draws == 8
+        buffer.reset()
+        buffer.uniform(2)
+        assert buffer.draws == 10
+
+
+class TestCounterRandom:
+    """Test class for the CounterRandom class.
+    """
+
+    def test_stream_is_keyed_by_year_cell_and_phase(self):
+        """Tests that a stream only depends on its key and not on the order
+        the streams are used in.
+        """
+        counter_random = CounterRandom(3)
+        first = counter_random.stream(4, 10, FEEDING).uniform(10)
+        other = counter_random.stream(4, 11, FEEDING).uniform(10)
+        again = CounterRandom(3).stream(4, 10, FEEDING).uniform(10)
+        assert first == again
+        assert first != other
+        assert first != CounterRandom(3).stream(5, 10, FEEDING).uniform(10)
+        assert first != CounterRandom(3).stream(4, 10, DEATH).uniform(10)
+
+    def test_replay_matches_stream(self):
+        """Tests that replay gives the numbers used by the stream.
+        """
+        counter_random = CounterRandom(8)
+        stream = counter_random.stream(100, 27, DEATH)
+        numbers = stream.uniform(300) + [next(stream)]
+        assert counter_random.replay(100, 27, DEATH, 301) == numbers
+
+    def test_draws_counts_all_streams(self):
+        """Tests that draws counts the numbers handed out by every stream.
+        """
+        counter_random = CounterRandom(8)
+        counter_random.stream(1, 2, DEATH).uniform(5)
+        next(counter_random.stream(1, 3, FEEDING))
+        assert counter_random.draws == 6
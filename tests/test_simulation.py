@@ -4,11 +4,17 @@ __author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
 __email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
 
 import pytest
+import random
 from biosim.simulation import BioSim
 import glob
 import os
 import os.path
 import shutil
+import asyncio
+import numpy as np
+import subprocess
+import sys
+import textwrap
 
 
 def test_simulation_set_animal_parameters():
@@ -82,3 +88,257 @@ def test_simulation_large_island():
     sim = BioSim(island_map=map, ini_pop=[], seed=1)
     sim.simulate(1, 1)
     assert sim._large_island
+
+
+def test_simulations_have_separate_parameters():
+    """Test that parameters set on one simulation do not change another"""
+    sim_1 = BioSim(island_map="OOO\nOJO\nOOO", ini_pop=[], seed=1)
+    sim_2 = BioSim(island_map="OOO\nOJO\nOOO", ini_pop=[], seed=1)
+    sim_1.set_animal_parameters("Herbivore", {"F": 20.0})
+    sim_1.set_landscape_parameters("J", {"f_max": 100.0})
+    assert sim_1.parameters["Herbivore"]["F"] == 20.0
+    assert sim_2.parameters["Herbivore"]["F"] == 10.0
+    assert sim_2.parameters["J"]["f_max"] == 800
+
+
+def test_headless_simulation_makes_no_figure():
+    """Test that a headless simulation without images makes no figure"""
+    sim = BioSim(
+        island_map="OOO\nOJO\nOOO", ini_pop=[], seed=1, headless=True
+    )
+    sim.simulate(5, vis_years=1)
+    assert sim._fig is None
+    assert sim.year == 5
+
+
+def test_headless_simulation_saves_images(figfile_root):
+    """Test that a headless simulation saves images without pyplot"""
+    import matplotlib.pyplot as plt
+
+    num_figures = len(plt.get_fignums())
+    sim = BioSim(
+        island_map="OOO\nOJO\nOOO",
+        ini_pop=[],
+        seed=1,
+        img_base=figfile_root,
+        headless=True,
+    )
+    sim.simulate(4, vis_years=1, img_years=2)
+    assert os.path.isfile(figfile_root + "_00000.png")
+    assert os.path.isfile(figfile_root + "_00001.png")
+    assert not os.path.isfile(figfile_root + "_00002.png")
+    assert len(plt.get_fignums()) == num_figures
+
+
+def test_import_and_construction_time():
+    """Test that importing the simulation module and making a BioSim on a
+    small map is fast, and does not import pyplot or pandas.
+
+    The time limit is generous so the test only catches large regressions,
+    like heavy dependencies being imported at module level again.
+    """
+    code = textwrap.dedent(
+        """\
+        import sys
+        import time
+        start = time.perf_counter()
+        from biosim.simulation import BioSim
+        BioSim(island_map="OOOO\\nOJSO\\nOOOO", ini_pop=[], seed=1)
+        print(time.perf_counter() - start)
+        print("matplotlib.pyplot" in sys.modules, "pandas" in sys.modules)
+        """
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", code], env=dict(os.environ), text=True
+    ).splitlines()
+    assert float(output[0]) < 2.0
+    assert output[1] == "False False"
+
+
+def test_iter_years_yields_snapshots(populated_sim):
+    """Test that iter_years yields snapshots at the requested interval"""
+    snapshots = []
+    for snapshot in populated_sim.iter_years(
+        6, every=2, fields=("Herbivore",)
+    ):
+        assert snapshot.herbivores.sum() == snapshot.num_herbivores
+        assert snapshot.carnivores is None
+        snapshots.append(snapshot.year)
+    assert snapshots == [2, 4, 6]
+    assert populated_sim.year == 6
+    assert populated_sim._fig is None
+
+
+def test_iter_years_can_stop_early(populated_sim):
+    """Test that breaking out of iter_years stops the simulation"""
+    for snapshot in populated_sim.iter_years(100):
+        if snapshot.year == 3:
+            break
+    assert populated_sim.year == 3
+
+
+def test_iter_years_raises_errors(populated_sim):
+    """Test that invalid arguments to iter_years raise ValueError"""
+    with pytest.raises(ValueError):
+        next(populated_sim.iter_years(5, every=0))
+    with pytest.raises(ValueError):
+        next(populated_sim.iter_years(5, fields=("Omnivore",)))
+
+
+def test_aiter_years_yields_snapshots(populated_sim):
+    """Test that aiter_years can be consumed with async for"""
+
+    async def consume():
+        return [
+            snapshot.year
+            async for snapshot in populated_sim.aiter_years(4, every=2)
+        ]
+
+    assert asyncio.run(consume()) == [2, 4]
+    assert populated_sim.year == 4
+
+
+def test_aiter_years_can_be_cancelled(populated_sim):
+    """Test that cancelling the consumer stops the simulation"""
+
+    async def consume(first_snapshot):
+        async for snapshot in populated_sim.aiter_years(1000):
+            first_snapshot.set_result(snapshot.year)
+            await asyncio.sleep(10)
+
+    async def run():
+        first_snapshot = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(consume(first_snapshot))
+        await first_snapshot
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert populated_sim.year == 1
+
+
+def test_simulate_returns_recorder(populated_sim):
+    """Test that simulate records every year, and that births and deaths
+    account for the change in population on a closed island"""
+    recorder = populated_sim.simulate(5, vis_years=0)
+    populated_sim.simulate(3, vis_years=0)
+    assert recorder is populated_sim.recorder
+    assert list(recorder["year"]) == list(range(9))
+    for species in ("herbivore", "carnivore"):
+        counts = recorder[species + "s"]
+        change = recorder[species + "_births"] - recorder[species + "_deaths"]
+        assert np.all(counts[1:] == counts[:-1] + change[1:])
+    assert recorder["herbivores"][-1] == (
+        populated_sim.num_animals_per_species["Herbivore"]
+    )
+
+
+@pytest.mark.parametrize("headless", [False, True])
+def test_statistics_are_only_recorded_on_request(make_populated_sim, headless):
+    """Test that the mean weight and fitness are recorded as NaN, without a
+    pass over the animals, unless they are asked for"""
+    sim = make_populated_sim(headless=headless)
+    sim._island.mean_weight_and_fitness = None
+    skipped = sim.simulate(3, vis_years=0)
+    assert np.all(np.isnan(skipped["herbivore_weight"]))
+    assert np.all(np.isnan(skipped["carnivore_fitness"]))
+    sim = make_populated_sim(headless=headless, record_statistics=True)
+    recorder = sim.simulate(3, vis_years=0)
+    statistics = sim._island.mean_weight_and_fitness()
+    assert recorder["herbivore_weight"][-1] == statistics["Herbivore"][0]
+    assert recorder["carnivore_fitness"][-1] == statistics["Carnivore"][1]
+    assert np.array_equal(recorder["herbivores"], skipped["herbivores"])
+
+
+def animal_states(sim):
+    """Return the age, weight and fitness of every animal in cell order"""
+    return [
+        [(animal.a, animal.weight, animal.fitness) for animal in animals]
+        for row in sim._island.map_list
+        for square in row
+        for animals in (square.herb_list, square.carn_list)
+    ]
+
+
+@pytest.mark.parametrize("rng_mode", ["block", "counter"])
+def test_checkpoint_resume_is_bit_identical(
+    make_populated_sim, tmpdir, rng_mode
+):
+    """Test that a simulation loaded from a checkpoint continues exactly
+    like the simulation that was saved"""
+    path = os.path.join(str(tmpdir), "checkpoint.npz")
+    sim = make_populated_sim(
+        seed=3, rng_mode=rng_mode, record_statistics=True
+    )
+    sim.set_animal_parameters("Carnivore", {"F": 40.0})
+    sim.simulate(4, vis_years=0)
+    sim.save_checkpoint(path)
+    sim.simulate(6, vis_years=0)
+    resumed = BioSim.load_checkpoint(path)
+    assert resumed.year == 4
+    assert resumed.parameters["Carnivore"]["F"] == 40.0
+    resumed.simulate(6, vis_years=0)
+    assert animal_states(resumed) == animal_states(sim)
+    for field, values in sim.recorder.as_dict().items():
+        assert np.array_equal(resumed.recorder[field], values)
+
+
+def test_load_checkpoint_does_not_seed_global_random(populated_sim, tmpdir):
+    """Test that loading a checkpoint leaves the state of the random and
+    numpy.random modules as it was"""
+    path = os.path.join(str(tmpdir), "checkpoint.npz")
+    populated_sim.simulate(2, vis_years=0)
+    populated_sim.save_checkpoint(path)
+    random.seed(12)
+    np.random.seed(12)
+    expected = (random.random(), np.random.random())
+    random.seed(12)
+    np.random.seed(12)
+    assert BioSim.load_checkpoint(path).year == 2
+    assert (random.random(), np.random.random()) == expected
+
+
+def test_load_checkpoint_raises_error_for_other_files(tmpdir):
+    """Test that loading a file that is not a checkpoint raises ValueError"""
+    path = os.path.join(str(tmpdir), "other.npz")
+    np.savez(path, year=np.array(1))
+    with pytest.raises(ValueError):
+        BioSim.load_checkpoint(path)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_fork_runs_independent_branches(populated_sim):
+    """Test that forked branches get their own changes and random numbers,
+    give the same results when forked again, and leave the simulation
+    unchanged"""
+    populated_sim.simulate(3, vis_years=0)
+
+    def modify(sim, branch):
+        sim.set_animal_parameters("Carnivore", {"F": 10.0 + 15 * branch})
+
+    def result(sim):
+        herbivores = sim.recorder["herbivores"].tolist()
+        return sim.year, sim.parameters["Carnivore"]["F"], herbivores
+
+    results = populated_sim.fork(3, modify=modify, num_years=5, result=result)
+    again = populated_sim.fork(3, modify=modify, num_years=5, result=result)
+    assert results == again
+    assert [year for year, _, _ in results] == [8, 8, 8]
+    assert [f for _, f, _ in results] == [10.0, 25.0, 40.0]
+    assert results[0][2][:4] == list(populated_sim.recorder["herbivores"])
+    assert len({tuple(series) for _, _, series in results}) == 3
+    assert populated_sim.year == 3
+    assert populated_sim.parameters["Carnivore"]["F"] == 50.0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_fork_raises_error_from_branch(populated_sim):
+    """Test that an error in a branch raises RuntimeError"""
+
+    def modify(sim, branch):
+        if branch == 1:
+            raise KeyError("no such parameter")
+
+    with pytest.raises(RuntimeError, match="Branch 1 failed"):
+        populated_sim.fork(2, modify=modify, num_years=1)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Helge Helo Klemetsdal, Adam Julius Olof Kviman"
+__email__ = "hegkleme@nmbu.no, juliukvi@nmbu.no"
+
+from biosim.recorder import Recorder
+from biosim.simulation import BioSim
+from biosim.stopping import Extinction, SteadyState, StopReason
+import pytest
+
+HERBIVORES = [
+    {
+        "loc": (1, 1),
+        "pop": [
+            {"species": "Herbivore", "age": 5, "weight": 20}
+            for _ in range(20)
+        ],
+    }
+]
+
+
+def recorder_with(herbivores, carnivores):
+    """Return a recorder with the given yearly totals"""
+    recorder = Recorder()
+    for year, (herbs, carns) in enumerate(zip(herbivores, carnivores)):
+        recorder.record(year=year, herbivores=herbs, carnivores=carns)
+    return recorder
+
+
+def test_invalid_arguments_raise_error():
+    """Tests that unknown species and too small windows raise ValueError"""
+    with pytest.raises(ValueError):
+        Extinction("Omnivore")
+    with pytest.raises(ValueError):
+        SteadyState(window=1)
+    with pytest.raises(ValueError):
+        SteadyState(species=("Omnivore",))
+
+
+def test_extinction_of_species():
+    """Tests that extinction of one species or of all animals is found"""
+    recorder = recorder_with([10, 5], [0, 0])
+    assert Extinction("Carnivore").check(recorder) == "Carnivore is extinct"
+    assert Extinction("Herbivore").check(recorder) is None
+    assert Extinction().check(recorder) is None
+    recorder.record(year=2, herbivores=0, carnivores=0)
+    assert Extinction().check(recorder) == "All animals are extinct"
+
+
+def test_steady_state():
+    """Tests that stationary totals are steady, and trends or changes in
+    the variance are not"""
+    steady = SteadyState(window=4, tolerance=0.1, variance_ratio=2.0)
+    flat = [100, 102, 98, 100] * 2
+    assert steady.check(recorder_with(flat, flat)) is not None
+    assert steady.check(recorder_with(flat[:7], flat[:7])) is None
+    growing = [100, 102, 98, 100, 120, 122, 118, 120]
+    assert steady.check(recorder_with(growing, flat)) is None
+    noisy = [100, 102, 98, 100, 90, 110, 90, 110]
+    assert steady.check(recorder_with(flat, noisy)) is None
+    assert steady.check(recorder_with([0] * 8, [0] * 8)) is not None
+
+
+def test_simulate_stops_early():
+    """Tests that simulate stops when a condition is met and reports the
+    year and reason"""
+    sim = BioSim("OOO\nOJO\nOOO", HERBIVORES, seed=1)
+    sim.simulate(3, vis_years=0)
+    assert sim.stop_reason is None
+    sim.simulate(10, vis_years=0, stop_when=[Extinction("Carnivore")])
+    assert sim.stop_reason == StopReason(4, "Carnivore is extinct")
+    assert sim.year == 4
+    sim.set_animal_parameters("Herbivore", {"eta": 1.0})
+    sim.simulate(10, vis_years=0, stop_when=[Extinction()])
+    assert sim.stop_reason == StopReason(5, "All animals are extinct")